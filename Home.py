@@ -6,6 +6,12 @@ st.set_page_config(
     layout="wide"
 )
 
+# hidden diagnostics view (timings, caches, artifact memory, profiles): open the app with ?diag=1
+if st.query_params.get("diag") == "1":
+    from realestate.diagnostics import render
+    render()
+    st.stop()
+
 # Custom CSS for better styling
 st.markdown("""
 <style>
@@ -1,18 +1,66 @@
 import streamlit as st
-import pickle
-import pandas as pd
-import numpy as np
-from numpy import expm1
+import os
+from realestate import artifacts, instrumentation, shared_artifacts
+from realestate.compact_model import COMPACT_DIR, MANIFEST, CompactModel
+from realestate.prediction_cache import GRID_FILE, PredictionCache, PriceGrid
+from realestate.price_model import AREA_RANGE, PIPELINE_FILE, input_frame
+from realestate.surrogate import REPORT_FILE, SURROGATE_DIR, fast_mode_help, load_report
 st.set_page_config(page_title="viz_Demo")
+request=instrumentation.begin('price_predictor',profile=st.query_params.get('profile'))
 
-with open('df.pkl','rb') as file:
-    df=pickle.load(file)
+# loaded once per process and shared across reruns; with `python -m realestate.shared_artifacts publish`,
+# mapped from shared memory instead, one copy for all server processes
+SHARED=shared_artifacts.current_file()
+if shared_artifacts.available('predictor_frame'):
+    df=artifacts.get(SHARED,shared_artifacts.predictor_frame)
+else:
+    df=artifacts.get('df.pkl')
+# the compact export (`python -m realestate.compact_model export`) loads in milliseconds; fall back to the pickle
+COMPACT_MANIFEST=os.path.join(COMPACT_DIR,MANIFEST)
+if shared_artifacts.available('pipeline'):
+    pipeline=artifacts.get(SHARED,shared_artifacts.pipeline_model)
+    pipeline_digest=pipeline.source_digest
+elif os.path.exists(COMPACT_MANIFEST):
+    pipeline=artifacts.get(COMPACT_MANIFEST,CompactModel.load)
+    pipeline_digest=pipeline.source_digest
+else:
+    pipeline=artifacts.get(PIPELINE_FILE)
+    pipeline_digest=artifacts.digest(PIPELINE_FILE)
 
-with open('pipeline.pkl','rb') as file:
-    pipeline=pickle.load(file)
+# the distilled surrogate (`python -m realestate.surrogate`) answers the "fast" mode when it has been exported
+SURROGATE_MANIFEST=os.path.join(SURROGATE_DIR,MANIFEST)
+
+# one prediction cache per mode and pipeline version, shared by every session in this process;
+# the precomputed grid holds forest prices, so only the exact mode uses it
+@st.cache_resource
+def load_prediction_cache(mode,pipeline_digest,_model):
+    grid=None
+    if mode=="Exact" and os.path.exists(GRID_FILE):
+        grid=PriceGrid.load(GRID_FILE)
+        if grid.pipeline_digest!=pipeline_digest:
+            grid=None
+    return PredictionCache(_model,grid=grid)
 
 st.title("Price Predictor")
 
+mode="Exact"
+shared_surrogate=shared_artifacts.available('surrogate')
+if shared_surrogate or os.path.exists(SURROGATE_MANIFEST):
+    # quote the surrogate's measured speed and fidelity, if they were measured for this forest
+    report=artifacts.get(REPORT_FILE,load_report) if os.path.exists(REPORT_FILE) else None
+    if report is not None and report.get('source_digest')!=pipeline_digest:
+        report=None
+    mode=st.radio("Mode",["Exact","Fast"],horizontal=True,help=fast_mode_help(report))
+if mode=="Fast":
+    if shared_surrogate:
+        surrogate=artifacts.get(SHARED,shared_artifacts.surrogate_model)
+    else:
+        surrogate=artifacts.get(SURROGATE_MANIFEST,CompactModel.load)
+    prediction_cache=load_prediction_cache(mode,surrogate.source_digest,surrogate)
+else:
+    prediction_cache=load_prediction_cache(mode,pipeline_digest,pipeline)
+instrumentation.register_cache(f"prediction ({mode.lower()})",prediction_cache)
+
 st.header("Enter your inputs")
 
 #property type
@@ -32,16 +80,15 @@ floor_Category=st.selectbox("Floor Category",sorted(df['floor_category'].unique(
 
 if st.button("Predict Price"):
     #form a dataframe
-    input_df=pd.DataFrame([[Property_Type,Sector,Number_of_bedrooms,Number_of_bathrooms,Number_of_balcony,property_age,Built_up_area,servant_room,store_room,furnishing_type,luxury_category,floor_Category]],columns=['property_type','sector','bedRoom','bathroom','balcony','agePossession','built_up_area','servant room','store room','furnishing_type','luxury_category','floor_category'])
+    input_df=input_frame([[Property_Type,Sector,Number_of_bedrooms,Number_of_bathrooms,Number_of_balcony,property_age,Built_up_area,servant_room,store_room,furnishing_type,luxury_category,floor_Category]])
     st.dataframe(input_df)
 
-    #predict
-    base_price=np.expm1(pipeline.predict(input_df))[0]
-    low=round((base_price-0.22),2)
-    high=round((base_price+0.22),2)
+    #predict: the band is the spread of the forest's trees for this property
+    base_price,low,high=(values[0] for values in prediction_cache.predict_band(input_df))
+    low,high=round(low,2),round(high,2)
 
     #display
-    if Built_up_area<50.0 or Built_up_area>15000.0:
+    if Built_up_area<AREA_RANGE[0] or Built_up_area>AREA_RANGE[1]:
         st.markdown("""
         <div style="
             background-color: #ffebee; 
@@ -59,4 +106,6 @@ if st.button("Predict Price"):
         </div>
         """, unsafe_allow_html=True)
     else:
-        st.text("The Price of the {} is between {} cr and {} cr".format(Property_Type,low,high))
\ No newline at end of file
+        st.text("The Price of the {} is between {} cr and {} cr".format(Property_Type,low,high))
+
+request.end()
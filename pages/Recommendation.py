@@ -1,63 +1,74 @@
 import streamlit as st
-import pickle
 import pandas as pd
-import numpy as np
+import os
+from realestate import artifacts, instrumentation, shared_artifacts
+from realestate.geo import GEO_FILE, GeoIndex
+from realestate.live_index import LIVE_FILE, LiveIndex
+from realestate.recommender import DEFAULT_WEIGHTS, INDEX_FILE, NeighbourIndex
 
 st.set_page_config(page_title="Recommend Apartments")
+request = instrumentation.begin('recommendation', profile=st.query_params.get('profile'))
 
-# Load data with caching
-@st.cache_data
-def load_data():
-    with open('location_df.pkl', 'rb') as file:
-        location_df = pickle.load(file)
-    cosine_sim1 = pickle.load(open('cosine_sim1.pkl', 'rb'))
-    cosine_sim2 = pickle.load(open('cosine_sim2.pkl', 'rb'))
-    cosine_sim3 = pickle.load(open('cosine_sim3.pkl', 'rb'))
-    properties_df = pd.read_csv('appartments.csv')  # CSV with PropertyName, Link, Price, etc.
-    return location_df, cosine_sim1, cosine_sim2, cosine_sim3, properties_df
-
-location_df, cosine_sim1, cosine_sim2, cosine_sim3, properties_df = load_data()
-
-@st.cache_data
-def recommend_properties(property_name, top_n=5, min_score=0):
-    cosine_sim_matrix = 0.5 * cosine_sim1 + 0.8 * cosine_sim2 + 1 * cosine_sim3
-    idx = location_df.index.get_loc(property_name)
-    sim_scores = cosine_sim_matrix[idx]
-    # Create DataFrame for similarity scores
-    sims_df = pd.DataFrame({
-        'PropertyName': location_df.index,
-        'SimilarityScore': sim_scores
-    })
-    # Exclude the selected property itself
-    sims_df = sims_df[sims_df.PropertyName != property_name]
-    # Filter by minimum similarity score
-    sims_df = sims_df[sims_df.SimilarityScore >= min_score]
-    # Sort and select top_n
-    top_recommendations = sims_df.sort_values('SimilarityScore', ascending=False).head(top_n)
+# Shared artifacts, loaded once per process
+properties_df = artifacts.get('appartments.csv')  # CSV with PropertyName, Link, Price, etc.
+
+# Haversine index over apartments, landmarks and sectors for the radius search
+if not os.path.exists(GEO_FILE):
+    GeoIndex.build().save(GEO_FILE)
+geo = artifacts.get(GEO_FILE, GeoIndex.load)
+
+# Top-K neighbour index, built once if it is missing.  `python -m realestate.live_index`
+# edits it in place; the registry reloads it when the file's content changes.
+# When published to shared memory (`python -m realestate.shared_artifacts publish`) all server processes
+# map one copy of it instead; republish after editing it.
+if shared_artifacts.available('recommender'):
+    index = artifacts.get(shared_artifacts.current_file(), shared_artifacts.neighbour_index)
+else:
+    if not os.path.exists(INDEX_FILE):
+        LiveIndex.build().save(LIVE_FILE, INDEX_FILE)
+    index = artifacts.get(INDEX_FILE, NeighbourIndex.load)
+
+@instrumentation.timed('recommend_properties')
+def recommend_properties(property_name, top_n=5, min_score=0, weights=None):
+    names, scores = index.query(property_name, top_n=top_n, min_score=min_score, weights=weights)
+    top_recommendations = pd.DataFrame({'PropertyName': names, 'SimilarityScore': scores})
     # Merge with property details (links, price, etc.)
     merged = top_recommendations.merge(properties_df, on='PropertyName', how='left')
     return merged
 
 # UI
 st.title('Select Location and Radius')
-location = st.selectbox('Location', sorted(location_df.columns.tolist()))
+# (kind, name) options, so a landmark and a sector with the same name stay distinct
+places = [('landmark', name) for name in geo.places('landmark')] + [('sector', name) for name in geo.places('sector')]
+repeated = set(geo.places('landmark')) & set(geo.places('sector'))
+kind, location = st.selectbox('Location', places,
+                              format_func=lambda place: f"{place[1]} ({place[0]})" if place[1] in repeated else place[1])
 radius = st.number_input('Radius in kms', min_value=0.1, value=2.0, step=0.1)
 if st.button('Search'):
-    filtered = location_df[location_df[location] < radius * 1000][location].sort_values()
+    filtered = geo.around(location, radius, kind=kind)
     st.subheader(f"Apartments within {radius} km of {location}:")
-    for key, dist in filtered.items():
-        st.text(f"{key} - {round(dist/1000, 2)} kms")
+    for key, dist in zip(filtered['name'], filtered['distance_km']):
+        st.text(f"{key} - {round(dist, 2)} kms")
 
 st.title('Recommend Apartments')
-selected_apartment = st.selectbox('Select an apartment', sorted(location_df.index.to_list()))
+selected_apartment = st.selectbox('Select an apartment', sorted(index.names.tolist()))
 top_n = st.slider("Number of Recommendations", 1, 20, 5)
 min_score = st.slider("Minimum Similarity Score", 0.0, 1.0, 0.0, 0.05)
+with st.expander("Similarity weights"):
+    facilities_weight = st.slider("Facilities", 0.0, 2.0, DEFAULT_WEIGHTS[0], 0.1)
+    price_weight = st.slider("Price details", 0.0, 2.0, DEFAULT_WEIGHTS[1], 0.1)
+    location_weight = st.slider("Location", 0.0, 2.0, DEFAULT_WEIGHTS[2], 0.1)
+weights = (facilities_weight, price_weight, location_weight)
 
 if st.button('Recommend'):
-    recommendations = recommend_properties(selected_apartment, top_n=top_n, min_score=min_score)
+    recommendations = recommend_properties(selected_apartment, top_n=top_n, min_score=min_score, weights=weights)
     for _, row in recommendations.iterrows():
+        # listings added through the live index have no scraped link yet
+        link = f"[View Property]({row['Link']})" if pd.notna(row['Link']) else "Link not available"
         st.markdown(
             f"**{row['PropertyName']}** - Score: {row['SimilarityScore']:.2f}  \n"
            
-            f"[View Property]({row['Link']})"
+            f"{link}"
         )
+
+request.end()
@@ -0,0 +1 @@
+"""Shared building blocks for the Streamlit pages and the offline build scripts."""
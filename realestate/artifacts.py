@@ -0,0 +1,234 @@
+"""Process-wide registry for the pickles, CSVs and indexes the pages load.
+
+Every page asks the registry instead of calling ``pickle.load``/``read_csv``
+itself.  An artifact is loaded once per process and the same object is handed
+to every rerun and every page, with its numeric buffers marked read-only so a
+careless in-place edit fails loudly instead of leaking into other sessions.
+
+A file is reloaded only when its content hash changes: the registry compares
+``(mtime, size)`` on every access and re-hashes the file only when those move.
+Objects derived from a file (an index, a cube) are registered under
+``(path, loader)``, so they share that invalidation.
+
+    from realestate import artifacts
+    pipeline = artifacts.get('pipeline.pkl')
+    artifacts.stats()   # load time, size, hash and using pages per artifact
+
+Loads are timed as ``artifact.load`` in :mod:`realestate.instrumentation`, and
+every artifact remembers which pages asked for it.
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from realestate import instrumentation
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def _load_npz(path):
+    with np.load(path, allow_pickle=False) as data:
+        return dict(data)
+
+
+LOADERS = {
+    '.pkl': _load_pickle,
+    '.csv': pd.read_csv,
+    '.parquet': pd.read_parquet,
+    '.npy': np.load,
+    '.npz': _load_npz,
+}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _freeze_array(array):
+    if isinstance(array, np.ndarray):
+        array.setflags(write=False)
+
+
+def freeze(value):
+    """Mark the NumPy buffers behind ``value`` read-only, in place (no copy)."""
+    if isinstance(value, np.ndarray):
+        _freeze_array(value)
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        # object blocks stay writable: pandas' Cython helpers need writable buffers for them
+        for array in getattr(value, '_mgr').arrays:
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                _freeze_array(array)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            freeze(item)
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        # one level deep: the arrays held directly by index objects
+        for item in vars(value).values():
+            if isinstance(item, (np.ndarray, pd.DataFrame, pd.Series)):
+                freeze(item)
+    return value
+
+
+def _mapped(array):
+    """``True`` for arrays over a memory-mapped file, whose pages the OS shares between processes."""
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+
+def nbytes(value, _seen=None):
+    """Approximate private memory of an artifact (arrays, frames, bytes and sklearn trees); mapped arrays count 0."""
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return 0 if _mapped(value) else value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        blocks = [getattr(array, 'codes', array) for array in getattr(value, '_mgr').arrays]
+        shared = sum(array.nbytes for array in blocks if isinstance(array, np.ndarray) and _mapped(array))
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage) - shared
+    if isinstance(value, dict):
+        return sum(nbytes(v, _seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v, _seen) for v in value)
+    if type(value).__name__ == 'Tree' and hasattr(value, '__getstate__'):
+        # sklearn's Cython tree keeps its node/value arrays outside __dict__
+        state = value.__getstate__()
+        return sum(v.nbytes for v in state.values() if isinstance(v, np.ndarray))
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sum(nbytes(v, _seen) for v in vars(value).values())
+    return 0
+
+
+def _loader_name(loader):
+    if loader is None:
+        return 'default'
+    function = getattr(loader, 'func', loader)  # functools.partial
+    return getattr(function, '__qualname__', type(function).__name__)
+
+
+@dataclass
+class Artifact:
+    path: str
+    value: object = field(repr=False)
+    digest: str
+    mtime_ns: int
+    size: int
+    load_seconds: float
+    nbytes: int
+    loads: int = 1
+    loaded_at: float = field(default_factory=time.time)
+    pages: set = field(default_factory=set)
+
+
+class ArtifactRegistry:
+    def __init__(self):
+        self._artifacts = {}
+        self._lock = threading.RLock()
+        self.hits = self.misses = 0
+
+    def get(self, path, loader=None):
+        """The artifact at ``path``, loading it only if it is new or its content changed.
+
+        ``loader`` must be a module-level function or classmethod: it is part of the key.
+        """
+        key = (os.path.abspath(path), loader)
+        stat = os.stat(key[0])
+        artifact = self._artifacts.get(key)
+        if artifact is not None and (artifact.mtime_ns, artifact.size) == (stat.st_mtime_ns, stat.st_size):
+            self.hits += 1
+            artifact.pages.add(instrumentation.current_page())
+            return artifact.value
+
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None and (artifact.mtime_ns, artifact.size) == (stat.st_mtime_ns, stat.st_size):
+                return artifact.value
+            digest = file_digest(key[0])
+            if artifact is not None and artifact.digest == digest:
+                # touched but unchanged: keep the loaded object
+                artifact.mtime_ns, artifact.size = stat.st_mtime_ns, stat.st_size
+                return artifact.value
+
+            load = loader or LOADERS[os.path.splitext(key[0])[1].lower()]
+            start = time.perf_counter()
+            with instrumentation.timer('artifact.load'):
+                value = load(key[0])
+            load_seconds = time.perf_counter() - start
+            self.misses += 1
+            self._artifacts[key] = Artifact(
+                path=path, value=value, digest=digest, mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+                load_seconds=load_seconds, nbytes=nbytes(value),
+                loads=artifact.loads + 1 if artifact is not None else 1,
+                pages={instrumentation.current_page()} | (artifact.pages if artifact is not None else set()))
+            return freeze(value)
+
+    def digest(self, path):
+        """Content hash of ``path``, reusing a loader that already has it (default loader if none).
+
+        A loader this page already uses is preferred, so the hash check does not
+        tag another page's artifact with this page.
+        """
+        path_key = os.path.abspath(path)
+        loaded = [(loader, artifact) for (key, loader), artifact in list(self._artifacts.items()) if key == path_key]
+        own = [loader for loader, artifact in loaded if instrumentation.current_page() in artifact.pages]
+        loader = own[0] if own else loaded[0][0] if loaded else None
+        self.get(path, loader)
+        return self._artifacts[(path_key, loader)].digest
+
+    def stats(self):
+        """One row per loaded artifact: hash, load time, memory, reload count and the pages using it."""
+        rows = [{'artifact': a.path, 'loader': _loader_name(loader), 'digest': a.digest[:12],
+                 'file_mb': a.size / 2 ** 20, 'memory_mb': a.nbytes / 2 ** 20, 'load_s': a.load_seconds,
+                 'loads': a.loads, 'loaded_at': pd.Timestamp(a.loaded_at, unit='s'),
+                 'pages': ', '.join(sorted(a.pages))}
+                for (_, loader), a in list(self._artifacts.items())]
+        return pd.DataFrame(rows, columns=['artifact', 'loader', 'digest', 'file_mb', 'memory_mb', 'load_s',
+                                           'loads', 'loaded_at', 'pages'])
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'artifacts': len(self._artifacts)}
+
+    def clear(self):
+        with self._lock:
+            self._artifacts.clear()
+
+
+registry = ArtifactRegistry()
+instrumentation.register_cache('artifacts', registry)
+
+
+def get(path, loader=None):
+    return registry.get(path, loader)
+
+
+def digest(path):
+    """Content hash of the artifact file at ``path`` (loads it if nothing has yet)."""
+    return registry.digest(path)
+
+
+def stats():
+    return registry.stats()
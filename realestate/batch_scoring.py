@@ -0,0 +1,208 @@
+"""Bulk price scoring for listing feeds.
+
+Streams a CSV or Parquet file in chunks, validates every chunk with vectorized
+column checks, prices every chunk in one pass over the forest's trees
+(optionally spread over a process pool) and appends predictions and the
+low/high band (per-tree quantiles) to the output.
+Only ``chunksize x (2 x workers + 1)`` rows are ever held in memory.
+
+Usage::
+
+    python -m realestate.batch_scoring listings.csv priced.csv --chunksize 50000 --workers 4
+
+Rows that fail validation are written with an ``error`` message and empty
+predictions instead of aborting the run.
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from realestate.price_model import (AREA_RANGE, CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FURNISHING_LABELS,
+                                    NUMERIC_COLUMNS, PIPELINE_FILE, known_categories, load_pipeline,
+                                    predict_price_band)
+
+OUTPUT_COLUMNS = ['predicted_price', 'price_low', 'price_high', 'error']
+
+
+# --- READING ---
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def iter_chunks(path, chunksize=50000):
+    """Yield DataFrame chunks of ``path`` (CSV or Parquet)."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        missing = set(FEATURE_COLUMNS) - set(parquet.schema_arrow.names)
+        if missing:
+            raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+        for batch in parquet.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        missing = set(FEATURE_COLUMNS) - set(header)
+        if missing:
+            raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+        # categoricals as text so '3+' and '3' stay in one dtype across chunks
+        yield from pd.read_csv(path, chunksize=chunksize, dtype={c: str for c in CATEGORICAL_COLUMNS})
+
+
+# --- VALIDATION ---
+
+def _category_strings(series):
+    """Categorical values as the strings the encoders were fitted on."""
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        integral = np.isfinite(values) & (values == np.round(values))
+        text = np.where(integral, np.nan_to_num(values).astype(np.int64).astype(str), values.astype(str))
+        return pd.Series(text, index=series.index, dtype=object).where(series.notna())
+    values = series.astype(object).where(series.notna())
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+        # numbers mixed into a text column (frames built in Python): 2 and 2.0 both mean '2'
+        is_text = values.map(lambda value: isinstance(value, str)).astype(bool)
+        values = values.where(is_text, _category_strings(pd.to_numeric(values.where(~is_text), errors='coerce')))
+    return values.str.strip()
+
+
+def _furnishing_labels(series):
+    text = series.astype(object).where(series.notna()).astype(str).str.strip()
+    codes = pd.to_numeric(text, errors='coerce').map(FURNISHING_LABELS)
+    return text.where(text.isin(list(FURNISHING_LABELS.values())), codes)
+
+
+def validate(chunk, categories):
+    """Return ``(X, errors)``: the cleaned model input and a per-row message ('' if valid)."""
+    X = pd.DataFrame(index=chunk.index)
+    problems = []
+    for column in FEATURE_COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            X[column] = pd.to_numeric(chunk[column], errors='coerce').astype(np.float64)
+            problems.append((X[column].isna().to_numpy(), f"bad {column}"))
+        else:
+            values = _furnishing_labels(chunk[column]) if column == 'furnishing_type' \
+                else _category_strings(chunk[column])
+            X[column] = values
+            problems.append((~values.isin(categories[column]).to_numpy(), f"unknown {column}"))
+
+    area = X['built_up_area'].to_numpy()
+    problems.append(((area < AREA_RANGE[0]) | (area > AREA_RANGE[1]), "built_up_area out of range"))
+
+    errors = np.full(len(chunk), '', dtype=object)
+    for mask, message in problems:
+        errors[mask] = errors[mask] + np.where(errors[mask] == '', '', '; ') + message
+    return X, errors
+
+
+# --- SCORING ---
+
+_pipeline = None
+_categories = None
+
+
+def _init_worker(pipeline_path):
+    global _pipeline, _categories
+    _pipeline = load_pipeline(pipeline_path)
+    _categories = known_categories(_pipeline)
+
+
+def score_chunk(chunk):
+    """Validate and price one chunk with the process-wide pipeline."""
+    X, errors = validate(chunk, _categories)
+    valid = errors == ''
+    predicted, low, high = np.full((3, len(chunk)), np.nan)
+    if valid.any():
+        predicted[valid], low[valid], high[valid] = predict_price_band(_pipeline, X[valid])
+
+    out = chunk.copy()
+    out['predicted_price'] = np.round(predicted, 4)
+    out['price_low'] = low
+    out['price_high'] = high
+    out['error'] = errors
+    return out
+
+
+def _scored_chunks(chunks, pipeline_path, workers):
+    if workers <= 1:
+        _init_worker(pipeline_path)
+        for chunk in chunks:
+            yield score_chunk(chunk)
+        return
+
+    # keep at most 2 chunks per worker in flight so memory stays bounded
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_path,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _Writer:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._schema = None
+        self._first = True
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._parquet is None:
+                self._schema = table.schema
+                self._parquet = pq.ParquetWriter(self.path, self._schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_file(input_path, output_path, pipeline_path=PIPELINE_FILE, chunksize=50000, workers=1):
+    """Score ``input_path`` into ``output_path``; returns ``(rows, rejected, seconds)``."""
+    start = time.perf_counter()
+    rows = rejected = 0
+    writer = _Writer(output_path)
+    try:
+        for scored in _scored_chunks(iter_chunks(input_path, chunksize), pipeline_path, workers):
+            writer.write(scored)
+            rows += len(scored)
+            rejected += int((scored['error'] != '').sum())
+    finally:
+        writer.close()
+    return rows, rejected, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price a CSV/Parquet listing feed with pipeline.pkl.")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--pipeline', default=PIPELINE_FILE)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes (1 = in-process)")
+    args = parser.parse_args()
+
+    rows, rejected, seconds = score_file(args.input, args.output, args.pipeline, args.chunksize, args.workers)
+    print(f"scored {rows} rows ({rejected} rejected) in {seconds:.1f}s "
+          f"({rows / max(seconds, 1e-9):,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
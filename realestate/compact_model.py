@@ -0,0 +1,339 @@
+"""Compact, memory-mappable export of the price pipeline.
+
+``pipeline.pkl`` holds a sklearn ``Pipeline`` whose forest stores eight arrays
+per tree node in float64 and takes seconds to unpickle.  :func:`export`
+flattens it into a directory of
+
+* ``manifest.json``: the preprocessing as lookup tables (scaler means and
+  scales, the ordinal/one-hot category lists in output-column order) and the
+  digest of the source pickle,
+* packed node arrays over all trees, each a plain ``.npy`` file that loads
+  with ``mmap_mode='r'``: ``feature`` (int32), ``threshold`` and ``value``
+  (float32), ``children`` (int32 left/right pairs) and ``roots`` (int32).
+
+The same format holds the distilled ``HistGradientBoostingRegressor`` of
+:mod:`realestate.surrogate`, whose trees are summed onto a baseline instead of
+averaged.
+
+Forest trees compare float32 features against thresholds; a float64
+threshold is rounded *down* to the nearest float32 so ``x <= t`` decides
+exactly as sklearn does.  :class:`CompactModel` transforms a frame with the lookup tables and
+walks every tree for a block of rows at once, one level per step; only the
+(row, tree) walkers still on an internal node take the next step, so the cost
+follows the average leaf depth rather than the deepest tree.  Its ``predict``
+matches ``pipeline.predict`` to float32 rounding of the leaf values.
+
+    python -m realestate.compact_model export --pipeline pipeline.pkl --output pipeline_compact
+    python -m realestate.compact_model bench
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.artifacts import file_digest
+from realestate.price_model import FEATURE_COLUMNS, PIPELINE_FILE, load_pipeline
+
+COMPACT_DIR = 'pipeline_compact'
+MANIFEST = 'manifest.json'
+NODE_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+BLOCK_CELLS = 1 << 20  # rows x trees walked per step
+
+
+# --- EXPORT ---
+
+def _float32_floor(values):
+    """Largest float32 not above each float64 value."""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _plain(values):
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def preprocessing_spec(preprocessor):
+    """The fitted ``ColumnTransformer`` as JSON-serializable steps in output-column order."""
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    steps = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or not len(columns):
+            continue
+        if transformer == 'passthrough':
+            steps.append({'kind': 'passthrough', 'columns': list(columns)})
+        elif isinstance(transformer, StandardScaler):
+            steps.append({'kind': 'scale', 'columns': list(columns),
+                          'mean': _plain(transformer.mean_ if transformer.with_mean else np.zeros(len(columns))),
+                          'scale': _plain(transformer.scale_ if transformer.with_std else np.ones(len(columns)))})
+        elif isinstance(transformer, OrdinalEncoder):
+            steps.append({'kind': 'ordinal', 'columns': list(columns),
+                          'categories': [_plain(c) for c in transformer.categories_]})
+        elif isinstance(transformer, OneHotEncoder):
+            drop = transformer.drop_idx_
+            steps.append({'kind': 'onehot', 'columns': list(columns),
+                          'categories': [_plain(c) for c in transformer.categories_],
+                          'drop': [None if drop is None or drop[i] is None else int(drop[i])
+                                   for i in range(len(columns))]})
+        else:
+            raise ValueError(f"cannot export transformer {name!r} ({type(transformer).__name__})")
+    return steps
+
+
+def _pack(trees, threshold_dtype=np.float32):
+    """``trees`` as ``(leaf, feature, threshold, left, right, value)`` per tree -> flat node arrays."""
+    counts = np.array([len(tree[0]) for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int32)
+    if counts.sum() >= np.iinfo(np.int32).max:
+        raise ValueError("too many tree nodes for int32 node ids")
+
+    arrays = {'feature': [], 'threshold': [], 'children': [], 'value': []}
+    for root, (leaf, feature, threshold, left, right, value) in zip(roots, trees):
+        nodes = np.arange(len(leaf))
+        arrays['feature'].append(np.where(leaf, 0, feature))
+        threshold = _float32_floor(threshold) if threshold_dtype == np.float32 else threshold
+        arrays['threshold'].append(np.where(leaf, np.inf, threshold).astype(threshold_dtype))
+        # leaves point to themselves: children[2 * node] == node marks a leaf
+        children = np.column_stack([np.where(leaf, nodes, left), np.where(leaf, nodes, right)])
+        arrays['children'].append(root + children.ravel())
+        arrays['value'].append(value)
+    dtypes = {'feature': np.int32, 'threshold': threshold_dtype, 'children': np.int32, 'value': np.float32}
+    packed = {name: np.concatenate(parts).astype(dtypes[name]) for name, parts in arrays.items()}
+    packed['roots'] = roots
+    return packed
+
+
+def pack_trees(estimator):
+    """Flat node arrays plus ``{'max_depth', 'aggregate', 'baseline'}`` for a fitted tree model.
+
+    Forests (and single trees) average their trees and split on float32
+    features; ``HistGradientBoostingRegressor`` sums them on top of its
+    baseline and splits on float64 features, so its thresholds stay float64.
+    """
+    if hasattr(estimator, '_predictors'):
+        nodes = [predictors[0].nodes for predictors in estimator._predictors]
+        if any(tree['is_categorical'].any() for tree in nodes):
+            raise ValueError("native categorical splits are not supported")
+        trees = [(tree['is_leaf'].astype(bool), tree['feature_idx'], tree['num_threshold'], tree['left'],
+                  tree['right'], tree['value']) for tree in nodes]
+        info = {'max_depth': int(max(tree['depth'].max() for tree in nodes)), 'aggregate': 'sum',
+                'baseline': float(np.ravel(estimator._baseline_prediction)[0])}
+        return _pack(trees, np.float64), info
+    else:
+        fitted = [e.tree_ for e in getattr(estimator, 'estimators_', [estimator])]
+        trees = [(tree.children_left < 0, tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                  tree.value[:, 0, 0]) for tree in fitted]
+        info = {'max_depth': int(max(tree.max_depth for tree in fitted)), 'aggregate': 'mean', 'baseline': 0.0}
+    return _pack(trees), info
+
+
+def export(pipeline_path=PIPELINE_FILE, output=COMPACT_DIR):
+    """Write the compact artifact for ``pipeline_path``; returns the output directory."""
+    return export_pipeline(load_pipeline(pipeline_path), output, file_digest(pipeline_path))
+
+
+def export_pipeline(pipeline, output=COMPACT_DIR, source_digest=''):
+    """Write the compact artifact for a fitted ``(preprocessor, trees)`` pipeline."""
+    preprocessor, estimator = pipeline.named_steps['preprocessor'], pipeline.steps[-1][1]
+    if len(pipeline.steps) != 2:
+        raise ValueError("expected a (preprocessor, tree model) pipeline")
+    arrays, info = pack_trees(estimator)
+
+    tmp = f"{output}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), values)
+    manifest = {'feature_columns': FEATURE_COLUMNS, 'steps': preprocessing_spec(preprocessor),
+                'n_features': int(estimator.n_features_in_), 'n_trees': len(arrays['roots']), **info,
+                'source_digest': source_digest,
+                'arrays_digest': {name: file_digest(os.path.join(tmp, f"{name}.npy")) for name in arrays}}
+    with open(os.path.join(tmp, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=1)
+
+    # swap the whole directory so readers never see a half-written model
+    if os.path.exists(output):
+        old = f"{output}.{os.getpid()}.old"
+        os.replace(output, old)
+        os.replace(tmp, output)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, output)
+    return output
+
+
+# --- INFERENCE ---
+
+class CompactModel:
+    """Lookup-table preprocessing plus a vectorized walk over the packed trees."""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.steps = manifest['steps']
+        self.n_features = manifest['n_features']
+        self.max_depth = manifest['max_depth']
+        self.aggregate = manifest.get('aggregate', 'mean')
+        self.baseline = manifest.get('baseline', 0.0)
+        self.source_digest = manifest['source_digest']
+        for name in NODE_ARRAYS:
+            # a plain ndarray view of the memmap: same pages, no per-index subclass overhead
+            setattr(self, name, np.asarray(arrays[name]))
+        self._lookups = [[{value: code for code, value in enumerate(c)} for c in step['categories']]
+                         if 'categories' in step else None for step in self.steps]
+
+    @classmethod
+    def load(cls, path=COMPACT_DIR, mmap=True):
+        """Load from the artifact directory (or its manifest); node arrays are memory-mapped."""
+        directory = os.path.dirname(path) if os.path.basename(path) == MANIFEST else path
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in NODE_ARRAYS}
+        return cls(manifest, arrays)
+
+    def known_categories(self):
+        """``{column: categories}`` accepted by every encoder, like ``price_model.known_categories``."""
+        categories = {}
+        for step in self.steps:
+            for column, values in zip(step['columns'], step.get('categories', [])):
+                values = np.asarray(values, dtype=object)
+                if column in categories:
+                    values = np.intersect1d(categories[column], values)
+                categories[column] = values
+        return categories
+
+    def transform(self, X):
+        """The preprocessor's feature matrix for frame ``X`` (float64; the walk casts as the trees need)."""
+        blocks = []
+        for step, lookups in zip(self.steps, self._lookups):
+            columns = step['columns']
+            if step['kind'] in ('scale', 'passthrough'):
+                values = np.column_stack([X[column].to_numpy(dtype=np.float64) for column in columns])
+                if step['kind'] == 'scale':
+                    values = (values - np.array(step['mean'])) / np.array(step['scale'])
+                blocks.append(values)
+            else:
+                codes = np.column_stack([np.fromiter((lookup.get(v, -1) for v in X[column].to_numpy(dtype=object)),
+                                                     np.int64, len(X)) for column, lookup in zip(columns, lookups)])
+                unknown = (codes < 0).any(axis=0)
+                if unknown.any():
+                    raise ValueError(f"unknown categories in {[c for c, u in zip(columns, unknown) if u]}")
+                if step['kind'] == 'ordinal':
+                    blocks.append(codes.astype(np.float64))
+                    continue
+                for i, (lookup, drop) in enumerate(zip(lookups, step['drop'])):
+                    hot = np.zeros((len(X), len(lookup)))
+                    hot[np.arange(len(X)), codes[:, i]] = 1.0
+                    blocks.append(np.delete(hot, drop, axis=1) if drop is not None else hot)
+        return np.hstack(blocks)
+
+    def _walk(self, features):
+        """Yield ``(start, leaf values)`` per block of preprocessed rows, one column per tree."""
+        n_trees = len(self.roots)
+        block = max(1, BLOCK_CELLS // n_trees)
+        for start in range(0, len(features), block):
+            rows = np.ascontiguousarray(features[start:start + block], dtype=self.threshold.dtype)
+            # one (row, tree) walker per cell; only walkers still on an internal node take a step
+            node = np.tile(self.roots, len(rows))
+            offset = np.repeat(np.arange(len(rows), dtype=np.int64) * rows.shape[1], n_trees)
+            flat = rows.ravel()
+            children = self.children
+            active = np.flatnonzero(children[2 * node] != node)
+            while active.size:
+                current = node[active]
+                go_right = flat[offset[active] + self.feature[current]] > self.threshold[current]
+                step = children[2 * current + go_right]
+                node[active] = step
+                active = active[children[2 * step] != step]
+            yield start, self.value[node].reshape(len(rows), n_trees)
+
+    def predict_matrix(self, features):
+        """Mean (forest) or baseline + sum (boosting) of the leaf values for preprocessed rows."""
+        out = np.empty(len(features))
+        for start, values in self._walk(features):
+            if self.aggregate == 'sum':
+                out[start:start + len(values)] = self.baseline + values.sum(axis=1, dtype=np.float64)
+            else:
+                out[start:start + len(values)] = values.mean(axis=1, dtype=np.float64)
+        return out
+
+    def tree_predictions(self, X):
+        """``(rows, trees)`` log1p prices of every tree for frame ``X``; ``None`` unless the trees are averaged."""
+        if self.aggregate != 'mean':
+            return None
+        features = self.transform(X)
+        out = np.empty((len(features), len(self.roots)), dtype=self.value.dtype)
+        for start, values in self._walk(features):
+            out[start:start + len(values)] = values
+        return out
+
+    def predict(self, X):
+        """Same as ``pipeline.predict`` (log1p price) for a frame over ``FEATURE_COLUMNS``."""
+        return self.predict_matrix(self.transform(X))
+
+
+# --- BENCHMARK ---
+
+def _timed(function, *args, repeat=1):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def benchmark(pipeline_path=PIPELINE_FILE, compact_path=COMPACT_DIR, data='df.pkl', repeat=20):
+    """Load time, single-row latency, batch time and agreement of the pickle against the compact model."""
+    X = pd.read_pickle(data)[FEATURE_COLUMNS]
+    load_pickle, pipeline = _timed(load_pipeline, pipeline_path)
+    load_compact, model = _timed(CompactModel.load, compact_path)
+    expected, actual = pipeline.predict(X), model.predict(X)
+    row = X.iloc[:1]
+    rows = []
+    for name, path, load, predictor in (('pickle', pipeline_path, load_pickle, pipeline),
+                                        ('compact', compact_path, load_compact, model)):
+        rows.append({'artifact': name, 'bytes': _size(path), 'load_s': load,
+                     'row_ms': _timed(predictor.predict, row, repeat=repeat)[0] * 1e3,
+                     'batch_s': _timed(predictor.predict, X, repeat=3)[0], 'rows': len(X)})
+    return pd.DataFrame(rows), float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export pipeline.pkl to the compact model format.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_cmd = sub.add_parser('export', help="write the compact artifact")
+    bench = sub.add_parser('bench', help="compare load time, latency and predictions with the pickle")
+    for command in (export_cmd, bench):
+        command.add_argument('--pipeline', default=PIPELINE_FILE)
+        command.add_argument('--output', default=COMPACT_DIR)
+    bench.add_argument('--data', default='df.pkl', help="rows to predict")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        start = time.perf_counter()
+        model = CompactModel.load(export(args.pipeline, args.output))
+        print(f"exported {len(model.roots)} trees ({len(model.value):,} nodes, depth {model.max_depth}) "
+              f"in {time.perf_counter() - start:.1f}s: {_size(args.pipeline) / 2 ** 20:.1f} MB -> "
+              f"{_size(args.output) / 2 ** 20:.1f} MB in {args.output}")
+    else:
+        results, max_diff = benchmark(args.pipeline, args.output, args.data)
+        with pd.option_context('display.width', 120, 'display.float_format', '{:.4f}'.format):
+            print(results.to_string(index=False))
+        print(f"max |log-price difference| {max_diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+"""Pre-aggregated filter cube for the Analysis dashboard.
+
+Rows of ``data_viz1.csv`` are grouped once into cells over
+``(sector, bedRoom, agePossession, property_type, price bucket)``.  Each cell
+keeps
+
+* count, sum, sum of squares, min and max of the numeric measures,
+* a log-spaced histogram of ``built_up_area`` (mergeable quantile sketch),
+* the set of its societies as a bitset, merged with OR for an exact distinct
+  count; only when the bitsets would exceed ``exact_distinct_bytes`` (many
+  cells times many societies) does the cube keep HyperLogLog registers
+  instead, and :attr:`Summary.distinct_exact` is then ``False``,
+* wordcloud token counts (see :mod:`realestate.wordclouds`).
+
+A dashboard selection is answered by merging the cells that match the
+selectboxes.  For the price slider, cells entirely inside the range are merged
+as they are; only the few cells that straddle a range edge are rescanned row by
+row.  The summary metrics, the map's per-sector table and the wordcloud
+frequencies come from that merge.
+
+The correlation heatmap needs ``4 x k x k`` pairwise moments (see
+:mod:`realestate.moments`), too large to keep per cell: cells are split by 64
+price buckets and hold one or two rows each.  The moments are kept instead per
+*group*, the filter dimensions times ``MOMENT_PRICE_BUCKETS`` coarse price
+buckets, whose number is bounded by the dimensions' categories, not by rows.
+:meth:`Summary.correlation` adds up the matching groups and rescans only the
+rows of groups that straddle a price range edge.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from realestate.datastore import read_parquet
+from realestate.moments import correlation, pairwise_moments, total_moments
+from realestate.wordclouds import TokenCounts, csr_arrays, csr_from_arrays
+DIMENSIONS = ('sector', 'bedRoom', 'agePossession', 'property_type')
+MEASURES = ('price', 'price_per_sqft', 'built_up_area', 'latitude', 'longitude')
+EXACT_DISTINCT_BYTES = 32 << 20  # society bitsets of all cells; beyond this, HyperLogLog
+MOMENT_PRICE_BUCKETS = 4  # price buckets per group of correlation moments
+# the arrays a FilterCube keeps as they are; to_arrays adds the labels, society hashes and token counts
+CUBE_ARRAYS = ('area_edges', 'cell_codes', 'cell_count', 'cell_sums', 'cell_sumsq', 'cell_min', 'cell_max',
+               'cell_hist', 'cell_societies', 'row_numeric', 'cell_rows', 'cell_offsets', 'row_values',
+               'row_area_bin', 'row_sector', 'group_codes', 'group_min', 'group_max', 'group_moments',
+               'group_rows', 'group_offsets')
+
+
+# --- SKETCHES ---
+
+def _bit_length(values):
+    """Exact bit length of uint64 values (0 for 0)."""
+    values = values.astype(np.uint64)
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        values = np.where(big, values >> np.uint64(shift), values)
+    return length + (values > 0)
+
+
+def hll_hash(values, precision):
+    """Register index and rank for each value (HyperLogLog with 2**precision registers)."""
+    hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - _bit_length(rest) + 1
+    return index, rank.astype(np.uint8)
+
+
+def hll_estimate(registers):
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # linear counting is far more accurate for small cardinalities
+        estimate = m * np.log(m / zeros)
+    return estimate
+
+
+def histogram_quantile(counts, edges, q):
+    """Quantile of a binned distribution, ``pandas``-style (linear between order statistics).
+
+    Each order statistic is placed at the geometric centre of its bin, so the
+    error is at most half a bin width.
+    """
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    position = q * (total - 1)
+    ranks = np.array([np.floor(position), np.ceil(position)])
+    bins = np.searchsorted(np.cumsum(counts), ranks, side='right')
+    centres = np.sqrt(edges[bins] * edges[bins + 1])
+    return centres[0] + (position - ranks[0]) * (centres[1] - centres[0])
+
+
+# --- SUMMARY ---
+
+@dataclass
+class Summary:
+    count: int
+    sums: np.ndarray
+    sumsq: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    area_hist: np.ndarray
+    societies: np.ndarray  # packed society bitset, or HyperLogLog registers when not distinct_exact
+    sector_counts: np.ndarray
+    sector_sums: np.ndarray
+    cells: np.ndarray
+    extra_rows: np.ndarray
+    moment_groups: np.ndarray  # mask of the moment groups inside the selection
+    straddling_groups: np.ndarray  # ids of the groups only partly inside the price range
+    price_range: tuple
+    token_counts: np.ndarray
+    cube: 'FilterCube'
+
+    def mean(self, measure):
+        return self.sums[MEASURES.index(measure)] / self.count if self.count else np.nan
+
+    def std(self, measure):
+        i = MEASURES.index(measure)
+        if self.count < 2:
+            return np.nan
+        variance = (self.sumsq[i] - self.sums[i] ** 2 / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def min(self, measure):
+        return self.minimum[MEASURES.index(measure)]
+
+    def max(self, measure):
+        return self.maximum[MEASURES.index(measure)]
+
+    def area_quantile(self, q=0.5):
+        return histogram_quantile(self.area_hist, self.cube.area_edges, q)
+
+    @property
+    def distinct_exact(self):
+        return self.cube.distinct_exact
+
+    def distinct_societies(self):
+        """Distinct societies among the selected rows; an estimate unless ``distinct_exact``."""
+        if not self.count:
+            return 0
+        if self.distinct_exact:
+            return int(np.unpackbits(self.societies).sum())
+        return int(round(hll_estimate(self.societies)))
+
+    def rows(self):
+        """Ids of the selected rows: those of the merged cells, then the rescanned ones."""
+        cube = self.cube
+        runs = [cube.cell_rows[cube.cell_offsets[c]:cube.cell_offsets[c + 1]] for c in self.cells]
+        return np.concatenate(runs + [self.extra_rows])
+
+    def correlation(self):
+        """``corr()`` of the numeric columns over the selected rows, from the groups' merged moments."""
+        cube = self.cube
+        k = len(cube.numeric_columns)
+        moments = (self.moment_groups.astype(np.float64) @ cube.group_moments).reshape(4, k, k)
+        if len(self.straddling_groups):
+            rows = np.concatenate([cube.group_rows[cube.group_offsets[g]:cube.group_offsets[g + 1]]
+                                   for g in self.straddling_groups])
+            price = cube.row_values[rows, MEASURES.index('price')]
+            rows = rows[(price >= self.price_range[0]) & (price <= self.price_range[1])]
+            moments = moments + total_moments(cube.row_numeric[rows])
+        return correlation(moments, cube.numeric_columns)
+
+    def word_frequencies(self):
+        """``{token: count}`` over ``property_type``, ``society`` and ``agePossession``."""
+        return self.cube.tokens.frequencies(self.token_counts)
+
+    def by_sector(self):
+        """Per-sector means of every measure, like ``groupby('sector').mean()``."""
+        present = self.sector_counts > 0
+        means = self.sector_sums[present] / self.sector_counts[present, None]
+        frame = pd.DataFrame(means, columns=list(MEASURES))
+        frame.insert(0, 'sector', self.cube.labels['sector'][present])
+        return frame
+
+
+# --- CUBE ---
+
+class FilterCube:
+    def __init__(self, df, n_price_buckets=64, area_bins=256, hll_precision=10, numeric_columns=None,
+                 exact_distinct_bytes=EXACT_DISTINCT_BYTES, moment_price_buckets=MOMENT_PRICE_BUCKETS):
+        self.hll_precision = hll_precision
+        n = len(df)
+
+        self.labels = {}
+        codes = np.empty((n, len(DIMENSIONS) + 1), dtype=np.int64)
+        for d, dim in enumerate(DIMENSIONS):
+            # string labels, matching the dashboard's selectbox values
+            categorical = pd.Categorical(df[dim].astype(str))
+            self.labels[dim] = np.asarray(categorical.categories, dtype=object)
+            codes[:, d] = categorical.codes
+        self._lookup = {dim: {label: i for i, label in enumerate(self.labels[dim])} for dim in DIMENSIONS}
+
+        values = df[list(MEASURES)].to_numpy(dtype=np.float64)
+        price = values[:, 0]
+        price_edges = np.unique(np.quantile(price, np.linspace(0, 1, n_price_buckets + 1)))
+        codes[:, -1] = np.clip(np.searchsorted(price_edges, price, side='right') - 1, 0, len(price_edges) - 2)
+
+        area = values[:, MEASURES.index('built_up_area')]
+        positive = area[area > 0]
+        low, high = (positive.min(), positive.max()) if len(positive) else (1.0, 2.0)
+        self.area_edges = np.geomspace(low, high * (1 + 1e-9), area_bins + 1)
+        area_bin = np.clip(np.searchsorted(self.area_edges, area, side='right') - 1, 0, area_bins - 1)
+
+        cell_keys, row_cell = np.unique(codes, axis=0, return_inverse=True)
+        row_cell = row_cell.ravel()
+        n_cells = len(cell_keys)
+        self.cell_codes = cell_keys
+        self.cell_count = np.bincount(row_cell, minlength=n_cells)
+        self.cell_sums = np.stack([np.bincount(row_cell, values[:, i], n_cells) for i in range(len(MEASURES))], 1)
+        self.cell_sumsq = np.stack([np.bincount(row_cell, values[:, i] ** 2, n_cells)
+                                    for i in range(len(MEASURES))], 1)
+        self.cell_min = np.full((n_cells, len(MEASURES)), np.inf)
+        self.cell_max = np.full((n_cells, len(MEASURES)), -np.inf)
+        np.minimum.at(self.cell_min, row_cell, values)
+        np.maximum.at(self.cell_max, row_cell, values)
+        self.cell_hist = np.zeros((n_cells, area_bins), dtype=np.uint32)
+        np.add.at(self.cell_hist, (row_cell, area_bin), 1)
+        society, names = pd.factorize(df['society'])
+        self.distinct_exact = n_cells * ((len(names) + 7) // 8) <= exact_distinct_bytes
+        if self.distinct_exact:
+            # row -> (byte, bit) of its society; missing societies (code -1) are not counted, as in nunique()
+            code = np.maximum(society, 0)
+            self.row_society = (code >> 3, np.where(society >= 0, 128 >> (code & 7), 0).astype(np.uint8))
+            self.cell_societies = np.zeros((n_cells, (len(names) + 7) // 8), dtype=np.uint8)
+        else:
+            self.row_society = hll_hash(df['society'].astype(str).to_numpy(), hll_precision)
+            self.cell_societies = np.zeros((n_cells, 1 << hll_precision), dtype=np.uint8)
+        self._merge_societies(self.cell_societies, (row_cell, self.row_society[0]), self.row_society[1])
+
+        self.numeric_columns = list(df.select_dtypes('number').columns if numeric_columns is None
+                                    else numeric_columns)
+        numeric = df[self.numeric_columns].to_numpy(dtype=np.float64)
+        # centring on the global mean keeps sumsq - sums**2 / n well conditioned
+        present = ~np.isnan(numeric)
+        shift = np.where(present, numeric, 0.0).sum(axis=0) / np.maximum(present.sum(axis=0), 1)
+        self.row_numeric = numeric - shift
+
+        # correlation moments per (dimensions, coarse price bucket) group, flattened to 4 * k * k per group
+        moment_edges = np.unique(np.quantile(price, np.linspace(0, 1, moment_price_buckets + 1)))
+        moment_bucket = np.clip(np.searchsorted(moment_edges, price, side='right') - 1, 0, len(moment_edges) - 2)
+        self.group_codes, row_group = np.unique(np.column_stack([codes[:, :-1], moment_bucket]), axis=0,
+                                                return_inverse=True)
+        row_group = row_group.ravel()
+        n_groups = len(self.group_codes)
+        self.group_min = np.full(n_groups, np.inf)
+        self.group_max = np.full(n_groups, -np.inf)
+        np.minimum.at(self.group_min, row_group, price)
+        np.maximum.at(self.group_max, row_group, price)
+        moments = pairwise_moments(self.row_numeric, row_group, n_groups)
+        self.group_moments = np.ascontiguousarray(moments.transpose(1, 0, 2, 3)).reshape(n_groups, -1)
+        self.group_rows = np.argsort(row_group, kind='stable')
+        self.group_offsets = np.concatenate([[0], np.cumsum(np.bincount(row_group, minlength=n_groups))])
+
+        self.tokens = TokenCounts(df)
+        self.cell_tokens = self.tokens.sum_by(row_cell, n_cells)
+
+        # rows grouped by cell, for the cells a price range only partly covers
+        self.cell_rows = np.argsort(row_cell, kind='stable')
+        self.cell_offsets = np.concatenate([[0], np.cumsum(self.cell_count)])
+        self.row_values = values
+        self.row_area_bin = area_bin
+        self.row_sector = codes[:, 0]
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls(pd.read_csv(path))
+
+    @classmethod
+    def from_parquet(cls, path):
+        return cls(read_parquet(path))
+
+    def to_arrays(self):
+        """Everything a query reads, as named arrays (strings as fixed-width text) for shared memory."""
+        arrays = {name: getattr(self, name) for name in CUBE_ARRAYS}
+        arrays.update({f'labels_{dim}': self.labels[dim].astype(str) for dim in DIMENSIONS})
+        arrays.update({'row_society_index': self.row_society[0], 'row_society_value': self.row_society[1],
+                       'numeric_columns': np.array(self.numeric_columns, dtype=str),
+                       'hll_precision': np.int64(self.hll_precision), 'distinct_exact': np.bool_(self.distinct_exact),
+                       **self.tokens.to_arrays('tokens'), **csr_arrays(self.cell_tokens, 'cell_tokens')})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """The cube of :meth:`to_arrays` over those arrays as given (memory-mapped ones stay mapped)."""
+        cube = cls.__new__(cls)
+        for name in CUBE_ARRAYS:
+            setattr(cube, name, arrays[name])
+        cube.labels = {dim: arrays[f'labels_{dim}'].astype(object) for dim in DIMENSIONS}
+        cube._lookup = {dim: {label: i for i, label in enumerate(cube.labels[dim])} for dim in DIMENSIONS}
+        cube.row_society = (arrays['row_society_index'], arrays['row_society_value'])
+        cube.numeric_columns = arrays['numeric_columns'].tolist()
+        cube.hll_precision = int(arrays['hll_precision'].item())
+        cube.distinct_exact = bool(arrays['distinct_exact'].item())
+        cube.tokens = TokenCounts.from_arrays(arrays, 'tokens')
+        cube.cell_tokens = csr_from_arrays(arrays, 'cell_tokens')
+        return cube
+
+    def __len__(self):
+        return len(self.cell_count)
+
+    def _merge_societies(self, target, at, values):
+        """Add rows to society sets in place: OR into bitsets, max into HyperLogLog registers."""
+        (np.bitwise_or if self.distinct_exact else np.maximum).at(target, at, values)
+
+    def options(self, dim):
+        return sorted(self.labels[dim])
+
+    def _cell_mask(self, selection, codes=None):
+        """Mask of the cells (or of the rows of ``codes``, keyed on ``DIMENSIONS`` first) in ``selection``."""
+        codes = self.cell_codes if codes is None else codes
+        mask = np.ones(len(codes), dtype=bool)
+        for d, dim in enumerate(DIMENSIONS):
+            label = selection.get(dim)
+            if label is None:
+                continue
+            code = self._lookup[dim].get(str(label))
+            if code is None:
+                return np.zeros(len(codes), dtype=bool)
+            mask &= codes[:, d] == code
+        return mask
+
+    def _price_split(self, selected, low, high, price_range):
+        """``(inside, straddling)`` masks of the ``selected`` cells or groups whose prices span ``low..high``."""
+        if price_range is None:
+            return selected, np.zeros_like(selected)
+        inside = (low >= price_range[0]) & (high <= price_range[1])
+        overlap = (high >= price_range[0]) & (low <= price_range[1])
+        return selected & inside, selected & overlap & ~inside
+
+    def summarize(self, price_range=None, **selection):
+        """Merge the cells for a selection, e.g. ``summarize(sector='sector 45', price_range=(1, 3))``.
+
+        Keyword names are the ``DIMENSIONS``; ``None`` means "All".
+        """
+        unknown = set(selection) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimensions: {sorted(unknown)}")
+        p = MEASURES.index('price')
+        full, partial = self._price_split(self._cell_mask(selection), self.cell_min[:, p], self.cell_max[:, p],
+                                          price_range)
+        groups, straddling = self._price_split(self._cell_mask(selection, self.group_codes), self.group_min,
+                                               self.group_max, price_range)
+
+        n_sectors = len(self.labels['sector'])
+        sectors = self.cell_codes[full, 0]
+        sector_counts = np.bincount(sectors, self.cell_count[full], n_sectors)
+        sector_sums = np.stack([np.bincount(sectors, self.cell_sums[full, i], n_sectors)
+                                for i in range(len(MEASURES))], 1)
+        summary = Summary(
+            count=int(self.cell_count[full].sum()),
+            sums=self.cell_sums[full].sum(axis=0),
+            sumsq=self.cell_sumsq[full].sum(axis=0),
+            minimum=self.cell_min[full].min(axis=0, initial=np.inf),
+            maximum=self.cell_max[full].max(axis=0, initial=-np.inf),
+            area_hist=self.cell_hist[full].sum(axis=0, dtype=np.int64),
+            societies=np.bitwise_or.reduce(self.cell_societies[full], axis=0) if self.distinct_exact
+            else self.cell_societies[full].max(axis=0, initial=0),
+            sector_counts=sector_counts, sector_sums=sector_sums,
+            cells=np.flatnonzero(full), extra_rows=np.array([], dtype=np.int64),
+            moment_groups=groups, straddling_groups=np.flatnonzero(straddling), price_range=price_range,
+            token_counts=np.asarray(self.cell_tokens[full].sum(axis=0)).ravel(), cube=self)
+
+        if partial.any():
+            cells = np.flatnonzero(partial)
+            rows = np.concatenate([self.cell_rows[self.cell_offsets[c]:self.cell_offsets[c + 1]] for c in cells])
+            price = self.row_values[rows, p]
+            self._add_rows(summary, rows[(price >= price_range[0]) & (price <= price_range[1])])
+        return summary
+
+    def _add_rows(self, summary, rows):
+        values = self.row_values[rows]
+        summary.count += len(rows)
+        summary.sums = summary.sums + values.sum(axis=0)
+        summary.sumsq = summary.sumsq + (values ** 2).sum(axis=0)
+        summary.minimum = np.minimum(summary.minimum, values.min(axis=0, initial=np.inf))
+        summary.maximum = np.maximum(summary.maximum, values.max(axis=0, initial=-np.inf))
+        summary.area_hist = summary.area_hist + np.bincount(self.row_area_bin[rows], minlength=len(summary.area_hist))
+        societies = summary.societies.copy()
+        self._merge_societies(societies, self.row_society[0][rows], self.row_society[1][rows])
+        summary.societies = societies
+        n_sectors = len(summary.sector_counts)
+        sectors = self.row_sector[rows]
+        summary.sector_counts = summary.sector_counts + np.bincount(sectors, minlength=n_sectors)
+        summary.sector_sums = summary.sector_sums + np.stack(
+            [np.bincount(sectors, values[:, i], n_sectors) for i in range(len(MEASURES))], 1)
+        summary.extra_rows = np.concatenate([summary.extra_rows, rows])
+        summary.token_counts = summary.token_counts + np.asarray(self.tokens.rows[rows].sum(axis=0)).ravel()
@@ -0,0 +1,213 @@
+"""Typed Parquet copies of the project's CSV snapshots.
+
+Each CSV stage (``gurgaon_properties_*.csv``, ``data_viz1.csv``, ...) gets a
+Parquet twin under ``store/`` with
+
+* categorical dtypes for ``sector``, ``society``, ``agePossession`` and any
+  other text column with few distinct values,
+* float32 for numeric columns that round-trip losslessly, and for the area
+  measurements where seven significant digits are plenty (``price`` and the
+  coordinates always stay float64),
+* rows ordered by ``sector`` so a sector filter skips whole row groups; the
+  original row order is restored on read.
+
+Readers ask for just the columns and sectors they need::
+
+    from realestate import datastore
+    df = datastore.read('data_viz1.csv', columns=['sector', 'price'], sectors=['sector 45'])
+
+The Parquet file is (re)built on first use and whenever the CSV's content
+changes.  Build all of them, or compare them with the CSV reads, with::
+
+    python -m realestate.datastore convert
+    python -m realestate.datastore bench
+"""
+import argparse
+import glob
+import os
+import time
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from realestate.artifacts import file_digest
+
+STORE_DIR = 'store'
+CATEGORICAL_COLUMNS = ('sector', 'society', 'agePossession', 'property_type')
+FLOAT32_COLUMNS = ('area', 'built_up_area', 'super_built_up_area', 'carpet_area', 'price_per_sqft',
+                   'area_room_ratio')
+FLOAT64_COLUMNS = ('price', 'latitude', 'longitude')
+ROW_GROUP_SIZE = 16384
+SNAPSHOTS = ('gurgaon_properties_*.csv', 'data_viz1.csv')
+_SOURCE_KEY = b'realestate.source'
+_verified = {}  # (csv, parquet) -> their (mtime, size) when last found fresh in this process
+
+
+def store_path(csv_path):
+    directory, name = os.path.split(csv_path)
+    return os.path.join(directory, STORE_DIR, os.path.splitext(name)[0] + '.parquet')
+
+
+def optimize_dtypes(df, max_category_ratio=0.5):
+    """Categorical text columns and float32 numerics where it is safe (returns a new frame)."""
+    out = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object and (column in CATEGORICAL_COLUMNS
+                                       or values.nunique() <= max_category_ratio * len(values)):
+            values = values.astype('category')
+        elif pd.api.types.is_float_dtype(values) and column not in FLOAT64_COLUMNS:
+            narrow = values.astype(np.float32)
+            lossless = np.array_equal(narrow.to_numpy(np.float64), values.to_numpy(np.float64), equal_nan=True)
+            if lossless or column in FLOAT32_COLUMNS:
+                values = narrow
+        out[column] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def materialize(csv_path, parquet_path=None):
+    """Write the typed Parquet twin of ``csv_path``; returns its path."""
+    parquet_path = parquet_path or store_path(csv_path)
+    df = optimize_dtypes(pd.read_csv(csv_path))
+    if 'sector' in df.columns:
+        df = df.sort_values('sector', kind='stable')
+
+    os.makedirs(os.path.dirname(parquet_path) or '.', exist_ok=True)
+    _write(pa.Table.from_pandas(df, preserve_index=True), csv_path, file_digest(csv_path), parquet_path)
+    return parquet_path
+
+
+def _write(table, csv_path, digest, parquet_path):
+    """Write ``table`` stamped with the CSV's ``mtime:size:digest``, atomically."""
+    stat = os.stat(csv_path)
+    source = f"{stat.st_mtime_ns}:{stat.st_size}:{digest}".encode()
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SOURCE_KEY: source})
+    tmp = f"{parquet_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, parquet_path)
+
+
+def _stats(*paths):
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, paths))
+
+
+def is_fresh(csv_path, parquet_path=None):
+    """``True`` if the Parquet twin holds the CSV's current content.
+
+    Files checked before in this process are only ``stat``-ed.  A CSV that was
+    touched but not changed is hashed once: the twin is then re-stamped with the
+    new ``(mtime, size)``, so later checks, here and in other processes, skip the
+    hash again.
+    """
+    parquet_path = parquet_path or store_path(csv_path)
+    if not os.path.exists(parquet_path):
+        return False
+    key = (os.path.abspath(csv_path), os.path.abspath(parquet_path))
+    if _verified.get(key) == _stats(csv_path, parquet_path):
+        return True
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    mtime_ns, size, digest = metadata.get(_SOURCE_KEY, b'::').decode().split(':')
+    stat = os.stat(csv_path)
+    if (mtime_ns, size) != (str(stat.st_mtime_ns), str(stat.st_size)):
+        if digest != file_digest(csv_path):
+            return False
+        _write(pq.read_table(parquet_path), csv_path, digest, parquet_path)
+    _verified[key] = _stats(csv_path, parquet_path)
+    return True
+
+
+def ensure(csv_path):
+    """Path of an up-to-date Parquet twin of ``csv_path``, building it if needed."""
+    parquet_path = store_path(csv_path)
+    if not is_fresh(csv_path, parquet_path):
+        materialize(csv_path, parquet_path)
+    return parquet_path
+
+
+def read_parquet(path, columns=None, sectors=None):
+    """Read a store file, projecting ``columns`` and pushing a ``sector`` filter down to the row groups."""
+    filters = [('sector', 'in', list(sectors))] if sectors is not None else None
+    table = pq.read_table(path, columns=list(columns) if columns is not None else None, filters=filters,
+                          use_pandas_metadata=True)
+    df = table.to_pandas()
+    return df.sort_index()
+
+
+def read(csv_path, columns=None, sectors=None):
+    return read_parquet(ensure(csv_path), columns, sectors)
+
+
+@lru_cache(maxsize=None)
+def projected(columns=None, sectors=None):
+    """Loader for ``artifacts.get`` that reads only ``columns``/``sectors`` (tuples).
+
+    The same arguments give the same loader object, so the registry keeps one
+    entry per projection.
+    """
+    return partial(read_parquet, columns=columns, sectors=sectors)
+
+
+# --- BENCHMARK ---
+
+def _measure(load):
+    start = time.perf_counter()
+    df = load()
+    seconds = time.perf_counter() - start
+    return seconds, int(df.memory_usage(deep=True).sum()), len(df)
+
+
+def benchmark(csv_path, repeat=5, columns=None, sectors=None):
+    """Best-of-``repeat`` load time and memory of the CSV against its Parquet twin."""
+    parquet_path = ensure(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = columns or [c for c in ('sector', 'price', 'built_up_area') if c in header]
+    if sectors is None and 'sector' in header:
+        sectors = pd.read_csv(csv_path, usecols=['sector'])['sector'].value_counts().index[:3].tolist()
+
+    cases = {
+        'csv': lambda: pd.read_csv(csv_path),
+        'parquet': lambda: read_parquet(parquet_path),
+        'parquet (columns)': lambda: read_parquet(parquet_path, columns),
+    }
+    if sectors:
+        cases['parquet (columns, sectors)'] = lambda: read_parquet(parquet_path, columns, sectors)
+
+    rows = []
+    for case, load in cases.items():
+        runs = [_measure(load) for _ in range(repeat)]
+        rows.append({'file': os.path.basename(csv_path), 'read': case, 'seconds': min(r[0] for r in runs),
+                     'memory_mb': runs[0][1] / 2 ** 20, 'rows': runs[0][2]})
+    return pd.DataFrame(rows)
+
+
+def _snapshots(paths):
+    return paths or sorted({path for pattern in SNAPSHOTS for path in glob.glob(pattern)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed Parquet copies of the CSV snapshots.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    convert = sub.add_parser('convert', help="(re)build the Parquet files")
+    convert.add_argument('csv', nargs='*', help="default: every pipeline snapshot CSV")
+    convert.add_argument('--force', action='store_true', help="rebuild even if up to date")
+    bench = sub.add_parser('bench', help="compare load time and memory against the CSV reads")
+    bench.add_argument('csv', nargs='*')
+    bench.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        for csv_path in _snapshots(args.csv):
+            fresh = not args.force and is_fresh(csv_path)
+            parquet_path = store_path(csv_path) if fresh else materialize(csv_path)
+            print(f"{csv_path} -> {parquet_path}{' (up to date)' if fresh else ''}")
+    else:
+        results = pd.concat([benchmark(path, args.repeat) for path in _snapshots(args.csv)], ignore_index=True)
+        with pd.option_context('display.width', 120, 'display.float_format', '{:.4f}'.format):
+            print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Hidden diagnostics view, shown by ``Home.py`` when opened with ``?diag=1``.
+
+Everything comes from this process: :mod:`realestate.instrumentation`'s
+latency histograms, counters, registered caches and captured profiles, and the
+artifact registry's memory use per page.  Open any page with
+``?profile=cprofile`` (or ``?profile=pyinstrument``) to capture a profile of
+that run.
+"""
+import os
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+from realestate import artifacts
+from realestate.instrumentation import metrics
+
+TAIL_LINES = 1000
+
+
+def _tail(path, n=TAIL_LINES):
+    """The last ``n`` lines of ``path``, streamed so only they are held in memory."""
+    with open(path) as file:
+        return ''.join(deque(file, maxlen=n))
+
+
+def artifact_memory_by_page(stats):
+    """Memory of the loaded artifacts summed per page that uses them (shared artifacts count for each)."""
+    rows = stats.assign(page=stats['pages'].str.split(', ')).explode('page')
+    return rows.groupby('page', as_index=False).agg(artifacts=('artifact', 'count'), memory_mb=('memory_mb', 'sum'))
+
+
+def render():
+    st.title("🩺 Diagnostics")
+    st.caption("Per-process metrics since start-up. Add ?profile=cprofile to a page's URL to profile one run.")
+
+    st.subheader("Latency")
+    latency = pd.DataFrame(metrics.latency())
+    if latency.empty:
+        st.info("Nothing timed yet: open the other pages first.")
+    else:
+        pages = sorted(latency['page'].unique())
+        page = st.selectbox("Page", ['All'] + pages)
+        shown = latency if page == 'All' else latency[latency['page'] == page]
+        st.dataframe(shown.round(3), hide_index=True, use_container_width=True)
+
+    st.subheader("Counters")
+    st.dataframe(pd.DataFrame(metrics.counts(), columns=['page', 'name', 'count']), hide_index=True,
+                 use_container_width=True)
+
+    st.subheader("Caches")
+    st.dataframe(pd.DataFrame(metrics.cache_info()).round(3), hide_index=True, use_container_width=True)
+
+    st.subheader("Artifacts")
+    stats = artifacts.stats()
+    st.dataframe(stats.round(3), hide_index=True, use_container_width=True)
+    if not stats.empty:
+        st.dataframe(artifact_memory_by_page(stats).round(2), hide_index=True, use_container_width=True)
+
+    st.subheader("Profiles")
+    if not metrics.profiles:
+        st.info("No profiles captured.")
+    for profile in reversed(metrics.profiles):
+        label = f"{profile['page']} ({profile['profiler']}, {profile['total_ms']:.0f} ms) at " \
+                f"{pd.Timestamp(profile['ts'], unit='s'):%H:%M:%S}"
+        with st.expander(label):
+            st.code(profile['text'], language=None)
+
+    st.subheader("Log")
+    if metrics.log_file and os.path.exists(metrics.log_file):
+        st.caption(f"{metrics.log_file}: {os.path.getsize(metrics.log_file) / 1024:.0f} KB, one JSON line per page run")
+        st.download_button("Download the last runs (JSONL)", _tail(metrics.log_file),
+                           file_name=os.path.basename(metrics.log_file), mime="application/jsonl")
+    else:
+        st.caption("No page runs logged yet.")
@@ -0,0 +1,204 @@
+"""Row-level filter index for the Analysis dashboard.
+
+The dashboard's sidebar selectboxes and the charts' property type filter
+match one value per column, and the price slider is a range.  Instead of
+casting and comparing whole columns on every rerun, :class:`FilterIndex`
+encodes each filter column once as categorical codes (over the same string
+labels the selectboxes show) and keeps, per value,
+
+* a posting list: the value's row ids, a slice of one code-sorted row order,
+* a bitmap: one bit per row, packed eight rows to a byte,
+
+plus the rows in price order with the sorted prices, so a price range is two
+binary searches.  A query starts from the smallest candidate set (a posting
+list or the price slice) and ANDs the other filters into it by probing their
+bitmaps, so its cost follows the size of the answer, not of the table.
+Results are row-id arrays; an unfiltered column or price range hands back
+a view of the stored arrays rather than a copy.
+
+    python -m realestate.filters data_viz1.csv --queries 2000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.datastore import ensure, read_parquet
+
+FILTER_COLUMNS = ('sector', 'bedRoom', 'agePossession', 'property_type')
+PRICE_COLUMN = 'price'
+
+
+class FilterIndex:
+    def __init__(self, df, columns=FILTER_COLUMNS, price=PRICE_COLUMN):
+        self.n_rows = len(df)
+        self.columns = tuple(columns)
+        self.all_rows = np.arange(self.n_rows)
+        self.labels, self.codes, self.orders, self.offsets, self.bitmaps, self._lookup = {}, {}, {}, {}, {}, {}
+        for column in self.columns:
+            values = df[column]
+            # string labels of the non-missing values, as the selectboxes list them; missing rows get code -1
+            codes, labels = pd.factorize(values.astype(str).where(values.notna()), sort=True)
+            self.labels[column] = np.asarray(labels, dtype=object)
+            self.codes[column] = codes
+            self._lookup[column] = {label: code for code, label in enumerate(labels)}
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+            self.orders[column] = order[len(codes) - counts.sum():]
+            self.offsets[column] = np.concatenate([[0], np.cumsum(counts)])
+            self.bitmaps[column] = self._bitmaps(self.orders[column], counts)
+
+        self.price = df[price].to_numpy(dtype=np.float64)
+        self.price_order = np.argsort(self.price, kind='stable')
+        self.sorted_price = self.price[self.price_order]
+
+    def _bitmaps(self, order, counts):
+        """Packed per-label bitmaps set straight from the code-sorted row ids, big-endian like ``np.packbits``.
+
+        Within a label the ids ascend, so the (label, byte) slots ascend too and
+        each slot's bits are OR-ed together in one ``reduceat``.
+        """
+        n_bytes = (self.n_rows + 7) // 8
+        bitmaps = np.zeros(len(counts) * n_bytes, dtype=np.uint8)
+        if len(order):
+            slots = np.repeat(np.arange(len(counts)) * n_bytes, counts) + (order >> 3)
+            bits = (0x80 >> (order & 7)).astype(np.uint8)
+            starts = np.flatnonzero(np.concatenate([[True], slots[1:] != slots[:-1]]))
+            bitmaps[slots[starts]] = np.bitwise_or.reduceat(bits, starts)
+        return bitmaps.reshape(len(counts), n_bytes)
+
+    @classmethod
+    def from_parquet(cls, path):
+        return cls(read_parquet(path, columns=list(FILTER_COLUMNS) + [PRICE_COLUMN]))
+
+    def to_arrays(self):
+        """The index as named arrays (labels as fixed-width text), for shared memory."""
+        arrays = {'columns': np.array(self.columns, dtype=str), 'price': self.price, 'price_order': self.price_order,
+                  'sorted_price': self.sorted_price}
+        for column in self.columns:
+            arrays.update({f'labels_{column}': self.labels[column].astype(str), f'codes_{column}': self.codes[column],
+                           f'orders_{column}': self.orders[column], f'offsets_{column}': self.offsets[column],
+                           f'bitmaps_{column}': self.bitmaps[column]})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """The index of :meth:`to_arrays` over those arrays as given (memory-mapped ones stay mapped)."""
+        index = cls.__new__(cls)
+        index.columns = tuple(arrays['columns'].tolist())
+        index.price = arrays['price']
+        index.price_order, index.sorted_price = arrays['price_order'], arrays['sorted_price']
+        index.n_rows = len(index.price)
+        index.all_rows = np.arange(index.n_rows)
+        for name in ('labels', 'codes', 'orders', 'offsets', 'bitmaps'):
+            setattr(index, name, {column: arrays[f'{name}_{column}'] for column in index.columns})
+        index.labels = {column: labels.astype(object) for column, labels in index.labels.items()}
+        index._lookup = {column: {label: code for code, label in enumerate(labels)}
+                         for column, labels in index.labels.items()}
+        return index
+
+    def options(self, column):
+        """Sorted distinct labels of ``column`` (missing values left out)."""
+        return self.labels[column].tolist()
+
+    def posting(self, column, label):
+        """Row ids with ``column == label`` in row order, as a view; empty for an unknown label."""
+        code = self._lookup[column].get(str(label))
+        if code is None:
+            return self.all_rows[:0]
+        return self.orders[column][self.offsets[column][code]:self.offsets[column][code + 1]]
+
+    def _has(self, column, label, rows):
+        """Mask over ``rows`` of the rows whose ``column`` is ``label`` (a bitmap probe)."""
+        bits = self.bitmaps[column][self._lookup[column][str(label)]]
+        shift = (7 - (rows & 7)).astype(np.uint8)
+        return ((bits[rows >> 3] >> shift) & 1).astype(bool)
+
+    def price_rows(self, low, high):
+        """Row ids with ``low <= price <= high`` in price order, as a view of the sorted order."""
+        start = np.searchsorted(self.sorted_price, low, side='left')
+        stop = np.searchsorted(self.sorted_price, high, side='right')
+        return self.price_order[start:stop]
+
+    def rows(self, price_range=None, **selection):
+        """Row ids matching every ``column=label`` in ``selection`` and the inclusive ``price_range``.
+
+        ``None`` means "All".  Ids come back in row order; with nothing to
+        filter on they are a view of the index's own arrays.
+        """
+        unknown = set(selection) - set(self.columns)
+        if unknown:
+            raise ValueError(f"unknown filter columns: {sorted(unknown)}")
+        selection = {column: label for column, label in selection.items() if label is not None}
+        if any(str(label) not in self._lookup[column] for column, label in selection.items()):
+            return self.all_rows[:0]
+
+        candidates = [(len(self.posting(column, label)), column) for column, label in selection.items()]
+        priced = None if price_range is None else self.price_rows(*price_range)
+        if priced is not None and (not candidates or len(priced) < min(candidates)[0]):
+            rows, probe = np.sort(priced), list(selection)
+        elif candidates:
+            smallest = min(candidates)[1]
+            rows, probe = self.posting(smallest, selection[smallest]), [c for c in selection if c != smallest]
+            if priced is not None:
+                price = self.price[rows]
+                rows = rows[(price >= price_range[0]) & (price <= price_range[1])]
+        else:
+            return self.all_rows
+        for column in probe:
+            rows = rows[self._has(column, selection[column], rows)]
+        return rows
+
+    def count(self, price_range=None, **selection):
+        return len(self.rows(price_range, **selection))
+
+
+# --- BENCHMARK ---
+
+def _pandas_rows(df, price_range, selection):
+    """The dashboard's original filtering: string casts and boolean masks on the frame."""
+    rows = df
+    for column, label in selection.items():
+        rows = rows[rows[column].astype(str) == label]
+    rows = rows[(rows[PRICE_COLUMN] >= price_range[0]) & (rows[PRICE_COLUMN] <= price_range[1])]
+    return np.flatnonzero(df.index.isin(rows.index))
+
+
+def benchmark(csv_path, n_queries=1000, seed=0):
+    """Mean per-query time of pandas masks against the index over random dashboard selections."""
+    df = read_parquet(ensure(csv_path), columns=list(FILTER_COLUMNS) + [PRICE_COLUMN]).reset_index(drop=True)
+    start = time.perf_counter()
+    index = FilterIndex(df)
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(n_queries):
+        selection = {column: rng.choice(index.options(column)) for column in FILTER_COLUMNS[:3]
+                     if rng.random() < 0.5}
+        low, high = np.sort(rng.choice(index.sorted_price, 2))
+        queries.append(((low, high), selection))
+
+    timings = {}
+    for name, query in (('pandas', lambda q: _pandas_rows(df, *q)), ('index', lambda q: index.rows(q[0], **q[1]))):
+        start = time.perf_counter()
+        results = [query(q) for q in queries]
+        timings[name] = ((time.perf_counter() - start) / n_queries, results)
+    agree = all(np.array_equal(a, b) for a, b in zip(timings['pandas'][1], timings['index'][1]))
+    return build, timings['pandas'][0], timings['index'][0], agree
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard filtering with pandas masks and the index.")
+    parser.add_argument('csv', nargs='?', default='data_viz1.csv')
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    build, pandas_s, index_s, agree = benchmark(args.csv, args.queries)
+    print(f"index built in {build * 1e3:.1f} ms; per query: pandas {pandas_s * 1e3:.3f} ms, "
+          f"index {index_s * 1e3:.3f} ms ({pandas_s / index_s:.0f}x); results agree: {agree}")
+
+
+if __name__ == '__main__':
+    main()
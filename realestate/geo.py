@@ -0,0 +1,332 @@
+"""Geospatial index for the "Select Location and Radius" search.
+
+The radius search used to compare one ``location_df`` column against the
+radius, so it only worked for landmarks an apartment listing happened to
+mention.  Here apartments, landmarks and sectors all get a latitude/longitude
+and live in haversine ``BallTree``s, which answer "within R km of X" and
+"k nearest to X" for any point.
+
+Coordinates are resolved offline:
+
+* sectors come from ``latlong.csv``;
+* an apartment starts at its sector centroid (parsed from ``PropertySubName``);
+* landmarks are trilaterated from the apartments' ``LocationAdvantages``
+  distances, and apartments are then refined against those landmarks;
+* an optional ``landmarks_latlong.csv`` (``name,latitude,longitude``) pins
+  known landmarks instead of estimating them.
+
+Build the index with::
+
+    python -m realestate.geo
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from realestate.similarity import load_apartments, parse_location_advantages
+
+GEO_FILE = 'geo_index.npz'
+LANDMARKS_FILE = 'landmarks_latlong.csv'
+EARTH_RADIUS_KM = 6371.0088
+KINDS = ('apartment', 'landmark', 'sector')
+
+
+def parse_coordinates(coordinates):
+    """``'28.3663° N, 76.9456° E'`` -> ``(28.3663, 76.9456)``."""
+    values = []
+    for part in coordinates.split(','):
+        number, hemisphere = re.match(r"\s*([\d.]+)°\s*([NSEW])", part).groups()
+        values.append(float(number) * (-1 if hemisphere in 'SW' else 1))
+    return tuple(values)
+
+
+def load_sectors(path='latlong.csv'):
+    df = pd.read_csv(path)
+    coords = df['coordinates'].apply(parse_coordinates)
+    return {sector: coord for sector, coord in zip(df['sector'], coords)}
+
+
+def apartment_sector(sub_name, sectors):
+    """Map ``'2, 3 BHK Apartment in Sector 70A, Gurgaon'`` to a ``latlong.csv`` sector."""
+    match = re.search(r' in (.+?),\s*Gurgaon', str(sub_name))
+    if not match:
+        return None
+    sector = re.sub(r'\s+', ' ', match.group(1).lower().strip())
+    sector = re.sub(r'^sector (\d+) ([a-z])$', r'sector \1\2', sector)
+    if sector in sectors:
+        return sector
+    # sub-sectors ('sector 70a') fall back to their parent sector
+    parent = re.match(r'^(sector \d+)[a-z]$', sector)
+    if parent and parent.group(1) in sectors:
+        return parent.group(1)
+    return None
+
+
+# --- TRILATERATION (local tangent plane, km) ---
+
+def _to_plane(lat, lon, origin):
+    lat0, lon0 = origin
+    x = np.radians(np.asarray(lon) - lon0) * np.cos(np.radians(lat0)) * EARTH_RADIUS_KM
+    y = np.radians(np.asarray(lat) - lat0) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+def _from_plane(xy, origin):
+    lat0, lon0 = origin
+    lat = lat0 + np.degrees(xy[:, 1] / EARTH_RADIUS_KM)
+    lon = lon0 + np.degrees(xy[:, 0] / (EARTH_RADIUS_KM * np.cos(np.radians(lat0))))
+    return lat, lon
+
+
+def trilaterate(anchors, distances, start=None, iterations=50, max_step=2.0):
+    """Point whose distances to ``anchors`` best match ``distances``.
+
+    Damped Gauss-Newton with a capped step, so badly conditioned anchor sets
+    drift slowly instead of jumping away.  Returns ``(point, rms_residual)``.
+    """
+    weights = 1.0 / (distances + 0.5)
+    point = np.average(anchors, axis=0, weights=weights) if start is None else np.array(start, dtype=float)
+    for _ in range(iterations):
+        delta = point - anchors
+        ranges = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-6)
+        jacobian = delta / ranges[:, None]
+        residual = ranges - distances
+        step = np.linalg.solve(jacobian.T @ jacobian + 1e-3 * np.eye(2), -jacobian.T @ residual)
+        norm = np.hypot(*step)
+        if norm > max_step:
+            step *= max_step / norm
+        point = point + step
+        if norm < 1e-4:
+            break
+    residual = np.hypot(*(point - anchors).T) - distances
+    return point, float(np.sqrt(np.mean(residual ** 2)))
+
+
+def _solve(observations, anchor_xy, anchor_ok, starts, min_anchors, max_rms=2.0):
+    """Trilaterate every target from its observed (anchor, km) pairs.
+
+    Targets with too few distinct anchors, or whose fit stays more than
+    ``max_rms`` km off the stated distances, are skipped.
+    """
+    solved = {}
+    for target, pairs in observations.items():
+        pairs = [(a, d) for a, d in pairs if anchor_ok[a]]
+        anchors = np.array([anchor_xy[a] for a, _ in pairs]).reshape(-1, 2)
+        # co-located anchors do not constrain the position
+        if len(np.unique(np.round(anchors, 3), axis=0)) < min_anchors:
+            continue
+        dists = np.array([d for _, d in pairs])
+        point, rms = trilaterate(anchors, dists, starts.get(target))
+        if rms <= max_rms:
+            solved[target] = point
+    return solved
+
+
+def geocode(apartments, sectors, known_landmarks=None, distances=None, rounds=2, min_anchors=3):
+    """Resolve apartment and landmark coordinates.
+
+    ``distances`` are the parsed ``LocationAdvantages`` dicts, one per apartment
+    (parsed here when omitted).  Returns two frames indexed by name with
+    ``latitude``/``longitude`` columns; places that cannot be resolved are left out.
+    """
+    known_landmarks = known_landmarks or {}
+    names = apartments['PropertyName'].tolist()
+    if distances is None:
+        distances = [_parse_distances(s) for s in apartments['LocationAdvantages']]
+    landmarks = sorted({name for row in distances for name in row})
+    landmark_ids = {name: i for i, name in enumerate(landmarks)}
+
+    origin = np.mean(list(sectors.values()), axis=0)
+    sector_of = [apartment_sector(s, sectors) for s in apartments['PropertySubName']]
+    apt_ok = np.array([s is not None for s in sector_of])
+    apt_xy = np.zeros((len(names), 2))
+    apt_xy[apt_ok] = _to_plane(*np.array([sectors[s] for s in sector_of if s]).T, origin)
+
+    lm_ok = np.zeros(len(landmarks), dtype=bool)
+    lm_xy = np.zeros((len(landmarks), 2))
+    pinned = [landmark_ids[n] for n in known_landmarks if n in landmark_ids]
+    if pinned:
+        lm_xy[pinned] = _to_plane(*np.array([known_landmarks[landmarks[i]] for i in pinned]).T, origin)
+        lm_ok[pinned] = True
+
+    by_landmark = {}
+    by_apartment = {}
+    for apt, row in enumerate(distances):
+        for landmark, meters in row.items():
+            by_landmark.setdefault(landmark_ids[landmark], []).append((apt, meters / 1000))
+            by_apartment.setdefault(apt, []).append((landmark_ids[landmark], meters / 1000))
+
+    for _ in range(rounds):
+        estimated = _solve({lm: obs for lm, obs in by_landmark.items() if lm not in pinned},
+                           apt_xy, apt_ok, {lm: lm_xy[lm] for lm in np.flatnonzero(lm_ok)}, min_anchors)
+        for lm, xy in estimated.items():
+            lm_xy[lm] = xy
+            lm_ok[lm] = True
+        refined = _solve(by_apartment, lm_xy, lm_ok, {a: apt_xy[a] for a in np.flatnonzero(apt_ok)}, min_anchors)
+        for apt, xy in refined.items():
+            apt_xy[apt] = xy
+            apt_ok[apt] = True
+
+    def frame(labels, xy, ok):
+        lat, lon = _from_plane(xy[ok], origin)
+        return pd.DataFrame({'latitude': lat, 'longitude': lon}, index=pd.Index(np.asarray(labels)[ok], name='name'))
+
+    return frame(names, apt_xy, apt_ok), frame(landmarks, lm_xy, lm_ok)
+
+
+def _parse_distances(advantages_str):
+    try:
+        return parse_location_advantages(advantages_str)
+    except (ValueError, SyntaxError):
+        return {}
+
+
+# --- INDEX ---
+
+class GeoIndex:
+    """Named points of several kinds, one haversine BallTree per kind.
+
+    ``stated`` optionally holds the listings' own landmark distances as
+    ``(landmark, apartment, km)`` arrays; :meth:`around` prefers them over
+    geometric distances and falls back to them for landmarks that could not
+    be placed on the map.
+    """
+
+    def __init__(self, names, kinds, latitude, longitude, stated=None):
+        from sklearn.neighbors import BallTree
+
+        self.names = np.asarray(names, dtype=object)
+        self.kinds = np.asarray(kinds, dtype=object)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self._positions = {(kind, name): i for i, (kind, name) in enumerate(zip(self.kinds, self.names))}
+        self._trees = {}
+        for kind in KINDS:
+            rows = np.flatnonzero(self.kinds == kind)
+            if len(rows):
+                points = np.radians(np.column_stack([self.latitude[rows], self.longitude[rows]]))
+                self._trees[kind] = (rows, BallTree(points, metric='haversine'))
+
+        empty = np.array([], dtype=object)
+        landmark, apartment, km = stated if stated is not None else (empty, empty, np.array([]))
+        self.stated = (np.asarray(landmark, dtype=object), np.asarray(apartment, dtype=object),
+                       np.asarray(km, dtype=np.float64))
+        order = np.argsort(self.stated[0], kind='stable')
+        self.stated = tuple(a[order] for a in self.stated)
+
+    def __len__(self):
+        return len(self.names)
+
+    def places(self, kind):
+        names = set(self.names[self.kinds == kind])
+        if kind == 'landmark':
+            names.update(self.stated[0])
+        return sorted(names)
+
+    def locate(self, name, kind=None):
+        """``(lat, lon)`` of a named place of ``kind``.
+
+        Without ``kind`` the name must be unique across kinds: a landmark that
+        shares an apartment's name raises ``ValueError`` rather than silently
+        resolving to either.
+        """
+        hits = [(k, i) for k in ([kind] if kind else KINDS) if (i := self._positions.get((k, name))) is not None]
+        if not hits:
+            raise KeyError(name)
+        if len(hits) > 1:
+            raise ValueError(f"{name!r} is ambiguous ({', '.join(k for k, _ in hits)}); pass kind")
+        i = hits[0][1]
+        return self.latitude[i], self.longitude[i]
+
+    def within(self, latitude, longitude, radius_km, kind='apartment'):
+        """Places of ``kind`` within ``radius_km`` of a point, nearest first."""
+        rows, tree = self._trees[kind]
+        point = np.radians([[latitude, longitude]])
+        hits, dists = tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True)
+        return self._result(rows[hits[0]], dists[0])
+
+    def nearest(self, latitude, longitude, k=5, kind='apartment'):
+        """The ``k`` places of ``kind`` closest to a point."""
+        rows, tree = self._trees[kind]
+        dists, hits = tree.query(np.radians([[latitude, longitude]]), k=min(k, len(rows)))
+        return self._result(rows[hits[0]], dists[0])
+
+    def around(self, place, radius_km, kind='landmark'):
+        """Apartments within ``radius_km`` of a named landmark or sector (``kind``).
+
+        A listing's own stated distance to the landmark wins over the
+        geometric one; unplaced landmarks only use stated distances.
+        """
+        lo = hi = 0
+        if kind == 'landmark':
+            landmarks = self.stated[0]
+            lo, hi = np.searchsorted(landmarks, place, side='left'), np.searchsorted(landmarks, place, side='right')
+        stated = pd.DataFrame({'name': self.stated[1][lo:hi], 'distance_km': self.stated[2][lo:hi]})
+        try:
+            latitude, longitude = self.locate(place, kind)
+        except KeyError:
+            nearby = stated.iloc[:0]
+        else:
+            nearby = self.within(latitude, longitude, radius_km)[['name', 'distance_km']]
+            nearby = nearby[~nearby['name'].isin(stated['name'])]
+        result = pd.concat([stated[stated['distance_km'] <= radius_km], nearby], ignore_index=True)
+        return result.sort_values('distance_km', kind='stable').reset_index(drop=True)
+
+    def _result(self, rows, dists):
+        return pd.DataFrame({'name': self.names[rows], 'kind': self.kinds[rows],
+                             'latitude': self.latitude[rows], 'longitude': self.longitude[rows],
+                             'distance_km': dists * EARTH_RADIUS_KM})
+
+    def save(self, path=GEO_FILE):
+        landmark, apartment, km = self.stated
+        np.savez(path, names=self.names.astype(str), kinds=self.kinds.astype(str),
+                 latitude=self.latitude, longitude=self.longitude, stated_landmark=landmark.astype(str),
+                 stated_apartment=apartment.astype(str), stated_km=km)
+
+    @classmethod
+    def load(cls, path=GEO_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            stated = (data['stated_landmark'], data['stated_apartment'], data['stated_km'])
+            return cls(data['names'].astype(object), data['kinds'].astype(object), data['latitude'],
+                       data['longitude'], stated)
+
+    @classmethod
+    def build(cls, apartments_path='appartments.csv', sectors_path='latlong.csv', landmarks_path=LANDMARKS_FILE):
+        sectors = load_sectors(sectors_path)
+        known = {}
+        if landmarks_path and os.path.exists(landmarks_path):
+            pinned = pd.read_csv(landmarks_path)
+            known = {n: (lat, lon) for n, lat, lon in zip(pinned['name'], pinned['latitude'], pinned['longitude'])}
+        listings = load_apartments(apartments_path)
+        distances = [_parse_distances(s) for s in listings['LocationAdvantages']]
+        apartments, landmarks = geocode(listings, sectors, known, distances)
+        stated = [(landmark, name, meters / 1000)
+                  for name, row in zip(listings['PropertyName'], distances) for landmark, meters in row.items()]
+
+        frames = [apartments.assign(kind='apartment'), landmarks.assign(kind='landmark'),
+                  pd.DataFrame(sectors.values(), index=pd.Index(list(sectors), name='name'),
+                               columns=['latitude', 'longitude']).assign(kind='sector')]
+        points = pd.concat(frames).reset_index()
+        return cls(points['name'], points['kind'], points['latitude'], points['longitude'],
+                   tuple(np.array(column, dtype=object) for column in zip(*stated)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocode apartments and landmarks and save the spatial index.")
+    parser.add_argument('--apartments', default='appartments.csv')
+    parser.add_argument('--sectors', default='latlong.csv')
+    parser.add_argument('--landmarks', default=LANDMARKS_FILE)
+    parser.add_argument('--output', default=GEO_FILE)
+    args = parser.parse_args()
+
+    index = GeoIndex.build(args.apartments, args.sectors, args.landmarks)
+    index.save(args.output)
+    counts = ', '.join(f"{(index.kinds == kind).sum()} {kind}s" for kind in KINDS)
+    print(f"saved {counts} to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
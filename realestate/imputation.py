@@ -0,0 +1,143 @@
+"""Group-wise missing-value imputation, as in ``missing_value_imputation.ipynb``.
+
+:class:`Imputer` learns, once, everything the notebook computed row by row:
+
+* the median ``super_built_up_area / built_up_area`` and
+  ``carpet_area / built_up_area`` ratios used to back-fill ``built_up_area``,
+* the ``floorNum`` fill (median floor of houses),
+* one ``agePossession`` mode table per level of the hierarchy
+  sector + property_type, then sector, then property_type.  Each level's
+  modes are taken after the previous level has been applied, with pandas'
+  ``mode()`` tie-break (smallest value), exactly like the notebook's three
+  ``df.apply`` passes.
+
+``transform`` fills a frame with vectorized masks and merges, so it also
+imputes streamed batches of new listings with the persisted tables::
+
+    python -m realestate.imputation fit gurgaon_properties_outlier_treated.csv --output imputer.json
+    python -m realestate.imputation apply listings.csv imputed.csv --imputer imputer.json
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+IMPUTER_FILE = 'imputer.json'
+MODE_COLUMN = 'agePossession'
+MISSING = 'Undefined'
+LEVELS = (('sector', 'property_type'), ('sector',), ('property_type',))
+
+
+def group_modes(df, keys, column):
+    """Most frequent ``column`` value per ``keys`` group, ties going to the smallest value."""
+    counts = df.groupby(list(keys) + [column], observed=True).size().rename('_n').reset_index()
+    counts = counts.sort_values(list(keys) + ['_n', column], ascending=[True] * len(keys) + [False, True])
+    return counts.drop_duplicates(list(keys)).set_index(list(keys))[column]
+
+
+def _fill_modes(df, keys, modes, column, missing):
+    undefined = (df[column] == missing).to_numpy()
+    if not undefined.any() or modes.empty:
+        return df
+    index = pd.MultiIndex.from_frame(df.loc[undefined, list(keys)].astype(object)) if len(keys) > 1 \
+        else pd.Index(df.loc[undefined, keys[0]].astype(object))
+    filled = modes.reindex(index).to_numpy()
+    df = df.copy()
+    df.loc[undefined, column] = np.where(pd.isna(filled), missing, filled)
+    return df
+
+
+class Imputer:
+    def __init__(self, super_ratio, carpet_ratio, floor_fill, modes, column=MODE_COLUMN, missing=MISSING):
+        self.super_ratio = super_ratio
+        self.carpet_ratio = carpet_ratio
+        self.floor_fill = floor_fill
+        self.modes = modes  # one Series per level, indexed by that level's keys
+        self.column = column
+        self.missing = missing
+
+    @classmethod
+    def fit(cls, df, column=MODE_COLUMN, missing=MISSING):
+        areas = df[['built_up_area', 'super_built_up_area', 'carpet_area']].dropna()
+        super_ratio = float((areas['super_built_up_area'] / areas['built_up_area']).median())
+        carpet_ratio = float((areas['carpet_area'] / areas['built_up_area']).median())
+        floor_fill = float(df.loc[df['property_type'] == 'house', 'floorNum'].median())
+
+        modes = []
+        for keys in LEVELS:
+            level = group_modes(df, keys, column)
+            modes.append(level)
+            df = _fill_modes(df, keys, level, column, missing)
+        return cls(super_ratio, carpet_ratio, floor_fill, modes, column, missing)
+
+    def fill_built_up_area(self, df):
+        """Back-fill ``built_up_area`` from super built-up and/or carpet area."""
+        if 'super_built_up_area' not in df.columns or 'carpet_area' not in df.columns:
+            return df
+        from_super = df['super_built_up_area'] / self.super_ratio
+        from_carpet = df['carpet_area'] / self.carpet_ratio
+        estimate = np.round(((from_super + from_carpet) / 2).fillna(from_super).fillna(from_carpet))
+        df = df.copy()
+        df['built_up_area'] = df['built_up_area'].fillna(estimate)
+        return df
+
+    def transform(self, df):
+        df = self.fill_built_up_area(df)
+        if 'floorNum' in df.columns:
+            df = df.assign(floorNum=df['floorNum'].fillna(self.floor_fill))
+        for keys, modes in zip(LEVELS, self.modes):
+            df = _fill_modes(df, keys, modes, self.column, self.missing)
+        return df
+
+    def save(self, path=IMPUTER_FILE):
+        levels = [{'keys': list(keys), 'modes': [[*(k if isinstance(k, tuple) else (k,)), v]
+                                                 for k, v in modes.items()]}
+                  for keys, modes in zip(LEVELS, self.modes)]
+        with open(path, 'w') as file:
+            json.dump({'super_ratio': self.super_ratio, 'carpet_ratio': self.carpet_ratio,
+                       'floor_fill': self.floor_fill, 'column': self.column, 'missing': self.missing,
+                       'levels': levels}, file, indent=1)
+
+    @classmethod
+    def load(cls, path=IMPUTER_FILE):
+        with open(path) as file:
+            data = json.load(file)
+        modes = []
+        for level in data['levels']:
+            keys = level['keys']
+            rows = pd.DataFrame(level['modes'], columns=keys + [data['column']])
+            modes.append(rows.set_index(keys)[data['column']])
+        return cls(data['super_ratio'], data['carpet_ratio'], data['floor_fill'], modes, data['column'],
+                   data['missing'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit or apply the group-wise missing-value imputer.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fit = sub.add_parser('fit', help="learn ratios and mode tables from a CSV")
+    fit.add_argument('data')
+    fit.add_argument('--output', default=IMPUTER_FILE)
+    apply = sub.add_parser('apply', help="impute a CSV in streamed chunks")
+    apply.add_argument('input')
+    apply.add_argument('output')
+    apply.add_argument('--imputer', default=IMPUTER_FILE)
+    apply.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        imputer = Imputer.fit(pd.read_csv(args.data))
+        imputer.save(args.output)
+        print(f"saved ratios {imputer.super_ratio:.4f}/{imputer.carpet_ratio:.4f} and "
+              f"{sum(len(m) for m in imputer.modes)} group modes to {args.output}")
+    else:
+        imputer = Imputer.load(args.imputer)
+        rows = 0
+        for i, chunk in enumerate(pd.read_csv(args.input, chunksize=args.chunksize)):
+            imputer.transform(chunk).to_csv(args.output, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows += len(chunk)
+        print(f"imputed {rows} rows -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Timers, counters and latency histograms for the pages' hot paths.
+
+Each page run is a request::
+
+    request = instrumentation.begin('price_predictor', profile=st.query_params.get('profile'))
+    ...
+    request.end()
+
+and anything the page calls can time itself against it::
+
+    with instrumentation.timer('model.predict'):
+        pipeline.predict(X)
+    instrumentation.count('prediction_cache.miss', len(missing))
+
+Timings are kept per ``(page, name)`` in log-bucketed histograms (bounded
+memory, percentiles to within a bucket); code running outside a request, like
+the command-line tools, is filed under page ``'-'``.  Ending a request records
+its total time and appends one JSON line (per-name times and counts, plus the
+top functions when profiled) to :data:`LOG_FILE`, which is rotated to
+``LOG_FILE.1`` once it reaches :data:`MAX_LOG_BYTES`.
+
+``profile='cprofile'`` (or ``'pyinstrument'``, if installed) captures a profile
+of that one request; the last few are kept for the diagnostics view.
+Caches register themselves with :func:`register_cache` so their hit rates can
+be read in one place.  ``Home.py?diag=1`` shows all of it
+(:mod:`realestate.diagnostics`).
+"""
+import io
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+LOG_FILE = 'diagnostics.jsonl'
+MAX_LOG_BYTES = 8 << 20  # one rotated copy is kept, so the log takes at most twice this
+PROFILERS = ('cprofile', 'pyinstrument')
+N_BUCKETS = 64
+MIN_SECONDS = 1e-6  # bucket 0 holds everything up to a microsecond
+BUCKETS_PER_DOUBLING = 2
+
+
+# --- HISTOGRAMS ---
+
+class Histogram:
+    """Log-bucketed durations: count, sum, min, max and quantiles to within a bucket (a factor of ~1.4)."""
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(seconds):
+        if seconds <= MIN_SECONDS:
+            return 0
+        return min(N_BUCKETS - 1, 1 + int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_DOUBLING))
+
+    @staticmethod
+    def upper_bound(bucket):
+        return MIN_SECONDS * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+    def observe(self, seconds):
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper edge of the bucket holding the ``q`` quantile, clipped to the observed range."""
+        if not self.count:
+            return math.nan
+        rank, seen = q * self.count, 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(max(self.upper_bound(bucket), self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {'count': self.count, 'mean_ms': self.total / self.count * 1e3 if self.count else math.nan,
+                'p50_ms': self.quantile(0.5) * 1e3, 'p90_ms': self.quantile(0.9) * 1e3,
+                'p99_ms': self.quantile(0.99) * 1e3, 'max_ms': self.max * 1e3}
+
+
+# --- METRICS ---
+
+class Metrics:
+    """Process-wide histograms and counters keyed on ``(page, name)``."""
+
+    def __init__(self, log_file=LOG_FILE, n_profiles=10, max_log_bytes=MAX_LOG_BYTES):
+        self.log_file = log_file
+        self.max_log_bytes = max_log_bytes
+        self.histograms = defaultdict(Histogram)
+        self.counters = defaultdict(int)
+        self.profiles = deque(maxlen=n_profiles)
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def observe(self, page, name, seconds):
+        with self._lock:
+            self.histograms[(page, name)].observe(seconds)
+
+    def add(self, page, name, n=1):
+        with self._lock:
+            self.counters[(page, name)] += n
+
+    def register_cache(self, name, cache):
+        """Track an object with an ``info()`` dict of ``hits``/``misses``; held weakly."""
+        with self._lock:
+            self.caches[name] = weakref.ref(cache)
+
+    def latency(self):
+        """One row per ``(page, name)`` with count, mean and p50/p90/p99/max in ms."""
+        with self._lock:
+            items = sorted(self.histograms.items())
+            return [{'page': page, 'name': name, **histogram.snapshot()} for (page, name), histogram in items]
+
+    def counts(self):
+        with self._lock:
+            return [{'page': page, 'name': name, 'count': n} for (page, name), n in sorted(self.counters.items())]
+
+    def cache_info(self):
+        """``info()`` of every live registered cache, with its hit rate."""
+        rows = []
+        for name, ref in list(self.caches.items()):
+            cache = ref()
+            if cache is None:
+                continue
+            info = dict(cache.info())
+            lookups = info.get('hits', 0) + info.get('misses', 0) + info.get('grid_hits', 0)
+            info.setdefault('hit_rate', (lookups - info.get('misses', 0)) / lookups if lookups else 0.0)
+            rows.append({'cache': name, **info})
+        return rows
+
+    def write(self, record):
+        if not self.log_file:
+            return
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            try:
+                full = os.path.getsize(self.log_file) + len(line) > self.max_log_bytes
+            except FileNotFoundError:
+                full = False
+            if full:
+                os.replace(self.log_file, f"{self.log_file}.1")
+            with open(self.log_file, 'a') as file:
+                file.write(line)
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.profiles.clear()
+
+
+metrics = Metrics()
+_local = threading.local()
+
+
+# --- REQUESTS ---
+
+class _Profiler:
+    """cProfile or pyinstrument around one request; ``stop()`` returns ``(report text, top functions)``."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                self.kind = 'cprofile'  # optional dependency: fall back to the standard library
+            else:
+                self._profiler = Profiler()
+                self._profiler.start()
+        if self.kind == 'cprofile':
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self, top=15):
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True), []
+        import pstats
+
+        self._profiler.disable()
+        text = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=text).sort_stats('cumulative')
+        stats.print_stats(40)
+        rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top]
+        functions = [{'function': f"{os.path.basename(path)}:{line}({name})", 'calls': calls,
+                      'cumulative_ms': cumulative * 1e3}
+                     for (path, line, name), (_, calls, _, cumulative, _) in rows]
+        return text.getvalue(), functions
+
+
+class Request:
+    """One run of a page: its timers and counters, and an optional profile."""
+
+    def __init__(self, page, profile=None):
+        self.page = page
+        self.spans = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+        self.counts = defaultdict(int)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._profiler = _Profiler(profile) if profile in PROFILERS else None
+        self.ended = False
+
+    def end(self):
+        """Record the request's total time and write its JSON line (once)."""
+        if self.ended:
+            return
+        self.ended = True
+        seconds = time.perf_counter() - self._start
+        record = {'ts': self.started_at, 'page': self.page, 'total_ms': seconds * 1e3,
+                  'spans': {name: {'calls': calls, 'ms': s * 1e3} for name, (calls, s) in self.spans.items()},
+                  'counts': dict(self.counts)}
+        if self._profiler is not None:
+            text, functions = self._profiler.stop()
+            record['profiler'], record['profile'] = self._profiler.kind, functions
+            metrics.profiles.append({'ts': self.started_at, 'page': self.page, 'profiler': self._profiler.kind,
+                                     'total_ms': seconds * 1e3, 'text': text})
+        metrics.observe(self.page, 'request', seconds)
+        metrics.write(record)
+        if getattr(_local, 'request', None) is self:
+            _local.request = None
+
+
+def begin(page, profile=None):
+    """Start timing a page run on this thread (an unfinished earlier run is dropped, e.g. an interrupted rerun)."""
+    previous = getattr(_local, 'request', None)
+    if previous is not None and previous._profiler is not None and not previous.ended:
+        previous._profiler.stop()
+    _local.request = Request(page, profile)
+    return _local.request
+
+
+def current_page():
+    request = getattr(_local, 'request', None)
+    return request.page if request is not None else '-'
+
+
+@contextmanager
+def timer(name):
+    """Time the block under ``name`` for the current page (and request, if any)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        request = getattr(_local, 'request', None)
+        metrics.observe(current_page(), name, seconds)
+        if request is not None:
+            span = request.spans[name]
+            span[0] += 1
+            span[1] += seconds
+
+
+def timed(name):
+    """Decorator form of :func:`timer`."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Add ``n`` to the counter ``name`` for the current page (and request, if any)."""
+    request = getattr(_local, 'request', None)
+    metrics.add(current_page(), name, n)
+    if request is not None:
+        request.counts[name] += n
+
+
+def register_cache(name, cache):
+    metrics.register_cache(name, cache)
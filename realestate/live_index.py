@@ -0,0 +1,337 @@
+"""Updatable recommender index: insert, update and delete single listings.
+
+Rebuilding :mod:`realestate.recommender`'s index refits the TF-IDF vocabulary
+and both scalers and rescores every property.  :class:`LiveIndex` instead
+freezes the fitted feature transform (:class:`FrozenFeatures`: the TF-IDF
+terms and idf weights, the building-type columns, the scaler means and
+scales) and keeps the raw listing rows next to the feature blocks and the
+candidate lists, so a change only touches the affected rows:
+
+* an insert scores the new rows against everyone (one similarity row each),
+  gives them their own top-K and merges them into the lists of the existing
+  properties they beat,
+* a delete drops the rows, renumbers the candidate ids and recomputes only the
+  lists that contained a deleted property,
+* an update is a delete followed by an insert.
+
+Terms, landmarks and building types unseen at fit time are ignored until the
+next full rebuild, which refits everything from the stored rows;
+``maybe_rebuild`` triggers it once enough listings have changed.
+
+Every save rewrites ``recommender_index.npz`` atomically, so the
+Recommendation page picks the change up on its next rerun::
+
+    python -m realestate.live_index build
+    python -m realestate.live_index upsert new_listings.csv --rebuild-after 0.2
+    python -m realestate.live_index delete "DLF The Crest" "M3M Golf Estate"
+    python -m realestate.live_index rebuild
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from realestate.ingest import COLUMNS, ingest_frame
+from realestate.recommender import DEFAULT_WEIGHTS, INDEX_FILE, NeighbourIndex, top_candidates
+from realestate.similarity import (COMPONENTS, MISSING_DISTANCE, FeatureBlock, building_type_columns,
+                                   location_deviations, price_deviations, scaler_stats)
+
+LIVE_FILE = 'recommender_live.npz'
+REBUILD_FRACTION = 0.2
+
+
+# --- FROZEN FEATURE TRANSFORM ---
+
+class FrozenFeatures:
+    """The notebook's vectorizer and scalers, fitted once and then only applied."""
+
+    def __init__(self, terms, idf, type_columns, price_stats, landmarks, location_stats, fill=MISSING_DISTANCE):
+        self.terms = np.asarray(terms, dtype=object)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.type_columns = [tuple(c) for c in type_columns]
+        self.price_stats = tuple(np.asarray(s, dtype=np.float64) for s in price_stats)
+        self.landmarks = np.asarray(landmarks, dtype=object)
+        self.location_stats = tuple(np.asarray(s, dtype=np.float64) for s in location_stats)
+        self.fill = float(fill)
+        self._landmark_ids = {name: i for i, name in enumerate(self.landmarks)}
+        self._vectorizer = None
+
+    @classmethod
+    def fit(cls, data):
+        """Fit on an :class:`~realestate.ingest.Ingested`, exactly as the full build does."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).fit(data.facilities)
+        type_columns = building_type_columns(data.building_types)
+        price_stats = scaler_stats(price_deviations(data.price_values, data.building_types, type_columns))
+        location_stats = scaler_stats(location_deviations(data.distances))
+        return cls(vectorizer.get_feature_names_out(), vectorizer.idf_, type_columns, price_stats,
+                   data.landmarks, location_stats)
+
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+
+            self._vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2),
+                                               vocabulary=self.terms.tolist())
+            self._vectorizer.idf_ = self.idf
+        return self._vectorizer
+
+    def _distances(self, data):
+        """``data.distances`` re-indexed onto the fitted landmark columns (unknown ones dropped)."""
+        remap = np.array([self._landmark_ids.get(name, -1) for name in data.landmarks], dtype=np.int64)
+        coo = data.distances.tocoo()
+        cols = remap[coo.col] if len(remap) else coo.col
+        known = cols >= 0
+        return sparse.csr_matrix((coo.data[known], (coo.row[known], cols[known])),
+                                 shape=(len(data), len(self.landmarks)))
+
+    def transform(self, data):
+        """The three feature blocks (facilities, price, location) of ingested listings."""
+        facilities = FeatureBlock(self.vectorizer().transform(data.facilities))
+        price = FeatureBlock.standard_scaled(price_deviations(data.price_values, data.building_types,
+                                                              self.type_columns), stats=self.price_stats)
+        location = FeatureBlock.standard_scaled(location_deviations(self._distances(data), self.fill), self.fill,
+                                                stats=self.location_stats)
+        return [facilities, price, location]
+
+    def to_arrays(self, prefix='features'):
+        configs, types = zip(*self.type_columns) if self.type_columns else ((), ())
+        return {f'{prefix}_terms': self.terms.astype(str), f'{prefix}_idf': self.idf,
+                f'{prefix}_type_configs': np.array(configs, dtype=str),
+                f'{prefix}_types': np.array(types, dtype=str),
+                f'{prefix}_price_mean': self.price_stats[0], f'{prefix}_price_scale': self.price_stats[1],
+                f'{prefix}_landmarks': self.landmarks.astype(str),
+                f'{prefix}_location_mean': self.location_stats[0],
+                f'{prefix}_location_scale': self.location_stats[1], f'{prefix}_fill': np.float64(self.fill)}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix='features'):
+        type_columns = list(zip(arrays[f'{prefix}_type_configs'].tolist(), arrays[f'{prefix}_types'].tolist()))
+        return cls(arrays[f'{prefix}_terms'].astype(object), arrays[f'{prefix}_idf'], type_columns,
+                   (arrays[f'{prefix}_price_mean'], arrays[f'{prefix}_price_scale']),
+                   arrays[f'{prefix}_landmarks'].astype(object),
+                   (arrays[f'{prefix}_location_mean'], arrays[f'{prefix}_location_scale']),
+                   float(arrays[f'{prefix}_fill']))
+
+
+# --- LIVE INDEX ---
+
+def _raw_rows(frame):
+    """The ``COLUMNS`` of a listings frame, header repeats dropped, one row per property (last wins)."""
+    frame = frame.loc[frame['PropertyName'] != 'PropertyName', COLUMNS]
+    return frame.drop_duplicates('PropertyName', keep='last').reset_index(drop=True)
+
+
+class LiveIndex:
+    """Feature blocks, raw rows and top-K candidate lists that can be edited in place."""
+
+    def __init__(self, raw, features, blocks, ids, scores, components, weights=DEFAULT_WEIGHTS, changes=0):
+        self.raw = raw.reset_index(drop=True)
+        self.features = features
+        self.blocks = list(blocks)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.changes = int(changes)  # listings inserted/updated/deleted since the last full fit
+        self._positions = {name: i for i, name in enumerate(self.raw['PropertyName'])}
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def names(self):
+        return self.raw['PropertyName'].to_numpy(dtype=object)
+
+    @property
+    def n_candidates(self):
+        return self.ids.shape[1]
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    # --- building ---
+
+    @classmethod
+    def from_frame(cls, frame, n_candidates=100, weights=DEFAULT_WEIGHTS, batch_size=256):
+        """Full fit: vocabulary, scalers and every candidate list."""
+        raw = _raw_rows(frame)
+        data = ingest_frame(raw)
+        features = FrozenFeatures.fit(data)
+        blocks = features.transform(data)
+        n, k = len(raw), int(n_candidates)
+        weights = np.asarray(weights, dtype=np.float32)
+        ids = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+        components = np.empty((n, k, len(blocks)), dtype=np.float32)
+        for start in range(0, n, batch_size):
+            rows = np.arange(start, min(start + batch_size, n))
+            ids[rows], scores[rows], components[rows] = top_candidates(
+                [block.similarity(rows) for block in blocks], rows, weights, k)
+        return cls(raw, features, blocks, ids, scores, components, weights)
+
+    @classmethod
+    def build(cls, path='appartments.csv', **kwargs):
+        return cls.from_frame(pd.read_csv(path, usecols=COLUMNS), **kwargs)
+
+    def rebuild(self):
+        """Refit everything from the stored rows (picks up new terms, landmarks and building types)."""
+        return self.from_frame(self.raw, self.n_candidates, self.weights)
+
+    def maybe_rebuild(self, fraction=REBUILD_FRACTION):
+        """Full rebuild once more than ``fraction`` of the listings changed since the last fit."""
+        if self.changes > fraction * max(len(self), 1):
+            return self.rebuild()
+        return self
+
+    # --- editing ---
+
+    def upsert(self, frame):
+        """Insert new listings and replace existing ones (matched on ``PropertyName``)."""
+        frame = _raw_rows(frame)
+        if not len(frame):
+            return self
+        existing = [name for name in frame['PropertyName'] if name in self._positions]
+        if existing:
+            self.delete(existing, count=False)
+        self._insert(frame)
+        self.changes += len(frame)
+        return self
+
+    def _insert(self, frame):
+        n, m = len(self), len(frame)
+        new_blocks = self.features.transform(ingest_frame(frame))
+        self.blocks = [FeatureBlock(sparse.vstack([old.matrix, new.matrix], format='csr'), old.offset)
+                       for old, new in zip(self.blocks, new_blocks)]
+        self.raw = pd.concat([self.raw, frame], ignore_index=True)
+        self._positions = {name: i for i, name in enumerate(self.raw['PropertyName'])}
+
+        rows = np.arange(n, n + m)
+        parts = [block.similarity(rows) for block in self.blocks]
+        ids, scores, components = top_candidates(parts, rows, self.weights, self.n_candidates)
+
+        # similarity is symmetric: column j of the new rows is what they score in j's list
+        parts = [np.asarray(part[:, :n], dtype=np.float32) for part in parts]
+        blend = sum(w * part for w, part in zip(self.weights, parts))
+        affected = np.flatnonzero((blend > self.scores[None, :, -1]).any(axis=0))
+        if len(affected):
+            cand_ids = np.hstack([self.ids[affected], np.broadcast_to(rows, (len(affected), m))])
+            cand_scores = np.hstack([self.scores[affected], blend[:, affected].T])
+            cand_components = np.concatenate(
+                [self.components[affected], np.stack([part[:, affected].T for part in parts], axis=-1)], axis=1)
+            order = np.argsort(-cand_scores, axis=1, kind='stable')[:, :self.n_candidates]
+            self.ids[affected] = np.take_along_axis(cand_ids, order, axis=1)
+            self.scores[affected] = np.take_along_axis(cand_scores, order, axis=1)
+            self.components[affected] = np.take_along_axis(cand_components, order[..., None], axis=1)
+
+        self.ids = np.vstack([self.ids, ids])
+        self.scores = np.vstack([self.scores, scores])
+        self.components = np.concatenate([self.components, components])
+
+    def delete(self, names, count=True):
+        """Remove listings; only the lists that referenced them are recomputed."""
+        deleted = np.array(sorted({self._positions[name] for name in names if name in self._positions}),
+                           dtype=np.int64)
+        if not len(deleted):
+            return self
+        keep = np.ones(len(self), dtype=bool)
+        keep[deleted] = False
+        renumber = np.where(keep, np.cumsum(keep) - 1, -1).astype(np.int32)
+        stale = np.isin(self.ids, deleted).any(axis=1)[keep]
+
+        self.raw = self.raw[keep].reset_index(drop=True)
+        self._positions = {name: i for i, name in enumerate(self.raw['PropertyName'])}
+        self.blocks = [FeatureBlock(block.matrix[keep], block.offset) for block in self.blocks]
+        ids = self.ids[keep]
+        self.ids = np.where(ids >= 0, renumber[np.maximum(ids, 0)], -1).astype(np.int32)
+        self.scores = self.scores[keep]
+        self.components = self.components[keep]
+
+        rows = np.flatnonzero(stale)
+        for start in range(0, len(rows), 256):
+            batch = rows[start:start + 256]
+            self.ids[batch], self.scores[batch], self.components[batch] = top_candidates(
+                [block.similarity(batch) for block in self.blocks], batch, self.weights, self.n_candidates)
+        if count:
+            self.changes += len(deleted)
+        return self
+
+    # --- persistence ---
+
+    def neighbour_index(self):
+        return NeighbourIndex(self.names, self.ids, self.scores, self.components, self.weights)
+
+    def save(self, path=LIVE_FILE, index_path=INDEX_FILE):
+        """Write the live state and the page's neighbour index, each replaced atomically."""
+        arrays = {'ids': self.ids, 'scores': self.scores, 'components': self.components, 'weights': self.weights,
+                  'changes': np.int64(self.changes), **self.features.to_arrays()}
+        for column in COLUMNS:
+            values = self.raw[column]
+            arrays[f'raw_{column}'] = values.fillna('').to_numpy(dtype=str)
+            arrays[f'raw_{column}_missing'] = values.isna().to_numpy()
+        for component, block in zip(COMPONENTS, self.blocks):
+            arrays.update(block.to_arrays(component))
+        _atomic_savez(path, arrays)
+        index = self.neighbour_index()
+        _atomic_savez(index_path, {'names': index.names.astype(str), 'ids': index.ids, 'scores': index.scores,
+                                   'components': index.components, 'weights': index.weights})
+
+    @classmethod
+    def load(cls, path=LIVE_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = dict(data)
+        raw = pd.DataFrame({column: np.where(arrays[f'raw_{column}_missing'], None,
+                                             arrays[f'raw_{column}'].astype(object)) for column in COLUMNS})
+        blocks = [FeatureBlock.from_arrays(arrays, component) for component in COMPONENTS]
+        return cls(raw, FrozenFeatures.from_arrays(arrays), blocks, arrays['ids'], arrays['scores'],
+                   arrays['components'], arrays['weights'], int(arrays['changes']))
+
+
+def _atomic_savez(path, arrays):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # writing through a file object keeps np.savez from appending '.npz' to the temp name
+    with open(tmp, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or edit the updatable recommender index.")
+    parser.add_argument('--state', default=LIVE_FILE)
+    parser.add_argument('--index', default=INDEX_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="full fit from appartments.csv")
+    build.add_argument('--input', default='appartments.csv')
+    build.add_argument('--candidates', type=int, default=100)
+    upsert = sub.add_parser('upsert', help="insert or replace the listings of a CSV with the feed's columns")
+    upsert.add_argument('changes')
+    delete = sub.add_parser('delete', help="remove listings by PropertyName")
+    delete.add_argument('names', nargs='+')
+    sub.add_parser('rebuild', help="refit the vocabulary and scalers from the stored listings")
+    for command in (upsert, delete):
+        command.add_argument('--rebuild-after', type=float, default=REBUILD_FRACTION,
+                             help="full rebuild once this fraction of listings changed since the last fit")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        live = LiveIndex.build(args.input, n_candidates=args.candidates)
+    else:
+        live = LiveIndex.load(args.state)
+        if args.command == 'upsert':
+            live = live.upsert(pd.read_csv(args.changes, usecols=COLUMNS)).maybe_rebuild(args.rebuild_after)
+        elif args.command == 'delete':
+            live = live.delete(args.names).maybe_rebuild(args.rebuild_after)
+        else:
+            live = live.rebuild()
+    live.save(args.state, args.index)
+    print(f"{args.command}: {len(live)} properties x {live.n_candidates} candidates, {live.changes} changes "
+          f"since the last fit ({time.perf_counter() - start:.2f}s) -> {args.index}")
+
+
+if __name__ == '__main__':
+    main()
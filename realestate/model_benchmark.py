@@ -0,0 +1,346 @@
+"""Parallel, cached version of ``model_selection.ipynb``'s model comparison.
+
+The notebook's ``scorer()`` refits the same ``ColumnTransformer`` inside every
+one of the 10 CV folds and again for the hold-out split, for each of 11 models
+and each preprocessor variant, one fit at a time.  Here
+
+* every preprocessor variant is fitted once per split (10 KFold folds plus the
+  80/20 hold-out) and its transformed train/test matrices are cached under
+  ``benchmark_cache/``, keyed by the data file's hash and the variant,
+* (model x split) jobs run in a process pool (at most two jobs per worker in
+  flight), each loading only its cached fold,
+* every job appends r2 (on ``log1p(price)``, as ``cross_val_score``), MAE in
+  crore, fit time, single-row and per-row predict latency and pickled model
+  size to ``model_benchmark.csv``,
+* a job is re-run only if no row exists with the same model hash (estimator
+  class + parameters) and data hash (CSV content + preprocessor + split).
+
+Models get ``random_state=0`` where they take one, so cached rows stay
+comparable between runs::
+
+    python -m realestate.model_benchmark --workers 4
+    python -m realestate.model_benchmark --variants onehot target --models "random forest" xgboost
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from realestate.artifacts import file_digest
+from realestate.price_model import CATEGORICAL_COLUMNS, FURNISHING_LABELS, NUMERIC_COLUMNS
+
+DATA_FILE = 'gurgaon_properties_post_feature_selection_v2.csv'
+RESULTS_FILE = 'model_benchmark.csv'
+CACHE_DIR = 'benchmark_cache'
+N_FOLDS = 10
+SEED = 42
+MODEL_SEED = 0
+RESULT_COLUMNS = ['variant', 'model', 'split', 'r2', 'mae', 'fit_seconds', 'latency_ms', 'batch_us_per_row',
+                  'size_bytes', 'model_hash', 'data_hash']
+
+
+# --- DATA ---
+
+def load_data(path=DATA_FILE):
+    """``X`` and ``log1p(price)`` as the notebook prepares them."""
+    df = pd.read_csv(path)
+    df['furnishing_type'] = df['furnishing_type'].replace(FURNISHING_LABELS)
+    return df.drop(columns=['price']), np.log1p(df['price'].to_numpy(dtype=np.float64))
+
+
+def splits(n, n_folds=N_FOLDS, seed=SEED):
+    """``{split: (train, test)}``: the notebook's KFold folds plus its 80/20 hold-out."""
+    from sklearn.model_selection import KFold, train_test_split
+
+    folds = {f'fold{i}': split for i, split in
+             enumerate(KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(np.arange(n)))}
+    folds['holdout'] = tuple(train_test_split(np.arange(n), test_size=0.2, random_state=seed))
+    return folds
+
+
+# --- PREPROCESSOR VARIANTS (model_selection.ipynb, in order) ---
+
+def ordinal_preprocessor():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OrdinalEncoder, StandardScaler
+
+    return ColumnTransformer([('num', StandardScaler(), NUMERIC_COLUMNS),
+                              ('cat', OrdinalEncoder(), CATEGORICAL_COLUMNS)], remainder='passthrough')
+
+
+def onehot_preprocessor():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    return ColumnTransformer([('num', StandardScaler(), NUMERIC_COLUMNS),
+                              ('cat', OrdinalEncoder(), CATEGORICAL_COLUMNS),
+                              ('cat1', OneHotEncoder(drop='first'), ['sector', 'agePossession', 'furnishing_type'])],
+                             remainder='passthrough')
+
+
+def pca_preprocessor():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.decomposition import PCA
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    columns = ColumnTransformer([('num', StandardScaler(), NUMERIC_COLUMNS),
+                                 ('cat', OrdinalEncoder(), CATEGORICAL_COLUMNS),
+                                 ('cat1', OneHotEncoder(drop='first', sparse_output=False),
+                                  ['sector', 'agePossession'])], remainder='passthrough')
+    return Pipeline([('preprocessor', columns), ('pca', PCA(n_components=0.95))])
+
+
+def target_preprocessor():
+    # sklearn's TargetEncoder stands in for category_encoders.TargetEncoder (no extra dependency);
+    # it cross-fits the encoding of the training rows
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler, TargetEncoder
+
+    return ColumnTransformer([('num', StandardScaler(), NUMERIC_COLUMNS),
+                              ('cat', OrdinalEncoder(), CATEGORICAL_COLUMNS),
+                              ('cat1', OneHotEncoder(drop='first', sparse_output=False), ['agePossession']),
+                              ('target_enc', TargetEncoder(random_state=SEED), ['sector'])],
+                             remainder='passthrough')
+
+
+def pipeline_preprocessor():
+    """The preprocessor of the production ``pipeline.pkl`` (the notebook's last cells)."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    return ColumnTransformer([('num', StandardScaler(), NUMERIC_COLUMNS),
+                              ('cat', OrdinalEncoder(), CATEGORICAL_COLUMNS),
+                              ('cat1', OneHotEncoder(drop='first', sparse_output=False),
+                               ['sector', 'agePossession'])], remainder='passthrough')
+
+
+PREPROCESSORS = {
+    'ordinal': ordinal_preprocessor,
+    'onehot': onehot_preprocessor,
+    'onehot_pca': pca_preprocessor,
+    'target': target_preprocessor,
+    'pipeline': pipeline_preprocessor,
+}
+
+
+# --- MODELS ---
+
+def models():
+    """The notebook's ``model_dict``; xgboost is included only when it is installed."""
+    from sklearn.ensemble import AdaBoostRegressor, ExtraTreesRegressor, GradientBoostingRegressor, \
+        RandomForestRegressor
+    from sklearn.linear_model import Lasso, LinearRegression, Ridge
+    from sklearn.neural_network import MLPRegressor
+    from sklearn.svm import SVR
+    from sklearn.tree import DecisionTreeRegressor
+
+    model_dict = {
+        'linear_reg': LinearRegression(),
+        'svr': SVR(),
+        'ridge': Ridge(),
+        'LASSO': Lasso(),
+        'decision tree': DecisionTreeRegressor(),
+        'random forest': RandomForestRegressor(),
+        'extra trees': ExtraTreesRegressor(),
+        'gradient boosting': GradientBoostingRegressor(),
+        'adaboost': AdaBoostRegressor(),
+        'mlp': MLPRegressor(),
+    }
+    try:
+        from xgboost import XGBRegressor
+    except ImportError:
+        pass
+    else:
+        model_dict['xgboost'] = XGBRegressor()
+    for model in model_dict.values():
+        if 'random_state' in model.get_params():
+            model.set_params(random_state=MODEL_SEED)
+    return model_dict
+
+
+def _hash(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+
+def model_hash(model):
+    params = sorted((k, repr(v)) for k, v in model.get_params(deep=True).items())
+    return _hash(type(model).__module__, type(model).__qualname__, params)
+
+
+def data_hash(data_digest, variant, split, n_folds=N_FOLDS, seed=SEED):
+    preprocessor = PREPROCESSORS[variant]()
+    params = sorted((k, repr(v)) for k, v in preprocessor.get_params(deep=True).items())
+    return _hash(data_digest, variant, params, split, n_folds, seed)
+
+
+# --- FOLD CACHE ---
+
+def fold_path(cache_dir, variant, split, digest):
+    return os.path.join(cache_dir, f"{variant}-{split}-{digest}.npz")
+
+
+def _dense(matrix):
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix, dtype=np.float64)
+
+
+def cache_folds(X, y, variant, folds, digests, cache_dir=CACHE_DIR):
+    """Fit the variant's preprocessor once per split and store the transformed matrices."""
+    os.makedirs(cache_dir, exist_ok=True)
+    for split, (train, test) in folds.items():
+        path = fold_path(cache_dir, variant, split, digests[split])
+        if os.path.exists(path):
+            continue
+        preprocessor = PREPROCESSORS[variant]()
+        X_train = _dense(preprocessor.fit_transform(X.iloc[train], y[train]))
+        X_test = _dense(preprocessor.transform(X.iloc[test]))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as file:
+            np.savez(file, X_train=X_train, y_train=y[train], X_test=X_test, y_test=y[test])
+        os.replace(tmp, path)
+
+
+# --- JOBS (run in the workers) ---
+
+def run_job(job):
+    """Fit one model on one cached fold and measure it."""
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    with np.load(job['path']) as fold:
+        X_train, y_train, X_test, y_test = (fold[k] for k in ('X_train', 'y_train', 'X_test', 'y_test'))
+    model = job['model']
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+    latency = min(_timed(model.predict, X_test[:1]) for _ in range(5))
+    return {'variant': job['variant'], 'model': job['name'], 'split': job['split'],
+            'r2': r2_score(y_test, y_pred), 'mae': mean_absolute_error(np.expm1(y_test), np.expm1(y_pred)),
+            'fit_seconds': fit_seconds, 'latency_ms': latency * 1e3,
+            'batch_us_per_row': batch_seconds / len(X_test) * 1e6, 'size_bytes': len(pickle.dumps(model)),
+            'model_hash': job['model_hash'], 'data_hash': job['data_hash']}
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def _results(jobs, workers):
+    if workers <= 1:
+        for job in jobs:
+            yield run_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(run_job, job))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# --- BENCHMARK ---
+
+def load_results(path=RESULTS_FILE):
+    if os.path.exists(path):
+        # a re-run combination is appended after its stale row
+        results = pd.read_csv(path)
+        return results.drop_duplicates(['variant', 'model', 'split'], keep='last').reset_index(drop=True)
+    return pd.DataFrame(columns=RESULT_COLUMNS)
+
+
+def _append(row, path):
+    frame = pd.DataFrame([row], columns=RESULT_COLUMNS)
+    frame.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def benchmark(data=DATA_FILE, variants=None, model_names=None, workers=1, results_path=RESULTS_FILE,
+              cache_dir=CACHE_DIR, force=False):
+    """Run the missing or stale (variant x model x split) jobs; returns the full results table.
+
+    Each job's row is appended to ``results_path`` as soon as it finishes, so an
+    interrupted run keeps what it measured and resumes from there.
+    """
+    X, y = load_data(data)
+    folds = splits(len(X))
+    digest = file_digest(data)
+    candidates = models()
+    variants = list(variants or PREPROCESSORS)
+    model_names = list(model_names or candidates)
+    unknown = set(model_names) - set(candidates)
+    if unknown:
+        raise ValueError(f"unknown or unavailable models: {sorted(unknown)}")
+
+    results = load_results(results_path)
+    done = set() if force else set(zip(results['variant'], results['model'], results['split'],
+                                       results['model_hash'], results['data_hash']))
+    jobs = []
+    for variant in variants:
+        digests = {split: data_hash(digest, variant, split) for split in folds}
+        pending = [(name, split) for name in model_names for split in folds
+                   if (variant, name, split, model_hash(candidates[name]), digests[split]) not in done]
+        if not pending:
+            continue
+        cache_folds(X, y, variant, {split: folds[split] for _, split in pending}, digests, cache_dir)
+        jobs += [{'variant': variant, 'name': name, 'split': split, 'model': candidates[name],
+                  'model_hash': model_hash(candidates[name]), 'data_hash': digests[split],
+                  'path': fold_path(cache_dir, variant, split, digests[split])} for name, split in pending]
+
+    for i, row in enumerate(_results(jobs, workers), 1):
+        _append(row, results_path)
+        print(f"[{i}/{len(jobs)}] {row['variant']:<11} {row['model']:<18} {row['split']:<8} "
+              f"r2={row['r2']:.4f} fit={row['fit_seconds']:.2f}s")
+    return load_results(results_path) if jobs else results
+
+
+def summarize(results):
+    """The notebook's table per variant: mean CV r2, hold-out MAE, plus cost columns."""
+    cv = results[results['split'] != 'holdout'].groupby(['variant', 'model'])
+    holdout = results[results['split'] == 'holdout'].set_index(['variant', 'model'])
+    summary = pd.DataFrame({'r2': cv['r2'].mean(), 'r2_std': cv['r2'].std(ddof=0),
+                            'fit_seconds': cv['fit_seconds'].mean()})
+    summary = summary.join(holdout[['mae', 'latency_ms', 'batch_us_per_row', 'size_bytes']], how='outer')
+    return summary.reset_index().sort_values(['variant', 'mae'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached, parallel model-selection benchmark.")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--variants', nargs='+', choices=list(PREPROCESSORS))
+    parser.add_argument('--models', nargs='+', help="names from the notebook's model_dict")
+    parser.add_argument('--workers', type=int, default=1, help="fitting processes (1 = in-process)")
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help="re-run every selected combination")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = benchmark(args.data, args.variants, args.models, args.workers, args.results, args.cache_dir,
+                        args.force)
+    selected = results[results['variant'].isin(args.variants or list(PREPROCESSORS))]
+    if args.models:
+        selected = selected[selected['model'].isin(args.models)]
+    with pd.option_context('display.width', 140, 'display.float_format', '{:.4f}'.format):
+        print(summarize(selected).to_string(index=False))
+    print(f"{time.perf_counter() - start:.1f}s -> {args.results}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Mergeable pairwise sufficient statistics for correlation matrices.
+
+For a group of rows and ``k`` numeric columns, four ``k x k`` matrices are
+enough to rebuild ``DataFrame.corr()`` exactly, including pandas'
+pairwise-complete handling of missing values:
+
+* ``counts[i, j]``  rows where both column ``i`` and ``j`` are present,
+* ``sums[i, j]``    sum of column ``i`` over those rows,
+* ``sumsq[i, j]``   sum of squares of column ``i`` over those rows,
+* ``cross[i, j]``   sum of ``x_i * x_j`` over those rows.
+
+Statistics of disjoint groups are combined by adding the matrices, so the
+cost of a correlation matrix depends on the number of groups, not on rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+def pairwise_moments(values, groups, n_groups, chunk_size=8192):
+    """Per-group moments stacked as ``4 x n_groups x k x k`` (counts, sums, sumsq, cross).
+
+    ``values`` is ``rows x k`` with NaN for missing entries; ``groups`` holds
+    each row's group id.  Rows are streamed in chunks to bound memory.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    k = values.shape[1]
+    order = np.argsort(groups, kind='stable')
+    groups = np.asarray(groups)[order]
+    moments = np.zeros((4, n_groups, k, k))
+    for start in range(0, len(order), chunk_size):
+        rows = order[start:start + chunk_size]
+        chunk_groups = groups[start:start + chunk_size]
+        present = ~np.isnan(values[rows])
+        x = np.where(present, values[rows], 0.0)
+        mask = present.astype(np.float64)
+        # rows are sorted by group, so each group is one contiguous run
+        starts = np.flatnonzero(np.r_[True, chunk_groups[1:] != chunk_groups[:-1]])
+        ids = chunk_groups[starts]
+        for m, (a, b) in enumerate(((mask, mask), (x, mask), (x * x, mask), (x, x))):
+            moments[m, ids] += np.add.reduceat(np.einsum('ni,nj->nij', a, b), starts, axis=0)
+    return moments
+
+
+def total_moments(values):
+    """Moments of all rows as one group (``4 x k x k``), as four matrix products."""
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    mask = present.astype(np.float64)
+    return np.stack([mask.T @ mask, x.T @ mask, (x * x).T @ mask, x.T @ x])
+
+
+def correlation(moments, columns=None):
+    """Pearson correlation from combined ``4 x k x k`` moments, matching ``DataFrame.corr()``.
+
+    Pairs with no overlapping rows or zero variance are NaN, as in pandas.
+    """
+    counts, sums, sumsq, cross = moments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = cross - sums * sums.T / counts
+        var_x = sumsq - sums ** 2 / counts
+        # constant columns: only rounding noise is left of sumsq - sums**2 / n
+        var_x[var_x <= 1e-12 * sumsq] = 0.0
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[(counts < 1) | ~np.isfinite(corr)] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    return corr if columns is None else pd.DataFrame(corr, index=columns, columns=columns)
@@ -0,0 +1,134 @@
+"""Large-data rendering for the Analysis dashboard's scatter and box plots.
+
+Below ``LARGE_DATA_ROWS`` rows the charts are drawn exactly as before.  Above
+it they switch to a large-data mode:
+
+* :func:`scatter` draws WebGL markers from a density-preserving sample: points
+  are binned on a grid and every occupied bin keeps a share of its points
+  proportional to its size (at least one).  Tukey outliers on either axis are
+  always kept.
+* :func:`box` ships precomputed quartiles and whisker ends per group plus
+  only the outlier points, instead of every row.
+
+In both modes the serialized figure is held under ``MAX_FIGURE_BYTES`` by
+halving the point budget until it fits.
+"""
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+LARGE_DATA_ROWS = 5000
+MAX_POINTS = 20000
+MAX_FIGURE_BYTES = 4 << 20
+
+
+def figure_bytes(fig):
+    return len(pio.to_json(fig, validate=False))
+
+
+def tukey_outliers(values, k=1.5):
+    """Mask of values outside ``[q1 - k*iqr, q3 + k*iqr]``."""
+    q1, q3 = np.nanquantile(values, [0.25, 0.75])
+    return (values < q1 - k * (q3 - q1)) | (values > q3 + k * (q3 - q1))
+
+
+def decimate(frame, x, y, max_points=MAX_POINTS, bins=100, seed=0):
+    """At most ``max_points`` rows of ``frame`` (outliers first) with the x/y density preserved."""
+    if len(frame) <= max_points:
+        return frame
+    xs, ys = frame[x].to_numpy(dtype=np.float64), frame[y].to_numpy(dtype=np.float64)
+    outlier = tukey_outliers(xs) | tukey_outliers(ys)
+    outliers = np.flatnonzero(outlier)
+    if len(outliers) >= max_points:
+        # keep the most extreme ones: largest distance from the median in IQR units
+        spread = [np.abs(v - np.nanmedian(v)) / (np.subtract(*np.nanquantile(v, [0.75, 0.25])) or 1.0)
+                  for v in (xs[outliers], ys[outliers])]
+        return frame.iloc[np.sort(outliers[np.argsort(-np.fmax(*spread))[:max_points]])]
+
+    inliers = np.flatnonzero(~outlier)
+    cell = np.zeros(len(inliers), dtype=np.int64)
+    for values in (xs[inliers], ys[inliers]):
+        edges = np.linspace(np.nanmin(values), np.nanmax(values), bins + 1)
+        cell = cell * bins + np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(cell)
+    occupied = counts > 0
+    # one point per occupied bin is reserved, the rest of the budget is shared by size
+    budget = max(max_points - len(outliers) - int(occupied.sum()), 0)
+    quota = np.minimum(np.floor(counts * budget / len(inliers)) + occupied, counts)
+
+    # random order inside each bin, then keep the first `quota` of every bin
+    order = np.lexsort((np.random.default_rng(seed).random(len(inliers)), cell))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(order)) - starts[cell[order]]
+    kept = inliers[order[rank < quota[cell[order]]]]
+    return frame.iloc[np.sort(np.concatenate([outliers, kept]))]
+
+
+def scatter(frame, x, y, marker=None, threshold=LARGE_DATA_ROWS, max_points=MAX_POINTS,
+            max_bytes=MAX_FIGURE_BYTES, **kwargs):
+    """``px.scatter`` that switches to decimated WebGL markers above ``threshold`` rows."""
+    if len(frame) <= threshold:
+        fig = px.scatter(frame, x=x, y=y, **kwargs)
+        if marker:
+            fig.update_traces(marker=marker)
+        return fig
+
+    title = kwargs.pop('title', None)
+    while True:
+        sample = decimate(frame, x, y, max_points)
+        fig = px.scatter(sample, x=x, y=y, render_mode='webgl', **kwargs,
+                         title=f"{title or ''} ({len(sample):,} of {len(frame):,} points)".strip())
+        fig.update_traces(marker=dict(size=5, line=dict(width=0)))
+        if max_points <= 1000 or figure_bytes(fig) <= max_bytes:
+            return fig
+        max_points //= 2
+
+
+def box_stats(values):
+    """Plotly-style box: linear quartiles and whiskers at the furthest points within 1.5 IQR."""
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {'q1': q1, 'median': median, 'q3': q3, 'lowerfence': inside.min(), 'upperfence': inside.max(),
+            'outliers': (values < inside.min()) | (values > inside.max())}
+
+
+def box(frame, x, y, hover_data=(), title=None, labels=None, threshold=LARGE_DATA_ROWS, max_points=MAX_POINTS,
+        max_bytes=MAX_FIGURE_BYTES, **kwargs):
+    """``px.box(points="all")`` that ships precomputed boxes and outliers only above ``threshold`` rows."""
+    labels = labels or {}
+    if len(frame) <= threshold:
+        fig = px.box(frame, x=x, y=y, title=title, points="all", labels=labels, hover_data=list(hover_data),
+                     **kwargs)
+        fig.update_traces(jitter=0.3, marker_opacity=0.4)
+        return fig
+
+    hover_data = list(hover_data)
+    template = '<br>'.join([f"{labels.get(c, c)}=%{{{axis}}}" for c, axis in ((x, 'x'), (y, 'y'))]
+                           + [f"{c}=%{{customdata[{i}]}}" for i, c in enumerate(hover_data)]) + '<extra></extra>'
+    while True:
+        fig = go.Figure()
+        budget = max_points
+        for group, rows in frame.groupby(x, sort=True):
+            values = rows[y].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            stats = box_stats(values)
+            color = px.colors.qualitative.Plotly[len(fig.data) // 2 % len(px.colors.qualitative.Plotly)]
+            fig.add_trace(go.Box(x=[group], q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                                 lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                                 name=str(group), marker_color=color, boxpoints=False))
+            outliers = rows[rows[y].notna()][stats['outliers']]
+            if len(outliers) > budget:
+                # most extreme first
+                outliers = outliers.iloc[np.argsort(-np.abs(outliers[y].to_numpy() - stats['median']))[:budget]]
+            budget -= len(outliers)
+            fig.add_trace(go.Scattergl(x=np.full(len(outliers), group), y=outliers[y], mode='markers',
+                                       name=str(group), marker=dict(color=color, opacity=0.6, size=5),
+                                       customdata=outliers[hover_data].to_numpy(), hovertemplate=template))
+        fig.update_layout(title=title, xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+        if max_points <= 1000 or figure_bytes(fig) <= max_bytes:
+            return fig
+        max_points //= 2
@@ -0,0 +1,166 @@
+"""Memoized predictions for the price predictor's discrete input space.
+
+Every predictor input except ``built_up_area`` is a selectbox over a small
+domain, so most traffic repeats earlier queries.  :class:`PredictionCache` keeps
+a bounded LRU of prices and their low/high band keyed on the canonicalized
+input row and only sends misses to the forest, one pass per batch of misses.
+
+:class:`PriceGrid` is an optional precomputed table over sectors x the most
+common configurations x log-spaced built-up areas.  Rows it covers are
+answered by interpolating between the two neighbouring area points, without
+touching the forest.  Build it offline with::
+
+    python -m realestate.prediction_cache --configs 20 --bins 60
+"""
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from realestate.artifacts import file_digest
+from realestate.price_model import AREA_RANGE, FEATURE_COLUMNS, NUMERIC_COLUMNS, PIPELINE_FILE, load_pipeline, \
+    predict_price_band, price_band
+
+GRID_FILE = 'price_grid.npz'
+CONFIG_COLUMNS = [c for c in FEATURE_COLUMNS if c not in ('sector', 'built_up_area')]
+
+
+def canonical_key(row):
+    """Hashable key for one input row (a mapping over ``FEATURE_COLUMNS``)."""
+    return tuple(float(row[c]) if c in NUMERIC_COLUMNS else str(row[c]) for c in FEATURE_COLUMNS)
+
+
+class PriceGrid:
+    """Price, low and high over ``sectors x configs x area points``, interpolated in log-area."""
+
+    def __init__(self, sectors, configs, areas, prices, pipeline_digest=''):
+        self.sectors = {s: i for i, s in enumerate(sectors)}
+        self.configs = {tuple(c): i for i, c in enumerate(configs)}
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.log_areas = np.log(self.areas)
+        self.prices = np.asarray(prices, dtype=np.float32)
+        if self.prices.ndim == 3:
+            # grids saved before the bands: price only, fixed band
+            self.prices = np.stack([self.prices, *price_band(self.prices)], axis=-1).astype(np.float32)
+        self.pipeline_digest = pipeline_digest
+
+    def lookup(self, key):
+        """``(price, low, high)`` for a canonical key, or ``None`` if the grid does not cover it."""
+        values = dict(zip(FEATURE_COLUMNS, key))
+        sector = self.sectors.get(values['sector'])
+        config = self.configs.get(tuple(values[c] for c in CONFIG_COLUMNS))
+        area = values['built_up_area']
+        if sector is None or config is None or not self.areas[0] <= area <= self.areas[-1]:
+            return None
+        curves = self.prices[sector, config]
+        return tuple(float(np.interp(np.log(area), self.log_areas, curves[:, i])) for i in range(3))
+
+    @classmethod
+    def build(cls, pipeline, df, n_configs=20, n_bins=60, pipeline_digest='', batch_size=50000):
+        sectors = sorted(df['sector'].astype(str).unique())
+        keys = pd.DataFrame([canonical_key(row) for row in df.to_dict('records')], columns=FEATURE_COLUMNS)
+        configs = keys[CONFIG_COLUMNS].value_counts().head(n_configs).index.tolist()
+        areas = np.geomspace(*AREA_RANGE, n_bins)
+
+        grid = pd.MultiIndex.from_product([range(len(sectors)), range(len(configs)), range(len(areas))],
+                                          names=['s', 'c', 'a']).to_frame(index=False)
+        X = pd.DataFrame(np.array(configs, dtype=object)[grid['c']], columns=CONFIG_COLUMNS)
+        X['sector'] = np.array(sectors, dtype=object)[grid['s']]
+        X['built_up_area'] = areas[grid['a']]
+        X = X[FEATURE_COLUMNS].astype({c: np.float64 for c in NUMERIC_COLUMNS})
+
+        prices = np.concatenate([np.column_stack(predict_price_band(pipeline, X.iloc[i:i + batch_size]))
+                                 for i in range(0, len(X), batch_size)])
+        return cls(sectors, configs, areas, prices.reshape(len(sectors), len(configs), len(areas), 3),
+                   pipeline_digest)
+
+    def save(self, path=GRID_FILE):
+        configs = np.array(list(self.configs), dtype=object)
+        np.savez(path, sectors=np.array(list(self.sectors), dtype=str), configs=configs.astype(str),
+                 areas=self.areas, prices=self.prices, pipeline_digest=np.array(self.pipeline_digest))
+
+    @classmethod
+    def load(cls, path=GRID_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            configs = [tuple(float(v) if c in NUMERIC_COLUMNS else str(v) for c, v in zip(CONFIG_COLUMNS, row))
+                       for row in data['configs']]
+            return cls(data['sectors'].tolist(), configs, data['areas'], data['prices'],
+                       str(data['pipeline_digest']))
+
+
+class PredictionCache:
+    """Bounded LRU of predicted prices and bands with hit/miss counters."""
+
+    def __init__(self, pipeline, maxsize=4096, grid=None):
+        self.pipeline = pipeline
+        self.maxsize = maxsize
+        self.grid = grid
+        self.hits = self.misses = self.grid_hits = 0
+        self._prices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, X):
+        """Prices in crore for every row of ``X``; only uncached rows reach the forest."""
+        return self.predict_band(X)[0]
+
+    def predict_band(self, X):
+        """``(price, low, high)`` arrays in crore for every row of ``X``, as ``predict_price_band``."""
+        keys = [canonical_key(row) for row in X[FEATURE_COLUMNS].to_dict('records')]
+        prices = np.empty((len(keys), 3))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                price = self._prices.get(key)
+                if price is not None:
+                    self._prices.move_to_end(key)
+                    self.hits += 1
+                elif self.grid is not None and (price := self.grid.lookup(key)) is not None:
+                    self.grid_hits += 1
+                else:
+                    missing.append(i)
+                    continue
+                prices[i] = price
+
+        if missing:
+            prices[missing] = np.column_stack(predict_price_band(self.pipeline, X.iloc[missing]))
+            with self._lock:
+                self.misses += len(missing)
+                for i in missing:
+                    self._prices[keys[i]] = tuple(prices[i])
+                    self._prices.move_to_end(keys[i])
+                while len(self._prices) > self.maxsize:
+                    self._prices.popitem(last=False)
+        return prices[:, 0], prices[:, 1], prices[:, 2]
+
+    def info(self):
+        lookups = self.hits + self.grid_hits + self.misses
+        return {'hits': self.hits, 'grid_hits': self.grid_hits, 'misses': self.misses,
+                'hit_rate': (self.hits + self.grid_hits) / lookups if lookups else 0.0,
+                'size': len(self._prices), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+            self.hits = self.misses = self.grid_hits = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the sector x configuration x area price grid.")
+    parser.add_argument('--pipeline', default=PIPELINE_FILE)
+    parser.add_argument('--data', default='df.pkl', help="predictor inputs the configurations are drawn from")
+    parser.add_argument('--configs', type=int, default=20, help="most common configurations to cover")
+    parser.add_argument('--bins', type=int, default=60, help="log-spaced built-up area points")
+    parser.add_argument('--output', default=GRID_FILE)
+    args = parser.parse_args()
+
+    df = pd.read_pickle(args.data)
+    grid = PriceGrid.build(load_pipeline(args.pipeline), df, args.configs, args.bins, file_digest(args.pipeline))
+    grid.save(args.output)
+    print(f"saved {grid.prices.size} grid prices ({len(grid.sectors)} sectors x {len(grid.configs)} configs x "
+          f"{len(grid.areas)} areas) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
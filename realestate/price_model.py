@@ -0,0 +1,109 @@
+"""Input schema and helpers shared by everything that runs ``pipeline.pkl``."""
+import os
+import pickle
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from realestate import instrumentation
+
+PIPELINE_FILE = 'pipeline.pkl'
+
+FEATURE_COLUMNS = ['property_type', 'sector', 'bedRoom', 'bathroom', 'balcony', 'agePossession',
+                   'built_up_area', 'servant room', 'store room', 'furnishing_type', 'luxury_category',
+                   'floor_category']
+NUMERIC_COLUMNS = ['bedRoom', 'bathroom', 'built_up_area', 'servant room', 'store room']
+CATEGORICAL_COLUMNS = [c for c in FEATURE_COLUMNS if c not in NUMERIC_COLUMNS]
+
+# model_selection.ipynb trains on the labels, the CSVs store the codes
+FURNISHING_LABELS = {0.0: 'unfurnished', 1.0: 'semifurnished', 2.0: 'furnished'}
+
+# the predictor page refuses areas outside this range (sqft)
+AREA_RANGE = (50.0, 15000.0)
+# per-tree quantiles (log space) that bound the low/high band around the point prediction
+BAND_QUANTILES = (0.1, 0.9)
+# fixed +/- band in crore for models without averaged trees (the boosted surrogate)
+BAND_HALF_WIDTH = 0.22
+
+_leaf_tables = weakref.WeakKeyDictionary()
+
+
+def load_pipeline(path=PIPELINE_FILE):
+    """The pickled pipeline, or a ``compact_model`` export when ``path`` is its directory."""
+    if os.path.isdir(path):
+        from realestate.compact_model import CompactModel
+
+        return CompactModel.load(path)
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def input_frame(rows):
+    """One-or-more input rows (lists in ``FEATURE_COLUMNS`` order) as a frame."""
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+def known_categories(pipeline):
+    """``{column: array of categories}`` seen by the fitted encoders."""
+    if hasattr(pipeline, 'known_categories'):
+        return pipeline.known_categories()
+    categories = {}
+    for _, transformer, columns in pipeline.named_steps['preprocessor'].transformers_:
+        for column, values in zip(columns, getattr(transformer, 'categories_', [])):
+            if column in categories:
+                values = np.intersect1d(categories[column], values)
+            categories[column] = np.asarray(values, dtype=object)
+    return categories
+
+
+def predict_price(pipeline, X):
+    """Prices in crore (the model is trained on ``log1p(price)``)."""
+    with instrumentation.timer('model.predict'):
+        return np.expm1(pipeline.predict(X))
+
+
+def price_band(price):
+    return np.round(price - BAND_HALF_WIDTH, 2), np.round(price + BAND_HALF_WIDTH, 2)
+
+
+def _leaf_table(forest):
+    """Every tree's node values in one flat array, plus each tree's offset into it (built once per forest)."""
+    table = _leaf_tables.get(forest)
+    if table is None:
+        values = [estimator.tree_.value.reshape(-1) for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [len(v) for v in values[:-1]])
+        table = _leaf_tables[forest] = (np.concatenate(values), offsets)
+    return table
+
+
+def tree_predictions(pipeline, X):
+    """``(rows, trees)`` log1p prices of every forest tree from one pass; ``None`` for models without averaged trees."""
+    if hasattr(pipeline, 'tree_predictions'):
+        with instrumentation.timer('model.tree_predictions'):
+            return pipeline.tree_predictions(X)
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+    forest = pipeline.steps[-1][1]
+    if not isinstance(forest, (RandomForestRegressor, ExtraTreesRegressor)):
+        return None
+    with instrumentation.timer('model.tree_predictions'):
+        # apply() walks all trees once like predict(), but keeps each tree's leaf
+        leaves = forest.apply(pipeline[:-1].transform(X))
+        values, offsets = _leaf_table(forest)
+        return values[leaves + offsets]
+
+
+def predict_price_band(pipeline, X, quantiles=BAND_QUANTILES):
+    """``(price, low, high)`` in crore per row, the band from the spread of the forest's trees.
+
+    ``low``/``high`` are the per-tree ``quantiles`` in log space, back-transformed
+    and rounded like :func:`price_band`, which is the fallback for other models.
+    """
+    trees = tree_predictions(pipeline, X)
+    if trees is None:
+        price = predict_price(pipeline, X)
+        return (price, *price_band(price))
+    price = np.expm1(trees.mean(axis=1, dtype=np.float64))
+    low, high = np.expm1(np.quantile(trees, quantiles, axis=1))
+    return price, np.round(np.minimum(low, price), 2), np.round(np.maximum(high, price), 2)
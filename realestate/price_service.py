@@ -0,0 +1,255 @@
+"""Local HTTP price prediction service with micro-batching.
+
+The pipeline is loaded once and kept warm.  Concurrent single-row requests are
+queued and coalesced into one ``predict`` call per micro-batch (up to
+``--max-batch`` rows or ``--max-wait-ms`` after the first row arrives), so
+many clients share the pandas/sklearn per-call overhead.
+
+Usage::
+
+    python -m realestate.price_service --port 8765
+
+Endpoints:
+
+* ``POST /predict`` with one JSON object keyed by the 12 feature columns, or
+  ``{"rows": [...]}``; returns ``price``/``low``/``high`` in crore per row.
+* ``GET /stats``: p50/p99 latency, throughput and batch sizes.
+* ``GET /health``.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from realestate.batch_scoring import validate
+from realestate.price_model import (CATEGORICAL_COLUMNS, FEATURE_COLUMNS, PIPELINE_FILE, known_categories,
+                                    load_pipeline, predict_price_band)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class LatencyStats:
+    """Rolling request latencies and throughput."""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.finished = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.started = time.perf_counter()
+
+    def record(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+        self.finished.append(time.perf_counter())
+
+    def snapshot(self):
+        now = time.perf_counter()
+        latencies = np.array(self.latencies) * 1000
+        recent = [t for t in self.finished if now - t <= 60]
+        return {
+            'requests': self.requests,
+            'uptime_s': round(now - self.started, 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            'throughput_rps_1m': round(len(recent) / min(60.0, max(now - self.started, 1e-9)), 1),
+            'mean_batch_size': round(float(np.mean(self.batch_sizes)), 2) if self.batch_sizes else None,
+            'max_batch_size': max(self.batch_sizes) if self.batch_sizes else None,
+        }
+
+
+class MicroBatcher:
+    """Coalesces queued rows into batched ``predict`` calls."""
+
+    def __init__(self, pipeline, max_batch=64, max_wait_ms=5.0, stats=None):
+        self.pipeline = pipeline
+        self.categories = known_categories(pipeline)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats or LatencyStats()
+        self._queue = asyncio.Queue()
+        # predict runs off the event loop so new requests keep queueing meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            rows = [row for row, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.score, rows)
+            except Exception:  # a broken batch must not kill the loop, nor fail its other rows
+                results = await loop.run_in_executor(self._executor, self.score_each, rows)
+            self.stats.batch_sizes.append(len(batch))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def score(self, rows):
+        frame = pd.DataFrame([_normalize(row) for row in rows], columns=FEATURE_COLUMNS)
+        X, errors = validate(frame, self.categories)
+        valid = errors == ''
+        prices, low, high = np.full((3, len(rows)), np.nan)
+        if valid.any():
+            prices[valid], low[valid], high[valid] = predict_price_band(self.pipeline, X[valid])
+        return [{'price': round(float(p), 4), 'low': float(lo), 'high': float(hi)} if ok else {'error': err}
+                for p, lo, hi, ok, err in zip(prices, low, high, valid, errors)]
+
+    def score_each(self, rows):
+        """Score rows one at a time, so a row that breaks ``predict`` only fails itself."""
+        results = []
+        for row in rows:
+            try:
+                results.extend(self.score([row]))
+            except Exception as exc:
+                results.append({'error': str(exc)})
+        return results
+
+
+def check_row(row):
+    """Why ``row`` cannot be queued (``None`` if it can): a JSON object of scalar values."""
+    if not isinstance(row, dict):
+        return f"expected a JSON object per row, got {type(row).__name__}"
+    nested = [column for column, value in row.items() if isinstance(value, (dict, list))]
+    if nested:
+        return f"expected scalar values, got nested values in {nested}"
+    return None
+
+
+def _normalize(row):
+    """JSON numbers for categorical columns as the strings the encoders expect."""
+    row = dict(row)
+    for column in CATEGORICAL_COLUMNS:
+        value = row.get(column)
+        if column != 'furnishing_type' and isinstance(value, (int, float)) and not isinstance(value, bool):
+            row[column] = str(int(value)) if float(value).is_integer() else str(value)
+    return row
+
+
+class PriceService:
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, payload = await self.route(method, path, body)
+                except Exception as exc:  # answer instead of dropping the connection
+                    status, payload = 500, {'error': str(exc)}
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.batcher.stats.snapshot()
+        if path != '/predict':
+            return 404, {'error': f"unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError as exc:
+            return 400, {'error': f"invalid JSON: {exc}"}
+        if isinstance(payload, dict) and 'rows' in payload:
+            rows = payload['rows']
+            if not isinstance(rows, list):
+                return 400, {'error': f"'rows' must be a list, got {type(rows).__name__}"}
+            problems = {i: problem for i, row in enumerate(rows) if (problem := check_row(row))}
+            if problems:
+                return 400, {'error': "malformed rows", 'rows': problems}
+            results = await asyncio.gather(*(self.batcher.predict(row) for row in rows))
+            response = {'results': results}
+        elif isinstance(payload, dict):
+            problem = check_row(payload)
+            if problem:
+                return 400, {'error': problem}
+            response = await self.batcher.predict(payload)
+        else:
+            return 400, {'error': "expected a JSON object"}
+        self.batcher.stats.record(time.perf_counter() - start)
+        return 200, response
+
+
+async def serve(host='127.0.0.1', port=8765, pipeline_path=PIPELINE_FILE, max_batch=64, max_wait_ms=5.0):
+    pipeline = load_pipeline(pipeline_path)
+    batcher = MicroBatcher(pipeline, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    # warm up the forest and the encoders before the first real request
+    sample = {column: batcher.categories[column][0] for column in CATEGORICAL_COLUMNS}
+    batcher.score([{**sample, 'bedRoom': 2, 'bathroom': 2, 'built_up_area': 1000,
+                    'servant room': 0, 'store room': 0}])
+    batcher.start()
+
+    server = await asyncio.start_server(PriceService(batcher).handle, host, port)
+    print(f"serving {pipeline_path} on http://{host}:{port} (max batch {max_batch}, max wait {max_wait_ms} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pipeline.pkl over HTTP with micro-batching.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pipeline', default=PIPELINE_FILE)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.pipeline, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Precomputed top-K neighbour index for the apartment recommender.
+
+The page used to blend the three N x N cosine matrices on every click and sort
+a full row to return a handful of apartments.  Here every property keeps a short
+candidate list (ids, blended score and the three component scores, all compact
+arrays) so a query is a slice of that list.  Changing the blend weights only
+re-ranks the candidates instead of touching the dense matrices.
+
+Build the index with::
+
+    python -m realestate.recommender               # from appartments.csv
+    python -m realestate.recommender --from-pickles  # from cosine_sim*.pkl
+"""
+import argparse
+import pickle
+
+import numpy as np
+
+from realestate import instrumentation
+
+DEFAULT_WEIGHTS = (0.5, 0.8, 1.0)
+INDEX_FILE = 'recommender_index.npz'
+SIMILARITY_FILES = ('cosine_sim1.pkl', 'cosine_sim2.pkl', 'cosine_sim3.pkl')
+
+
+class NeighbourIndex:
+    """Per-property candidate lists sorted by the default blended score."""
+
+    def __init__(self, names, ids, scores, components, weights=DEFAULT_WEIGHTS):
+        self.names = np.asarray(names, dtype=object)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def n_candidates(self):
+        return self.ids.shape[1]
+
+    def position(self, name):
+        return self._positions[name]
+
+    def query(self, name, top_n=5, min_score=0.0, weights=None):
+        """Return ``(names, scores)`` of the best ``top_n`` neighbours of ``name``.
+
+        With the default weights this is a slice of the stored list.  Other
+        weights re-rank the stored candidates, so the answer is exact as long as
+        the true neighbours under the new weights are among them.
+        """
+        row = self._positions[name]
+        # lists of an incrementally updated index may be padded with id -1
+        valid = self.ids[row] >= 0
+        ids = self.ids[row][valid]
+        if weights is None or np.allclose(weights, self.weights):
+            scores = self.scores[row][valid]
+        else:
+            with instrumentation.timer('recommender.blend'):
+                scores = self.components[row][valid] @ np.asarray(weights, dtype=np.float32)
+                order = np.argsort(-scores, kind='stable')
+                ids, scores = ids[order], scores[order]
+        # scores are sorted descending, so the min_score cut is a binary search
+        n_valid = np.searchsorted(-scores, -np.float32(min_score), side='right')
+        keep = min(int(top_n), int(n_valid))
+        return self.names[ids[:keep]], scores[:keep]
+
+    def save(self, path=INDEX_FILE):
+        np.savez(path, names=self.names.astype(str), ids=self.ids, scores=self.scores,
+                 components=self.components, weights=self.weights)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['names'].astype(object), data['ids'], data['scores'],
+                       data['components'], data['weights'])
+
+
+def top_candidates(blocks, rows, weights, k):
+    """Top-``k`` candidates of ``rows`` from their per-component similarity ``blocks``.
+
+    Returns ``(ids, scores, components)`` sorted by blended score; when fewer
+    than ``k`` other properties exist the lists are padded with id -1 and score
+    ``-inf``.
+    """
+    blocks = [np.asarray(block, dtype=np.float32) for block in blocks]
+    blend = sum(w * block for w, block in zip(weights, blocks))
+    # a property is never its own recommendation
+    blend[np.arange(len(rows)), rows] = -np.inf
+
+    n = blend.shape[1]
+    top = np.argpartition(-blend, min(k, n) - 1, axis=1)[:, :min(k, n)]
+    top_scores = np.take_along_axis(blend, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top_components = np.stack([np.take_along_axis(block, top, axis=1) for block in blocks], axis=-1)
+
+    ids = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    components = np.zeros((len(rows), k, len(blocks)), dtype=np.float32)
+    valid = top_scores > -np.inf
+    width = top.shape[1]
+    ids[:, :width] = np.where(valid, top, -1)
+    scores[:, :width] = top_scores
+    components[:, :width] = np.where(valid[..., None], top_components, 0)
+    return ids, scores, components
+
+
+def build_index(component_rows, names, weights=DEFAULT_WEIGHTS, n_candidates=100, batch_size=256):
+    """Build a :class:`NeighbourIndex` without holding a blended N x N matrix.
+
+    ``component_rows(rows)`` must return one ``(len(rows), N)`` similarity block
+    per component for the requested row positions.  Rows are processed in
+    batches so peak memory is ``batch_size x N`` per component.
+    """
+    names = np.asarray(names, dtype=object)
+    n = len(names)
+    weights = np.asarray(weights, dtype=np.float32)
+    k = max(1, min(int(n_candidates), n - 1))
+
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    components = np.empty((n, k, len(weights)), dtype=np.float32)
+
+    for start in range(0, n, batch_size):
+        rows = np.arange(start, min(start + batch_size, n))
+        ids[rows], scores[rows], components[rows] = top_candidates(component_rows(rows), rows, weights, k)
+
+    return NeighbourIndex(names, ids, scores, components, weights)
+
+
+def build_from_matrices(matrices, names, **kwargs):
+    """Build the index from dense per-component similarity matrices."""
+    return build_index(lambda rows: [m[rows] for m in matrices], names, **kwargs)
+
+
+def build_from_pickles(location_df_path='location_df.pkl', similarity_files=SIMILARITY_FILES, **kwargs):
+    with open(location_df_path, 'rb') as file:
+        location_df = pickle.load(file)
+    matrices = []
+    for path in similarity_files:
+        with open(path, 'rb') as file:
+            matrices.append(pickle.load(file))
+    return build_from_matrices(matrices, location_df.index, **kwargs)
+
+
+def build_from_apartments(path='appartments.csv', **kwargs):
+    """Build the index from the factorized engine, never materializing N x N."""
+    from realestate.similarity import SimilarityEngine
+
+    engine = SimilarityEngine.from_apartments(path)
+    return build_index(engine.component_rows, engine.names, weights=engine.weights, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the top-K neighbour index for the recommender.")
+    parser.add_argument('--output', default=INDEX_FILE)
+    parser.add_argument('--candidates', type=int, default=100,
+                        help="candidates kept per property (re-ranked when weights change)")
+    parser.add_argument('--from-pickles', action='store_true',
+                        help="use the dense cosine_sim*.pkl matrices instead of appartments.csv")
+    args = parser.parse_args()
+
+    if args.from_pickles:
+        index = build_from_pickles(n_candidates=args.candidates)
+    else:
+        index = build_from_apartments(n_candidates=args.candidates)
+    index.save(args.output)
+    print(f"saved {len(index)} properties x {index.n_candidates} candidates to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
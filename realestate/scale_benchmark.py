@@ -0,0 +1,286 @@
+"""End-to-end benchmark of the app's hot paths on synthetic data at several scales.
+
+For each scale, :mod:`realestate.synthetic` writes (or reuses) a dataset under
+``synthetic/<rows>/`` and every stage is timed on it:
+
+* ``dashboard``: building the :class:`~realestate.filters.FilterIndex` and the
+  :class:`~realestate.cube.FilterCube`, then random sidebar selections through
+  ``rows()``, ``summarize()`` and the original pandas masks,
+* ``recommender``: :meth:`LiveIndex.from_frame <realestate.live_index.LiveIndex.from_frame>`
+  on the apartments, then queries with the default and with re-ranking weights,
+* ``radius``: a :class:`~realestate.geo.GeoIndex` over the listings' points
+  and the sectors, then 2 km ``within()`` searches around random sectors,
+* ``prediction``: single-row and batch :func:`~realestate.price_model.predict_price_band`
+  on validated model rows.
+
+The candidate lists are quadratic to build, so the recommender stage caps the
+apartments at ``--max-apartments``; the pandas baseline and batch prediction
+are capped likewise.  Every timing is taken ``--repeat`` times; it is appended
+to ``scale_benchmark.csv`` as one ``(run_id, label, scale, stage, metric,
+value, spread)`` row holding the median and the max - min of the repeats.
+``--compare`` checks the new run against the previous one (or ``--baseline``)
+and lists the timings that got more than 20% worse by more than both the
+noise floor and the larger of the two runs' spreads::
+
+    python -m realestate.scale_benchmark --scales 10000 100000 1000000 --label before
+    python -m realestate.scale_benchmark --scales 10000 100000 --compare
+    python -m realestate.scale_benchmark --compare-only --baseline 20241001-120000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate import synthetic
+from realestate.datastore import read_parquet
+from realestate.price_model import PIPELINE_FILE
+
+SCALES = (10_000, 100_000, 1_000_000)
+RESULTS_FILE = 'scale_benchmark.csv'
+RESULT_COLUMNS = ['run_id', 'timestamp', 'label', 'scale', 'stage', 'metric', 'value', 'spread']
+STAGES = ('dashboard', 'recommender', 'radius', 'prediction')
+N_QUERIES = 200
+MAX_PANDAS_QUERIES = 20
+MAX_APARTMENTS = 20_000
+MAX_PREDICT_ROWS = 200_000
+RADIUS_KM = 2.0
+REPEATS = 5
+REGRESSION = 0.2  # a metric 20% worse than the baseline is a regression...
+# ...if it also moved by more than this (ms per call, s per build; throughputs rely on the spread alone)
+NOISE_FLOOR = {'_per_s': 0.0, '_ms': 0.05, '_s': 0.02}
+HIGHER_IS_BETTER = {'batch_rows_per_s'}
+CUSTOM_WEIGHTS = (1.0, 0.3, 0.6)
+
+
+def _per_call_ms(function, args, repeat=REPEATS):
+    """Mean wall time of ``function(*a)`` over ``args``, in ms, for each of ``repeat`` passes."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for a in args:
+            function(*a)
+        times.append((time.perf_counter() - start) / max(len(args), 1) * 1e3)
+    return np.array(times)
+
+
+def _build_s(factory, *args, repeat=REPEATS):
+    """``(result, seconds of each of repeat builds)``; the result is the last build's."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = factory(*args)
+        times.append(time.perf_counter() - start)
+    return result, np.array(times)
+
+
+# --- DATA ---
+
+def dataset(scale, root=synthetic.SYNTHETIC_DIR, seed=0, regenerate=False):
+    """Directory of the synthetic dataset with ``scale`` listings, generated on first use."""
+    path = os.path.join(root, str(scale))
+    files = ('listings.parquet', 'model_rows.parquet', 'apartments.csv')
+    if regenerate or not all(os.path.exists(os.path.join(path, name)) for name in files):
+        synthetic.generate(path, scale, seed=seed)
+    return path
+
+
+# --- STAGES ---
+
+def bench_dashboard(path, rng, n_queries=N_QUERIES, repeat=REPEATS):
+    from realestate.cube import FilterCube
+    from realestate.filters import FILTER_COLUMNS, FilterIndex, _pandas_rows
+
+    df = read_parquet(os.path.join(path, 'listings.parquet')).reset_index(drop=True)
+    index, index_s = _build_s(FilterIndex, df, repeat=repeat)
+    cube, cube_s = _build_s(FilterCube, df, repeat=repeat)
+
+    queries = []
+    for _ in range(n_queries):
+        selection = {column: rng.choice(index.options(column)) for column in FILTER_COLUMNS[:3]
+                     if rng.random() < 0.5}
+        queries.append((tuple(np.sort(rng.choice(index.sorted_price, 2))), selection))
+    return {
+        'index_build_s': index_s,
+        'cube_build_s': cube_s,
+        'index_rows_ms': _per_call_ms(lambda q, s: index.rows(q, **s), queries, repeat),
+        'cube_summarize_ms': _per_call_ms(lambda q, s: cube.summarize(q, **s), queries, repeat),
+        'pandas_rows_ms': _per_call_ms(lambda q, s: _pandas_rows(df, q, s), queries[:MAX_PANDAS_QUERIES], repeat),
+    }
+
+
+def bench_recommender(path, rng, n_queries=N_QUERIES, max_apartments=MAX_APARTMENTS, repeat=REPEATS):
+    from realestate.live_index import LiveIndex
+
+    frame = pd.read_csv(os.path.join(path, 'apartments.csv')).head(max_apartments)
+    live, build_s = _build_s(LiveIndex.from_frame, frame, repeat=repeat)
+    index = live.neighbour_index()
+    names = [(name,) for name in rng.choice(live.names, n_queries)]
+    return {
+        'apartments': len(frame),
+        'build_s': build_s,
+        'query_ms': _per_call_ms(index.query, names, repeat),
+        'reweighted_query_ms': _per_call_ms(lambda name: index.query(name, weights=CUSTOM_WEIGHTS), names, repeat),
+    }
+
+
+def bench_radius(path, rng, n_queries=N_QUERIES, sectors_path='latlong.csv', repeat=REPEATS):
+    import sklearn.neighbors  # noqa: F401  (GeoIndex imports it lazily; keep the import out of build_s)
+
+    from realestate.geo import GeoIndex, load_sectors
+
+    points = read_parquet(os.path.join(path, 'listings.parquet'), columns=['latitude', 'longitude'])
+    points = points.dropna().reset_index(drop=True)
+    sectors = load_sectors(sectors_path)
+    names = np.concatenate([points.index.astype(str), list(sectors)])
+    kinds = np.repeat(['apartment', 'sector'], [len(points), len(sectors)])
+    latitude = np.concatenate([points['latitude'], [lat for lat, _ in sectors.values()]])
+    longitude = np.concatenate([points['longitude'], [lon for _, lon in sectors.values()]])
+    index, build_s = _build_s(GeoIndex, names, kinds, latitude, longitude, repeat=repeat)
+
+    centres = [sectors[name] for name in rng.choice(list(sectors), n_queries)]
+    hits = [len(index.within(lat, lon, RADIUS_KM)) for lat, lon in centres[:10]]
+    return {
+        'build_s': build_s,
+        'within_ms': _per_call_ms(lambda lat, lon: index.within(lat, lon, RADIUS_KM), centres, repeat),
+        'mean_hits': float(np.mean(hits)),
+    }
+
+
+def bench_prediction(path, rng, pipeline, n_queries=N_QUERIES, max_rows=MAX_PREDICT_ROWS, repeat=REPEATS):
+    from realestate.batch_scoring import validate
+    from realestate.price_model import known_categories, predict_price_band
+
+    rows = read_parquet(os.path.join(path, 'model_rows.parquet')).head(max_rows)
+    X, errors = validate(rows, known_categories(pipeline))
+    X = X[errors == ''].reset_index(drop=True)
+    singles = [(X.iloc[[i]],) for i in rng.integers(len(X), size=n_queries)]
+    _, batch_s = _build_s(predict_price_band, pipeline, X, repeat=repeat)
+    return {
+        'valid_rows': len(X),
+        'single_ms': _per_call_ms(lambda row: predict_price_band(pipeline, row), singles, repeat),
+        'batch_rows_per_s': len(X) / batch_s,
+    }
+
+
+# --- RESULTS ---
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    results = pd.read_csv(path, dtype={'run_id': str, 'label': str})
+    # files from before the repeats have no spread: single passes, so no noise estimate either
+    return results.reindex(columns=RESULT_COLUMNS).fillna({'spread': 0.0})
+
+
+def _append(records, path):
+    if os.path.exists(path) and list(pd.read_csv(path, nrows=0).columns) != RESULT_COLUMNS:
+        load_results(path).to_csv(path, index=False)
+    frame = pd.DataFrame(records, columns=RESULT_COLUMNS)
+    frame.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def _records(run_id, label, scale, stage, metrics):
+    """Result rows of one stage: the median and the max - min of each repeated timing (counts as they are)."""
+    now = time.time()
+    return [(run_id, now, label, scale, stage, name, float(np.median(value)), float(np.ptp(value)))
+            for name, value in metrics.items()]
+
+
+def run(scales=SCALES, stages=STAGES, label='', pipeline_path=PIPELINE_FILE, seed=0, regenerate=False,
+        max_apartments=MAX_APARTMENTS, results_path=RESULTS_FILE, repeat=REPEATS):
+    """Benchmark every stage at every scale; each stage's metrics are appended to ``results_path`` as it ends."""
+    from realestate.price_model import load_pipeline
+
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    pipeline = load_pipeline(pipeline_path) if 'prediction' in stages else None
+    for scale in scales:
+        start = time.perf_counter()
+        path = dataset(scale, seed=seed, regenerate=regenerate)
+        print(f"[{scale:,}] data ready in {time.perf_counter() - start:.1f}s")
+        for stage in stages:
+            rng = np.random.default_rng(seed)
+            if stage == 'dashboard':
+                metrics = bench_dashboard(path, rng, repeat=repeat)
+            elif stage == 'recommender':
+                metrics = bench_recommender(path, rng, max_apartments=max_apartments, repeat=repeat)
+            elif stage == 'radius':
+                metrics = bench_radius(path, rng, repeat=repeat)
+            else:
+                metrics = bench_prediction(path, rng, pipeline, repeat=repeat)
+            records = _records(run_id, label, scale, stage, metrics)
+            print(f"[{scale:,}] {stage}: " + ", ".join(f"{r[5]}={r[6]:.4g}" for r in records))
+            _append(records, results_path)
+    return run_id
+
+
+def compare(results, run_id=None, baseline=None, threshold=REGRESSION, noise_floor=NOISE_FLOOR):
+    """Metrics of ``run_id`` (default: the latest run) beside ``baseline`` (default: the run before it).
+
+    ``change`` is the relative change, signed so that positive is worse.
+    ``regression`` marks timings whose change is above ``threshold`` and whose
+    absolute difference exceeds both the metric's ``noise_floor`` and the
+    larger of the two runs' spreads across repeats.
+    """
+    runs = list(dict.fromkeys(results['run_id']))
+    run_id = run_id or runs[-1]
+    if baseline is None:
+        earlier = runs[:runs.index(run_id)]
+        if not earlier:
+            raise ValueError(f"no run before {run_id} to compare against")
+        baseline = earlier[-1]
+    key = ['scale', 'stage', 'metric']
+    current = results[results['run_id'] == run_id].groupby(key)[['value', 'spread']].last()
+    previous = results[results['run_id'] == baseline].groupby(key)[['value', 'spread']].last()
+    table = pd.DataFrame({'baseline': previous['value'], 'current': current['value'],
+                          'spread': np.maximum(previous['spread'], current['spread'])}).dropna().reset_index()
+    sign = np.where(table['metric'].isin(HIGHER_IS_BETTER), -1.0, 1.0)
+    difference = table['current'] - table['baseline']
+    table['change'] = sign * difference / table['baseline'].abs()
+    # counts (rows, apartments, hits) describe the data, not the speed
+    floor = pd.Series(np.nan, index=table.index)
+    for suffix, value in noise_floor.items():
+        floor[table['metric'].str.endswith(suffix) & floor.isna()] = value
+    timed = floor.notna()
+    table['regression'] = (timed & (table['change'] > threshold) & (difference.abs() > floor)
+                           & (difference.abs() > table['spread']))
+    return table, run_id, baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard, recommender, radius search and "
+                                                 "prediction on synthetic data at several scales.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--label', default='', help="free text stored with the run, e.g. a commit")
+    parser.add_argument('--pipeline', default=PIPELINE_FILE, help="pipeline.pkl or a compact_model directory")
+    parser.add_argument('--max-apartments', type=int, default=MAX_APARTMENTS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEATS, help="passes per timing; the median is stored")
+    parser.add_argument('--regenerate', action='store_true', help="rebuild the synthetic datasets")
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--compare', action='store_true', help="compare the new run with --baseline")
+    parser.add_argument('--compare-only', action='store_true', help="compare the latest stored run, run nothing")
+    parser.add_argument('--baseline', default=None, help="run_id to compare against (default: the previous run)")
+    parser.add_argument('--threshold', type=float, default=REGRESSION, help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    run_id = None
+    if not args.compare_only:
+        run_id = run(args.scales, args.stages, args.label, args.pipeline, args.seed, args.regenerate,
+                     args.max_apartments, args.results, max(args.repeat, 1))
+        print(f"run {run_id} appended to {args.results}")
+    if args.compare or args.compare_only:
+        table, run_id, baseline = compare(load_results(args.results), run_id, args.baseline, args.threshold)
+        print(f"\n{run_id} vs {baseline}:")
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        regressions = table[table['regression']]
+        if len(regressions):
+            print(f"\n{len(regressions)} regressions over {args.threshold:.0%}:")
+            print(regressions[['scale', 'stage', 'metric', 'change']].to_string(index=False))
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""On-demand, memoized sections for the Analysis dashboard.
+
+Streamlit runs the body of every tab and expander on each rerun, so a chart
+is only skipped if it is never reached.  Each chart is therefore a section
+with a heading and a toggle; :meth:`Sections.open` draws both and says
+whether to compute the body at all.  Inside an open section,
+:meth:`Sections.memo` looks the section's result up in :data:`cache` by
+``(section, filter key, extra)`` and only calls ``compute`` on a miss, so
+moving the price slider recomputes the open sections only.  Heavy plotting
+libraries are imported inside the ``compute`` callables, never at page
+import.
+
+Every section's wall time (compute plus drawing) and whether it came from the
+cache are recorded for the rerun; :meth:`Sections.finish` shows them in the
+sidebar::
+
+    sections = Sections(filter_key)
+    if sections.open('pie', "🥧 Bedroom Distribution", about="..."):
+        fig = sections.memo(lambda: build_pie(frame()))
+        st.plotly_chart(fig)
+    sections.finish()
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from realestate import instrumentation
+from realestate.artifacts import nbytes
+
+
+class SectionCache:
+    """LRU of section results keyed on ``(section, filter key, extra)``.
+
+    Bounded by size, not entry count: a box plot over every row and a pie
+    chart are far apart, so least recently used results are evicted while
+    their :func:`~realestate.artifacts.nbytes` total exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """``(result, hit)`` for ``key``; ``compute()`` runs outside the lock on a miss."""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key][0], True
+        result = compute()
+        size = nbytes(result)
+        with self._lock:
+            self.misses += 1
+            if key not in self._results:
+                self._results[key] = (result, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes and len(self._results) > 1:
+                _, (_, evicted) = self._results.popitem(last=False)
+                self.bytes -= evicted
+        return result, False
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._results), 'bytes': self.bytes,
+                'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.bytes = self.hits = self.misses = 0
+
+
+cache = SectionCache()
+instrumentation.register_cache('sections', cache)
+
+
+def figure_png(fig, dpi=100):
+    """PNG bytes of a matplotlib figure, which is closed afterwards (cached bytes, not live figures)."""
+    from matplotlib import pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+class Sections:
+    """The sections of one rerun: toggles, memoized results and per-section timings."""
+
+    def __init__(self, filter_key, cache=cache):
+        self.filter_key = filter_key
+        self.cache = cache
+        self.timings = []
+        self._current = None
+        self._started = None
+
+    def open(self, name, title, about=None, about_label="ℹ️ About this section", default=False):
+        """Draw the heading, the optional "about" expander and the toggle; ``True`` if the section is on."""
+        self._close()
+        st.subheader(title)
+        if about:
+            with st.expander(about_label):
+                st.markdown(about)
+        if not st.toggle("Show", value=default, key=f"section_{name}"):
+            self.timings.append({'section': name, 'shown': False, 'cached': None, 'compute_ms': 0.0,
+                                 'total_ms': 0.0})
+            return False
+        self._current = {'section': name, 'shown': True, 'cached': None, 'compute_ms': 0.0}
+        self._started = time.perf_counter()
+        return True
+
+    def memo(self, compute, *extra):
+        """The open section's result for this filter key (and ``extra``), computed only on a cache miss."""
+        key = (self._current['section'], self.filter_key, extra)
+        start = time.perf_counter()
+        with instrumentation.timer(f"section.{key[0]}"):
+            result, hit = self.cache.get_or_compute(key, compute)
+        instrumentation.count('section_cache.hit' if hit else 'section_cache.miss')
+        self._current['cached'] = hit if self._current['cached'] is None else self._current['cached'] and hit
+        self._current['compute_ms'] += (time.perf_counter() - start) * 1e3
+        return result
+
+    def _close(self):
+        if self._current is not None:
+            self._current['total_ms'] = (time.perf_counter() - self._started) * 1e3
+            self.timings.append(self._current)
+            self._current = None
+
+    def report(self):
+        """Per-section timings of this rerun so far."""
+        self._close()
+        return pd.DataFrame(self.timings, columns=['section', 'shown', 'cached', 'compute_ms', 'total_ms'])
+
+    def finish(self):
+        """Close the last section and show this rerun's timings and the cache counters in the sidebar."""
+        report = self.report()
+        with st.sidebar.expander("⏱️ Section timings"):
+            st.caption(f"open sections took {report['total_ms'].sum():.0f} ms this rerun")
+            st.dataframe(report.round(1), hide_index=True, use_container_width=True)
+            info = self.cache.info()
+            st.caption(f"cache: {info['hits']} hits, {info['misses']} misses, {info['entries']} entries, "
+                       f"{info['bytes'] / 2 ** 20:.1f}/{info['max_bytes'] / 2 ** 20:.0f} MB")
+        return report
@@ -0,0 +1,331 @@
+"""Serve the large artifacts from shared memory to every Streamlit worker.
+
+Each server process normally loads its own copy of the model, the frames and
+the recommender index, so memory grows with the number of workers.  Instead,
+one loader process publishes them as plain ``.npy`` files under
+:data:`SHARED_ROOT` (``/dev/shm`` when there is one, i.e. POSIX shared
+memory) and every worker memory-maps them read-only: all workers read the
+same physical pages and attaching copies nothing.
+
+A publish writes a complete *generation* directory next to the live one::
+
+    /dev/shm/realestate/
+        CURRENT               -> "g000007"
+        g000006/ g000007/     one directory per generation
+            manifest.json     sources, their digests and sizes
+            pipeline/         compact_model export of pipeline.pkl
+            surrogate/        the distilled model, if exported
+            predictor_frame/  df.pkl, one .npy per column
+            viz_frame/        data_viz1.csv (via the Parquet store), likewise
+            viz_cube/         the dashboard's FilterCube and FilterIndex arrays,
+            viz_index/        built once here instead of in every worker
+            recommender/      the NeighbourIndex arrays
+
+and only then replaces ``CURRENT`` with :func:`os.replace`, so a reader
+sees either the old generation or the new one, never a half-written one.
+Pages load through the registry with ``CURRENT`` as the file, e.g.
+``artifacts.get(shared_artifacts.current_file(), shared_artifacts.viz_frame)``;
+its content changes on every publish, so each worker re-attaches on its next
+rerun and drops the old mapping.  The last ``keep`` generations stay on disk
+for readers that are mid-attach.
+Deleting an older generation is safe even while a worker still maps it: the
+pages stay valid until the worker unmaps them.
+
+String columns come back as categoricals (codes in shared memory, the labels
+in the manifest), as the Parquet store already returns them.  The pickled
+sklearn forest cannot be mapped, so the pipeline is shared as its
+:mod:`realestate.compact_model` export.  After rebuilding any artifact, run
+``publish`` again::
+
+    python -m realestate.shared_artifacts publish
+    python -m realestate.shared_artifacts status
+    REALESTATE_SHARED_DIR=/srv/shared streamlit run Home.py
+"""
+import argparse
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate import datastore
+from realestate.artifacts import file_digest
+from realestate.compact_model import COMPACT_DIR, MANIFEST, CompactModel, export
+from realestate.price_model import PIPELINE_FILE
+from realestate.recommender import INDEX_FILE, NeighbourIndex
+from realestate.surrogate import SURROGATE_DIR
+
+SHARED_ROOT = os.environ.get('REALESTATE_SHARED_DIR',
+                             '/dev/shm/realestate' if os.path.isdir('/dev/shm') else 'shared')
+CURRENT = 'CURRENT'
+LOCK = '.lock'
+KEEP = 2
+PREDICTOR_DATA = 'df.pkl'
+VIZ_DATA = 'data_viz1.csv'
+_GENERATION = re.compile(r'g\d{6}$')
+
+
+# --- ARRAYS AND FRAMES ---
+
+def write_arrays(directory, arrays, **meta):
+    """One ``.npy`` per array plus ``manifest.json`` holding ``meta`` and the array names."""
+    os.makedirs(directory)
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(directory, MANIFEST), 'w') as file:
+        json.dump({**meta, 'arrays': list(arrays)}, file, indent=1)
+
+
+def read_arrays(directory):
+    """``(meta, arrays)`` of :func:`write_arrays`, the arrays memory-mapped read-only."""
+    with open(os.path.join(directory, MANIFEST)) as file:
+        meta = json.load(file)
+    return meta, {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in meta['arrays']}
+
+
+def write_frame(directory, df):
+    """Pack a frame column by column: numbers as they are, strings and categoricals as codes."""
+    arrays, columns = {}, []
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, categories, ordered = values.cat.codes.to_numpy(), values.cat.categories, values.cat.ordered
+        elif values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            codes, categories = pd.factorize(values)
+            codes, ordered = codes.astype(np.int32), False
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biuf':
+            arrays[f"c{i}"] = values.to_numpy()
+            columns.append({'name': column, 'kind': 'numeric'})
+            continue
+        else:
+            raise TypeError(f"cannot share column {column!r} of dtype {values.dtype}")
+        arrays[f"c{i}"] = codes
+        columns.append({'name': column, 'kind': 'categorical', 'categories': categories.tolist(),
+                        'ordered': bool(ordered)})
+    if isinstance(df.index, pd.RangeIndex):
+        index = {'start': df.index.start, 'stop': df.index.stop, 'step': df.index.step}
+    else:
+        arrays['index'], index = df.index.to_numpy(), None
+    write_arrays(directory, arrays, columns=columns, index=index)
+
+
+def read_frame(directory):
+    """The frame of :func:`write_frame` over the mapped arrays (no column is copied)."""
+    meta, arrays = read_arrays(directory)
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        values = arrays[f"c{i}"]
+        if column['kind'] == 'categorical':
+            values = pd.Categorical.from_codes(values, categories=column['categories'], ordered=column['ordered'])
+        data[column['name']] = values
+    index = pd.RangeIndex(**meta['index']) if meta['index'] is not None else pd.Index(arrays['index'])
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+# --- PUBLISHING ---
+
+def _generations(root):
+    return sorted(name for name in os.listdir(root) if _GENERATION.match(name)) if os.path.isdir(root) else []
+
+
+def _sources(pipeline_path, compact_path, surrogate_path, predictor_path, viz_path, index_path):
+    """``{bundle: (source file, writer(directory))}`` for the sources that exist."""
+    def copy_compact(path):
+        return lambda directory: shutil.copytree(path, directory)
+
+    sources = {}
+    if os.path.exists(pipeline_path):
+        digest = file_digest(pipeline_path)
+        manifest = os.path.join(compact_path, MANIFEST)
+        # reuse the compact export if it is of this pickle, else export afresh into the generation
+        if os.path.exists(manifest) and CompactModel.load(compact_path).source_digest == digest:
+            sources['pipeline'] = (pipeline_path, copy_compact(compact_path))
+        else:
+            sources['pipeline'] = (pipeline_path, lambda directory: export(pipeline_path, directory))
+    if os.path.exists(os.path.join(surrogate_path, MANIFEST)):
+        sources['surrogate'] = (os.path.join(surrogate_path, MANIFEST), copy_compact(surrogate_path))
+    if os.path.exists(predictor_path):
+        sources['predictor_frame'] = (predictor_path,
+                                      lambda directory: write_frame(directory, pd.read_pickle(predictor_path)))
+    if os.path.exists(viz_path):
+        from realestate.cube import FilterCube
+        from realestate.filters import FilterIndex
+
+        parquet = datastore.ensure(viz_path)
+        sources['viz_frame'] = (parquet, lambda directory: write_frame(directory, datastore.read_parquet(parquet)))
+        sources['viz_cube'] = (parquet, lambda directory: write_arrays(
+            directory, FilterCube.from_parquet(parquet).to_arrays()))
+        sources['viz_index'] = (parquet, lambda directory: write_arrays(
+            directory, FilterIndex.from_parquet(parquet).to_arrays()))
+    if os.path.exists(index_path):
+        def write_index(directory):
+            index = NeighbourIndex.load(index_path)
+            write_arrays(directory, {'names': index.names.astype(str), 'ids': index.ids, 'scores': index.scores,
+                                     'components': index.components, 'weights': index.weights})
+        sources['recommender'] = (index_path, write_index)
+    return sources
+
+
+def _size(path):
+    return sum(os.path.getsize(os.path.join(base, name)) for base, _, names in os.walk(path) for name in names)
+
+
+def publish(root=SHARED_ROOT, keep=KEEP, pipeline_path=PIPELINE_FILE, compact_path=COMPACT_DIR,
+            surrogate_path=SURROGATE_DIR, predictor_path=PREDICTOR_DATA, viz_path=VIZ_DATA, index_path=INDEX_FILE):
+    """Write every available artifact as a new generation and make it current; returns its name."""
+    sources = _sources(pipeline_path, compact_path, surrogate_path, predictor_path, viz_path, index_path)
+    if not sources:
+        raise FileNotFoundError("no artifacts to publish")
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    bundles = {}
+    for bundle, (source, write) in sources.items():
+        start = time.perf_counter()
+        write(os.path.join(tmp, bundle))
+        bundles[bundle] = {'source': os.path.abspath(source), 'source_digest': file_digest(source),
+                           'bytes': _size(os.path.join(tmp, bundle)), 'seconds': time.perf_counter() - start}
+
+    # one publisher at a time picks the next generation number and swaps CURRENT
+    with open(os.path.join(root, LOCK), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        existing = _generations(root)
+        generation = f"g{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+        with open(os.path.join(tmp, MANIFEST), 'w') as file:
+            json.dump({'generation': generation, 'published_at': time.time(), 'bundles': bundles}, file, indent=1)
+        os.replace(tmp, os.path.join(root, generation))
+        pointer = os.path.join(root, f"{CURRENT}.{os.getpid()}.tmp")
+        with open(pointer, 'w') as file:
+            file.write(generation)
+        os.replace(pointer, os.path.join(root, CURRENT))
+        for old in _generations(root)[:-keep]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return generation
+
+
+# --- ATTACHING ---
+
+def current_file(root=SHARED_ROOT):
+    """The ``CURRENT`` pointer: the file the pages hand to ``artifacts.get`` in shared mode."""
+    return os.path.join(root, CURRENT)
+
+
+def current_generation(root=SHARED_ROOT):
+    """Name of the live generation, or ``None`` if nothing has been published."""
+    try:
+        with open(current_file(root)) as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def available(bundle, root=SHARED_ROOT):
+    """``True`` if the live generation has ``bundle``: the pages' switch into shared mode."""
+    generation = current_generation(root)
+    return generation is not None and os.path.isdir(os.path.join(root, generation, bundle))
+
+
+def manifest(root=SHARED_ROOT):
+    generation = current_generation(root)
+    if generation is None:
+        return None
+    with open(os.path.join(root, generation, MANIFEST)) as file:
+        return json.load(file)
+
+
+def attach(current_path, bundle, read):
+    """``read(directory)`` of ``bundle`` in the generation ``current_path`` names.
+
+    A publish may remove that generation between reading the pointer and
+    mapping the files; the pointer is then re-read once.
+    """
+    root = os.path.dirname(os.path.abspath(current_path))
+    for attempt in range(2):
+        generation = current_generation(root)
+        try:
+            return read(os.path.join(root, generation, bundle))
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+
+# loaders for ``artifacts.get(current_file(), loader)``
+
+def pipeline_model(current_path):
+    return attach(current_path, 'pipeline', CompactModel.load)
+
+
+def surrogate_model(current_path):
+    return attach(current_path, 'surrogate', CompactModel.load)
+
+
+def predictor_frame(current_path):
+    return attach(current_path, 'predictor_frame', read_frame)
+
+
+def viz_frame(current_path):
+    return attach(current_path, 'viz_frame', read_frame)
+
+
+def _read_cube(directory):
+    from realestate.cube import FilterCube
+
+    return FilterCube.from_arrays(read_arrays(directory)[1])
+
+
+def _read_filter_index(directory):
+    from realestate.filters import FilterIndex
+
+    return FilterIndex.from_arrays(read_arrays(directory)[1])
+
+
+def viz_cube(current_path):
+    return attach(current_path, 'viz_cube', _read_cube)
+
+
+def viz_index(current_path):
+    return attach(current_path, 'viz_index', _read_filter_index)
+
+
+def _read_index(directory):
+    _, arrays = read_arrays(directory)
+    return NeighbourIndex(arrays['names'].astype(object), arrays['ids'], arrays['scores'], arrays['components'],
+                          arrays['weights'])
+
+
+def neighbour_index(current_path):
+    return attach(current_path, 'recommender', _read_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the artifacts to shared memory for all workers.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    publish_cmd = sub.add_parser('publish', help="write a new generation and make it current")
+    status = sub.add_parser('status', help="show the live generation")
+    for command in (publish_cmd, status):
+        command.add_argument('--root', default=SHARED_ROOT)
+    publish_cmd.add_argument('--keep', type=int, default=KEEP, help="generations kept on disk, the live one included")
+    publish_cmd.add_argument('--pipeline', default=PIPELINE_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        start = time.perf_counter()
+        generation = publish(args.root, max(args.keep, 1), args.pipeline)
+        print(f"published {generation} to {args.root} in {time.perf_counter() - start:.1f}s")
+    info = manifest(args.root)
+    if info is None:
+        print(f"nothing published in {args.root}")
+        return
+    print(f"live generation {info['generation']}, published "
+          f"{pd.Timestamp(info['published_at'], unit='s'):%Y-%m-%d %H:%M:%S}; on disk: {_generations(args.root)}")
+    for bundle, entry in info['bundles'].items():
+        print(f"  {bundle:16s} {entry['bytes'] / 2 ** 20:8.1f} MB  {entry['source_digest'][:12]}  {entry['source']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Factorized similarity engine for the apartment recommender.
+
+Instead of pickling three dense N x N cosine matrices, the engine keeps the three
+normalized feature matrices the notebook derives from ``appartments.csv``:
+
+* TF-IDF of ``TopFacilities`` (sparse, rows already L2 normalized),
+* standard-scaled one-hot ``PriceDetails`` features,
+* standard-scaled ``LocationAdvantages`` distances (missing = 54000 m).
+
+A standard-scaled matrix whose unset entries all share one fill value is a
+sparse matrix plus a constant row, ``X = S / sigma + offset``.  Each block is
+stored in that form, so a similarity row costs one sparse matrix-vector
+product and the dense, mostly-constant location frame is never built.
+The blocks are built from the sparse matrices :mod:`realestate.ingest` emits.
+"""
+import argparse
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from realestate.recommender import DEFAULT_WEIGHTS
+
+ENGINE_FILE = 'similarity_engine.npz'
+COMPONENTS = ('facilities', 'price', 'location')
+
+PRICE_CONFIGS = ['1 BHK', '2 BHK', '3 BHK', '4 BHK', '5 BHK', '6 BHK', '1 RK', 'Land']
+PRICE_FIELDS = ['area low', 'area high', 'price low', 'price high']
+MISSING_DISTANCE = 54000
+
+
+# --- PARSING (same rules as Recommender_system.ipynb) ---
+
+def extract_list(s):
+    return re.findall(r"'(.*?)'", s)
+
+
+def distance_to_meters(distance_str):
+    try:
+        if 'Km' in distance_str or 'KM' in distance_str:
+            return float(distance_str.split()[0]) * 1000
+        elif 'Meter' in distance_str or 'meter' in distance_str:
+            return float(distance_str.split()[0])
+        else:
+            return None
+    except (ValueError, IndexError, TypeError):
+        return None
+
+
+def _parse_area(area):
+    parts = area.split('-')
+    if len(parts) not in (1, 2):
+        return None, None
+    try:
+        values = [float(p.replace(',', '').replace(' sq.ft.', '').strip()) for p in parts]
+    except ValueError:
+        return None, None
+    return values[0], values[-1]
+
+
+def _parse_price(price_range):
+    parts = price_range.split('-')
+    if len(parts) != 2:
+        return None, None
+    try:
+        values = [float(p.replace('₹', '').replace(' Cr', '').replace(' L', '').strip()) for p in parts]
+    except ValueError:
+        return None, None
+    return tuple(v / 100 if 'L' in p else v for v, p in zip(values, parts))
+
+
+def parse_location_advantages(advantages_str):
+    """Return ``{landmark: meters}`` for every parseable distance."""
+    distances = {}
+    for location, distance in ast.literal_eval(advantages_str).items():
+        meters = distance_to_meters(distance)
+        if meters is not None:
+            distances[location] = meters
+    return distances
+
+
+def load_apartments(path='appartments.csv'):
+    df = pd.read_csv(path)
+    # the scraped file repeats its header row once
+    return df[df['PropertyName'] != 'PropertyName'].reset_index(drop=True)
+
+
+# --- FEATURE BLOCKS ---
+
+def scaler_stats(deviations):
+    """Column mean and ``StandardScaler`` scale of sparse ``deviations`` (zero scale -> 1)."""
+    n = deviations.shape[0]
+    mean = np.asarray(deviations.sum(axis=0)).ravel() / n
+    mean_sq = np.asarray(deviations.multiply(deviations).sum(axis=0)).ravel() / n
+    scale = np.sqrt(np.maximum(mean_sq - mean ** 2, 0))
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+    return mean, scale
+
+
+class FeatureBlock:
+    """Row feature matrix stored as ``matrix + offset`` (offset broadcast over rows)."""
+
+    def __init__(self, matrix, offset=None):
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float64) if sparse.issparse(matrix) \
+            else np.asarray(matrix, dtype=np.float64)
+        n_features = self.matrix.shape[1]
+        self.offset = np.zeros(n_features) if offset is None else np.asarray(offset, dtype=np.float64)
+
+        self._offset_dot = np.asarray(self.matrix @ self.offset).ravel()
+        self._offset_sq = float(self.offset @ self.offset)
+        if sparse.issparse(self.matrix):
+            row_sq = np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel()
+        else:
+            row_sq = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        norms = np.sqrt(np.maximum(row_sq + 2 * self._offset_dot + self._offset_sq, 0))
+        # zero rows get similarity 0, as in sklearn's cosine_similarity
+        self._inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def similarity(self, rows):
+        """Cosine similarity of ``rows`` against every row, shape ``(len(rows), N)``."""
+        rows = np.atleast_1d(rows)
+        dots = self.matrix[rows] @ self.matrix.T
+        dots = dots.toarray() if sparse.issparse(dots) else np.asarray(dots)
+        dots += self._offset_dot[rows, None] + self._offset_dot[None, :] + self._offset_sq
+        dots *= self._inv_norms[rows, None]
+        dots *= self._inv_norms[None, :]
+        return dots
+
+    @classmethod
+    def standard_scaled(cls, deviations, fill=0.0, stats=None):
+        """Block equal to ``StandardScaler().fit_transform(fill + deviations)``.
+
+        ``deviations`` is sparse and holds ``value - fill`` for the set entries.
+        Pass ``stats=(mean, scale)`` of the deviations to apply a frozen scaler.
+        """
+        deviations = sparse.csr_matrix(deviations, dtype=np.float64)
+        mean, scale = scaler_stats(deviations) if stats is None else stats
+        matrix = deviations @ sparse.diags(1.0 / scale)
+        return cls(matrix, -mean / scale)
+
+    def to_arrays(self, prefix):
+        arrays = {f'{prefix}_offset': self.offset}
+        if sparse.issparse(self.matrix):
+            arrays.update({f'{prefix}_data': self.matrix.data, f'{prefix}_indices': self.matrix.indices,
+                           f'{prefix}_indptr': self.matrix.indptr,
+                           f'{prefix}_shape': np.array(self.matrix.shape)})
+        else:
+            arrays[f'{prefix}_dense'] = self.matrix
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        if f'{prefix}_dense' in arrays:
+            matrix = arrays[f'{prefix}_dense']
+        else:
+            matrix = sparse.csr_matrix((arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'],
+                                        arrays[f'{prefix}_indptr']), shape=tuple(arrays[f'{prefix}_shape']))
+        return cls(matrix, arrays[f'{prefix}_offset'])
+
+
+def facilities_block(facilities):
+    """TF-IDF block from per-property facility text (the list items joined by spaces)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    return FeatureBlock(vectorizer.fit_transform(facilities))
+
+
+def building_type_columns(building_types):
+    """``get_dummies(drop_first=True)`` columns: ``(config, type)`` for all but the first type per config."""
+    return [(config, building_type) for j, config in enumerate(PRICE_CONFIGS)
+            for building_type in sorted(set(building_types[:, j].tolist()) - {None})[1:]]
+
+
+def price_deviations(price_values, building_types, type_columns):
+    """Sparse price features (fill 0): ingested bounds followed by the one-hot ``type_columns``."""
+    blocks = [sparse.csr_matrix(price_values, dtype=np.float64)]
+    for config, building_type in type_columns:
+        hot = building_types[:, PRICE_CONFIGS.index(config)] == building_type
+        blocks.append(sparse.csr_matrix(hot.astype(np.float64)[:, None]))
+    return sparse.hstack(blocks, format='csr')
+
+
+def price_block(price_values, building_types):
+    """Scaled block from ingested price bounds and building types (one-hot, fill 0).
+
+    ``price_values`` is sparse ``N x PRICE_CONFIGS*PRICE_FIELDS`` and
+    ``building_types`` an ``N x PRICE_CONFIGS`` array of labels (None = absent).
+    """
+    type_columns = building_type_columns(building_types)
+    columns = [f'{field} {config}' for config in PRICE_CONFIGS for field in PRICE_FIELDS]
+    columns += [f'building type_{config}_{building_type}' for config, building_type in type_columns]
+    return FeatureBlock.standard_scaled(price_deviations(price_values, building_types, type_columns)), columns
+
+
+def location_deviations(distances, fill=MISSING_DISTANCE):
+    """``meters - fill`` for every stored entry of sparse ``N x landmarks`` distances."""
+    deviations = sparse.csr_matrix(distances, dtype=np.float64, copy=True)
+    deviations.data -= fill
+    return deviations
+
+
+def location_block(distances, fill=MISSING_DISTANCE):
+    """Scaled block from sparse ``N x landmarks`` meters (every stored entry is a stated distance)."""
+    return FeatureBlock.standard_scaled(location_deviations(distances, fill), fill)
+
+
+# --- ENGINE ---
+
+class SimilarityEngine:
+    """Blended cosine similarity computed on demand from the feature blocks."""
+
+    def __init__(self, names, blocks, weights=DEFAULT_WEIGHTS):
+        self.names = np.asarray(names, dtype=object)
+        self.blocks = list(blocks)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def positions(self, names):
+        return np.array([self._positions[name] for name in np.atleast_1d(names)], dtype=np.int64)
+
+    def component_rows(self, rows):
+        """Per-component similarity rows; plugs straight into ``recommender.build_index``."""
+        return [block.similarity(rows) for block in self.blocks]
+
+    def similarity_rows(self, rows, weights=None):
+        """Blended similarity of the given row positions against all properties."""
+        weights = self.weights if weights is None else np.asarray(weights, dtype=np.float64)
+        blend = None
+        for w, block in zip(weights, self.blocks):
+            if w == 0:
+                continue
+            part = block.similarity(rows)
+            if blend is None:
+                blend = part * w
+            else:
+                blend += part * w
+        return blend if blend is not None else np.zeros((len(np.atleast_1d(rows)), len(self)))
+
+    def similarity(self, name, weights=None):
+        """Blended similarity row for one property."""
+        return self.similarity_rows(self.positions(name), weights)[0]
+
+    def query_many(self, names, top_n=5, min_score=0.0, weights=None, batch_size=256):
+        """Top-n neighbours for many properties, computed in batches."""
+        rows = self.positions(names)
+        results = []
+        k = max(1, min(int(top_n), len(self) - 1))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            blend = self.similarity_rows(batch, weights)
+            blend[np.arange(len(batch)), batch] = -np.inf
+            top = np.argpartition(-blend, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(blend, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for ids, scores in zip(top, top_scores):
+                keep = scores >= min_score
+                results.append((self.names[ids[keep]], scores[keep]))
+        return results
+
+    def query(self, name, top_n=5, min_score=0.0, weights=None):
+        return self.query_many([name], top_n, min_score, weights)[0]
+
+    def save(self, path=ENGINE_FILE):
+        arrays = {'names': self.names.astype(str), 'weights': self.weights}
+        for component, block in zip(COMPONENTS, self.blocks):
+            arrays.update(block.to_arrays(component))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path=ENGINE_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = dict(data)
+        blocks = [FeatureBlock.from_arrays(arrays, component) for component in COMPONENTS]
+        return cls(arrays['names'].astype(object), blocks, arrays['weights'])
+
+    @classmethod
+    def from_apartments(cls, path='appartments.csv', weights=DEFAULT_WEIGHTS, workers=1):
+        from realestate.ingest import ingest
+
+        data = ingest(path, workers=workers)
+        blocks = [facilities_block(data.facilities), price_block(data.price_values, data.building_types)[0],
+                  location_block(data.distances)]
+        return cls(data.names, blocks, weights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the factorized similarity engine from appartments.csv.")
+    parser.add_argument('--input', default='appartments.csv')
+    parser.add_argument('--output', default=ENGINE_FILE)
+    parser.add_argument('--workers', type=int, default=1, help="parsing processes (1 = in-process)")
+    args = parser.parse_args()
+
+    engine = SimilarityEngine.from_apartments(args.input, workers=args.workers)
+    engine.save(args.output)
+    shapes = ', '.join(f"{c} {b.shape[1]}" for c, b in zip(COMPONENTS, engine.blocks))
+    print(f"saved {len(engine)} properties ({shapes} features) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
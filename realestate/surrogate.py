@@ -0,0 +1,223 @@
+"""Distil the price forest into a small boosted-tree surrogate.
+
+The surrogate is a small ``HistGradientBoostingRegressor`` on the forest's
+own ``ColumnTransformer`` features, trained to reproduce the forest's
+``log1p(price)`` outputs (not the listed prices) on
+
+* the rows of ``gurgaon_properties_post_feature_selection_v2.csv``, and
+* synthetic rows over the predictor's input domain: real rows with a share of
+  their columns redrawn from each column's observed values and the built-up
+  area jittered log-normally inside ``AREA_RANGE``, so unusual combinations
+  the page allows are covered too.
+
+A fifth of the real and of the synthetic rows is held out to report fidelity
+(difference from the forest in crore and percent) and, on the real rows,
+accuracy against the listed prices for both models.  The surrogate is saved
+as a pickle and as a :mod:`realestate.compact_model` export, and the report
+lists load time, single-row latency and size of forest and surrogate.  The
+predictor page offers it as its "fast" mode::
+
+    python -m realestate.surrogate --synthetic 50000
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.artifacts import file_digest
+from realestate.compact_model import COMPACT_DIR, CompactModel, export_pipeline
+from realestate.model_benchmark import DATA_FILE, load_data
+from realestate.price_model import AREA_RANGE, FEATURE_COLUMNS, PIPELINE_FILE, known_categories, load_pipeline
+
+SURROGATE_FILE = 'surrogate.pkl'
+SURROGATE_DIR = 'surrogate_compact'
+REPORT_FILE = 'surrogate_report.json'
+N_SYNTHETIC = 50000
+REDRAW_FRACTION = 0.3
+AREA_JITTER = 0.3  # sd of the log-normal built-up area factor
+SURROGATE_PARAMS = {'max_iter': 300, 'learning_rate': 0.1, 'max_depth': 8, 'max_leaf_nodes': 63,
+                    'early_stopping': False, 'random_state': 0}
+
+
+# --- TRAINING DATA ---
+
+def synthetic_rows(X, n, categories, seed=0):
+    """``n`` rows around the real ones, restricted to categories the encoders know."""
+    rng = np.random.default_rng(seed)
+    base = X.iloc[rng.integers(len(X), size=n)].reset_index(drop=True)
+    for column in FEATURE_COLUMNS:
+        observed = X[column].dropna().to_numpy()
+        if column in categories:
+            observed = observed[np.isin(observed.astype(object), categories[column])]
+        redraw = rng.random(n) < REDRAW_FRACTION
+        base.loc[redraw, column] = observed[rng.integers(len(observed), size=int(redraw.sum()))]
+    area = base['built_up_area'].to_numpy(dtype=np.float64) * np.exp(rng.normal(0, AREA_JITTER, n))
+    base['built_up_area'] = np.clip(area, *AREA_RANGE)
+    return base
+
+
+def _known(X, categories):
+    mask = np.ones(len(X), dtype=bool)
+    for column, values in categories.items():
+        mask &= X[column].isin(values).to_numpy()
+    return mask
+
+
+# --- DISTILLATION ---
+
+def _fidelity(teacher, student, prefix):
+    teacher_price, student_price = np.expm1(teacher), np.expm1(student)
+    relative = np.abs(student_price - teacher_price) / teacher_price * 100
+    return {f'{prefix}_rows': len(teacher),
+            f'{prefix}_mae_cr': float(np.mean(np.abs(student_price - teacher_price))),
+            f'{prefix}_median_pct': float(np.median(relative)),
+            f'{prefix}_p95_pct': float(np.percentile(relative, 95)),
+            f'{prefix}_r2_log': float(1 - np.sum((student - teacher) ** 2)
+                                      / np.sum((teacher - teacher.mean()) ** 2))}
+
+
+def distill(pipeline_path=PIPELINE_FILE, data=DATA_FILE, n_synthetic=N_SYNTHETIC, params=None, seed=0):
+    """Fit the surrogate pipeline; returns ``(surrogate, report)``."""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.pipeline import Pipeline
+
+    pipeline = load_pipeline(pipeline_path)
+    preprocessor, forest = pipeline.named_steps['preprocessor'], pipeline.steps[-1][1]
+    categories = known_categories(pipeline)
+    X_real, y_real = load_data(data)
+    known = _known(X_real, categories)
+    X_real, y_real = X_real.loc[known, FEATURE_COLUMNS].reset_index(drop=True), y_real[known]
+    X_synthetic = synthetic_rows(X_real, n_synthetic, categories, seed)
+
+    start = time.perf_counter()
+    features = [preprocessor.transform(X) for X in (X_real, X_synthetic)]
+    teacher = [forest.predict(f) for f in features]
+    teacher_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    held_out = [rng.random(len(f)) < 0.2 for f in features]
+    train_X = np.vstack([f[~h] for f, h in zip(features, held_out)])
+    train_y = np.concatenate([t[~h] for t, h in zip(teacher, held_out)])
+    student = HistGradientBoostingRegressor(**{**SURROGATE_PARAMS, **(params or {})})
+    start = time.perf_counter()
+    student.fit(train_X, train_y)
+    fit_seconds = time.perf_counter() - start
+
+    report = {'train_rows': len(train_y), 'teacher_seconds': teacher_seconds, 'fit_seconds': fit_seconds,
+              'n_trees': int(student.n_iter_), 'source_digest': file_digest(pipeline_path)}
+    for name, f, t, h in zip(('real', 'synthetic'), features, teacher, held_out):
+        report.update(_fidelity(t[h], student.predict(f[h]), name))
+    real_test = held_out[0]
+    truth = np.expm1(y_real[real_test])
+    report['forest_mae_cr'] = float(np.mean(np.abs(np.expm1(teacher[0][real_test]) - truth)))
+    surrogate_price = np.expm1(student.predict(features[0][real_test]))
+    report['surrogate_mae_cr'] = float(np.mean(np.abs(surrogate_price - truth)))
+    return Pipeline([('preprocessor', preprocessor), ('regressor', student)]), report
+
+
+# --- COST ---
+
+def _single_row_ms(model, row, repeat=50):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(row)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def costs(paths, row):
+    """Load time, single-row latency and size for each ``{name: artifact path}``."""
+    rows = []
+    for name, path in paths.items():
+        if not os.path.exists(path):
+            continue
+        start = time.perf_counter()
+        model = load_pipeline(path)
+        load_seconds = time.perf_counter() - start
+        rows.append({'artifact': name, 'path': path, 'bytes': _size(path), 'load_s': load_seconds,
+                     'row_ms': _single_row_ms(model, row)})
+    return rows
+
+
+# --- REPORT ---
+
+def load_report(path=REPORT_FILE):
+    with open(path) as file:
+        return json.load(file)
+
+
+def fast_mode_help(report=None):
+    """Help text for the predictor page's fast mode, quoting ``report``'s measurements when given.
+
+    Latencies are those of the compact exports, which is what the page serves.
+    """
+    if not report:
+        return ("Fast uses a small distilled model: quicker than the exact forest, and approximate; "
+                "run `python -m realestate.surrogate` to measure how close")
+    row_ms = {cost['artifact']: cost['row_ms'] for cost in report.get('costs', [])}
+    speed = ''
+    if 'surrogate (compact)' in row_ms and 'forest (compact)' in row_ms:
+        speed = f"{row_ms['surrogate (compact)']:.2g} ms per price vs {row_ms['forest (compact)']:.2g} ms exact; "
+    return (f"Fast uses a small distilled model: {speed}on held-out listings its price differs from the exact "
+            f"one by {report['real_median_pct']:.1f}% at the median and under {report['real_p95_pct']:.0f}% "
+            f"for 95% of them")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil pipeline.pkl into a small boosted-tree surrogate.")
+    parser.add_argument('--pipeline', default=PIPELINE_FILE)
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--synthetic', type=int, default=N_SYNTHETIC,
+                        help="synthetic rows to label with the forest")
+    parser.add_argument('--max-iter', type=int, default=SURROGATE_PARAMS['max_iter'])
+    parser.add_argument('--max-depth', type=int, default=SURROGATE_PARAMS['max_depth'])
+    parser.add_argument('--max-leaf-nodes', type=int, default=SURROGATE_PARAMS['max_leaf_nodes'])
+    parser.add_argument('--output', default=SURROGATE_FILE)
+    parser.add_argument('--compact', default=SURROGATE_DIR)
+    parser.add_argument('--report', default=REPORT_FILE)
+    args = parser.parse_args()
+
+    surrogate, report = distill(args.pipeline, args.data, args.synthetic,
+                                {'max_iter': args.max_iter, 'max_depth': args.max_depth,
+                                 'max_leaf_nodes': args.max_leaf_nodes})
+    tmp = f"{args.output}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as file:
+        pickle.dump(surrogate, file)
+    os.replace(tmp, args.output)
+    export_pipeline(surrogate, args.compact, report['source_digest'])
+
+    X = load_data(args.data)[0][FEATURE_COLUMNS]
+    X = X[_known(X, known_categories(surrogate))]
+    report['costs'] = costs({'forest': args.pipeline, 'forest (compact)': COMPACT_DIR, 'surrogate': args.output,
+                             'surrogate (compact)': args.compact}, X.iloc[:1])
+    # the compact export of the surrogate against its sklearn predictions
+    report['compact_max_diff'] = float(np.max(np.abs(CompactModel.load(args.compact).predict(X)
+                                                     - surrogate.predict(X))))
+    with open(args.report, 'w') as file:
+        json.dump(report, file, indent=1)
+
+    print(f"surrogate: {report['n_trees']} trees fitted on {report['train_rows']} rows in "
+          f"{report['fit_seconds']:.1f}s")
+    for name in ('real', 'synthetic'):
+        print(f"fidelity on held-out {name} rows: mean |diff| {report[f'{name}_mae_cr']:.4f} cr, median "
+              f"{report[f'{name}_median_pct']:.2f}%, p95 {report[f'{name}_p95_pct']:.2f}%")
+    print(f"MAE vs listed prices: forest {report['forest_mae_cr']:.4f} cr, "
+          f"surrogate {report['surrogate_mae_cr']:.4f} cr; "
+          f"compact export max |diff| {report['compact_max_diff']:.1e}")
+    with pd.option_context('display.width', 120, 'display.float_format', '{:.4f}'.format):
+        print(pd.DataFrame(report['costs']).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Synthetic Gurgaon listings and apartments at any scale.
+
+The real tables are small (about 3.3k dashboard rows, 3.5k model rows, 246
+apartments), so scaling problems stay hidden until production.  The
+generators here are fitted on those tables and sample as many rows as asked.
+
+Listings (``data_viz1.csv`` and the model CSV, same columns as the originals)
+are a smoothed bootstrap within ``(sector, property_type)`` groups:
+
+* a template row is drawn uniformly, which keeps the group frequencies and the
+  joint distribution of the categorical columns (bedrooms, possession, ...);
+* ``built_up_area`` is jittered log-normally by a share of the group's own
+  log-area spread;
+* the price follows the area through the group's log-price/log-area slope
+  (shrunk towards the global slope for small groups), plus a share of the
+  group's residual noise; ``price_per_sqft`` moves with it;
+* coordinates are jittered around the sector, and some listings move to a new
+  "phase" of their society so the distinct-society count grows with scale.
+
+Apartments copy a template listing's location, re-draw its facilities from
+the facility vocabulary, jitter its stated landmark distances and scale its
+price ranges.
+
+    python -m realestate.synthetic --rows 1000000 --output synthetic
+"""
+import argparse
+import ast
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.model_benchmark import DATA_FILE
+from realestate.similarity import distance_to_meters, load_apartments
+
+VIZ_FILE = 'data_viz1.csv'
+APARTMENTS_FILE = 'appartments.csv'
+SYNTHETIC_DIR = 'synthetic'
+GROUP_COLUMNS = ('sector', 'property_type')
+AREA_JITTER = 0.3  # share of the group's log-area sd
+PRICE_NOISE = 0.5  # share of the group's residual log-price sd
+SLOPE_PRIOR = 20  # rows of weight the global slope gets in each group's slope
+COORDINATE_JITTER = 0.004  # degrees, about 400 m
+NEW_PHASE_RATE = 0.2
+N_PHASES = 8
+CHUNK_ROWS = 500_000
+
+
+# --- LISTINGS ---
+
+class ListingSampler:
+    """Smoothed bootstrap of a listings table within its ``(sector, property_type)`` groups."""
+
+    def __init__(self, df, area='built_up_area', price='price', price_per_sqft=None, society=None,
+                 coordinates=None):
+        df = df.dropna(subset=[*GROUP_COLUMNS, area, price])
+        df = df[(df[area] > 0) & (df[price] > 0)].reset_index(drop=True)
+        # categoricals make resampling millions of rows a code gather instead of object copies
+        self.table = df.astype({c: 'category' for c in df.columns if df[c].dtype == object})
+        self.area, self.price, self.price_per_sqft = area, price, price_per_sqft
+        self.coordinates = coordinates
+
+        log_area, log_price = np.log(df[area].to_numpy(np.float64)), np.log(df[price].to_numpy(np.float64))
+        group = df.groupby(list(GROUP_COLUMNS), observed=True).ngroup().to_numpy()
+        n_groups = group.max() + 1
+        size = np.bincount(group, minlength=n_groups)
+
+        def group_mean(values):
+            return np.bincount(group, values, n_groups) / size
+
+        area_centred = log_area - group_mean(log_area)[group]
+        price_centred = log_price - group_mean(log_price)[group]
+        var_area = np.bincount(group, area_centred ** 2, n_groups)
+        cov = np.bincount(group, area_centred * price_centred, n_groups)
+        global_slope = np.sum(area_centred * price_centred) / np.sum(area_centred ** 2)
+        # the global slope counts as SLOPE_PRIOR rows of typical area spread
+        prior = SLOPE_PRIOR * np.mean(area_centred ** 2)
+        slope = (cov + prior * global_slope) / (var_area + prior)
+        residual = price_centred - slope[group] * area_centred
+        global_area_sd, global_residual_sd = area_centred.std(), residual.std()
+        area_sd = np.sqrt(var_area / np.maximum(size - 1, 1))
+        residual_sd = np.sqrt(np.bincount(group, residual ** 2, n_groups) / np.maximum(size - 1, 1))
+        # singleton groups borrow the global spread
+        self.row_slope = slope[group]
+        self.row_area_sd = np.where(size > 1, area_sd, global_area_sd)[group]
+        self.row_residual_sd = np.where(size > 1, residual_sd, global_residual_sd)[group]
+        self.area_bounds = (df[area].min() * 0.8, df[area].max() * 1.25)
+
+        self.society = society
+        if society is not None:
+            names = list(self.table[society].cat.categories)
+            phases = [f"{name} phase {k}" for k in range(2, N_PHASES + 2) for name in names]
+            # a phase name may already be a real society: both map to one category
+            codes, self.society_categories = pd.factorize(pd.Index(names + phases))
+            self.society_codes = codes[:len(names)]
+            self.phase_codes = codes[len(names):].reshape(N_PHASES, len(names))
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        return cls(pd.read_csv(path), **kwargs)
+
+    def sample(self, n, rng):
+        rows = rng.integers(len(self.table), size=n)
+        out = self.table.iloc[rows].reset_index(drop=True)
+        area_template = out[self.area].to_numpy(np.float64)
+        area = np.clip(area_template * np.exp(rng.normal(0, AREA_JITTER * self.row_area_sd[rows])),
+                       *self.area_bounds)
+        factor = (area / area_template) ** self.row_slope[rows] * \
+            np.exp(rng.normal(0, PRICE_NOISE * self.row_residual_sd[rows]))
+        out[self.area] = area.round().astype(out[self.area].dtype)
+        out[self.price] = np.round(out[self.price].to_numpy(np.float64) * factor, 2)
+        if self.price_per_sqft is not None:
+            ppsf = out[self.price_per_sqft].to_numpy(np.float64) * factor * area_template / area
+            out[self.price_per_sqft] = ppsf.round().astype(out[self.price_per_sqft].dtype)
+        for column in self.coordinates or ():
+            out[column] = out[column].to_numpy(np.float64) + rng.normal(0, COORDINATE_JITTER, n)
+        if self.society is not None:
+            codes = out[self.society].cat.codes.to_numpy().astype(np.int64)
+            moved = (rng.random(n) < NEW_PHASE_RATE) & (codes >= 0)
+            new = self.phase_codes[rng.integers(N_PHASES, size=int(moved.sum())), codes[moved]]
+            codes[codes >= 0] = self.society_codes[codes[codes >= 0]]
+            codes[moved] = new
+            out[self.society] = pd.Categorical.from_codes(codes, categories=self.society_categories)
+        return out
+
+
+def viz_sampler(path=VIZ_FILE):
+    """Sampler for the dashboard table (``data_viz1.csv`` columns)."""
+    return ListingSampler.from_csv(path, price_per_sqft='price_per_sqft', society='society',
+                                   coordinates=('latitude', 'longitude'))
+
+
+def model_sampler(path=DATA_FILE):
+    """Sampler for the price model's training table (the post-feature-selection CSV columns)."""
+    return ListingSampler.from_csv(path)
+
+
+# --- APARTMENTS ---
+
+def _format_distance(meters):
+    return f"{meters:.0f} Meter" if meters < 1000 else f"{meters / 1000:.1f} KM"
+
+
+def _scale_prices(price_range, factor):
+    if '₹' not in price_range:
+        return price_range  # "Price on Request"
+    return re.sub(r'\d+(?:\.\d+)?', lambda m: f"{float(m.group()) * factor:.2f}".rstrip('0').rstrip('.'),
+                  price_range)
+
+
+class ApartmentSampler:
+    """New apartments around the real ones: same location text, re-drawn facilities, jittered distances and prices."""
+
+    def __init__(self, df):
+        self.table = df.reset_index(drop=True)
+        self.facilities = [ast.literal_eval(value) for value in self.table['TopFacilities']]
+        self.vocabulary = np.array(sorted({f for facilities in self.facilities for f in facilities}), dtype=object)
+        self.advantages = [ast.literal_eval(value) for value in self.table['LocationAdvantages']]
+        self.price_details = [ast.literal_eval(value) for value in self.table['PriceDetails']]
+
+    @classmethod
+    def from_csv(cls, path=APARTMENTS_FILE):
+        return cls(load_apartments(path))
+
+    def sample(self, n, rng, start=0):
+        """``n`` apartments named ``"<template> (Tower <i>)"`` for ``i`` from ``start``."""
+        rows = rng.integers(len(self.table), size=n)
+        records = []
+        for i, row in enumerate(rows, start):
+            template = self.table.iloc[row]
+            own = self.facilities[row]
+            k = int(np.clip(len(own) + rng.integers(-2, 3), 1, len(self.vocabulary)))
+            keep = [f for f in own if rng.random() < 0.8][:k]
+            extra = [f for f in rng.permutation(self.vocabulary) if f not in keep][:k - len(keep)]
+            advantages = {}
+            for landmark, distance in self.advantages[row].items():
+                meters = distance_to_meters(distance)
+                advantages[landmark] = distance if meters is None else \
+                    _format_distance(meters * np.exp(rng.normal(0, 0.15)))
+            factor = float(np.exp(rng.normal(0, 0.15)))
+            details = {config: {**fields, 'price-range': _scale_prices(fields.get('price-range', ''), factor)}
+                       if isinstance(fields, dict) else fields
+                       for config, fields in self.price_details[row].items()}
+            records.append({
+                'PropertyName': f"{template['PropertyName']} (Tower {i})",
+                'PropertySubName': template['PropertySubName'],
+                'NearbyLocations': template['NearbyLocations'],
+                'LocationAdvantages': str(advantages),
+                'Link': f"{template['Link']}#synthetic-{i}",
+                'PriceDetails': str(details),
+                'TopFacilities': str(keep + extra),
+            })
+        return pd.DataFrame(records, columns=self.table.columns)
+
+
+# --- OUTPUT ---
+
+def iter_chunks(sampler, n, seed=0, chunk_rows=CHUNK_ROWS):
+    """``n`` sampled rows in chunks; the chunks are independent streams of one seed."""
+    streams = np.random.SeedSequence(seed).spawn(-(-n // chunk_rows))
+    for stream, start in zip(streams, range(0, n, chunk_rows)):
+        yield sampler.sample(min(chunk_rows, n - start), np.random.default_rng(stream))
+
+
+def write_parquet(chunks, path):
+    """Append DataFrame chunks to one Parquet file (written to a temporary name, then swapped in)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp, writer, rows = f"{path}.{os.getpid()}.tmp", None, 0
+    try:
+        for chunk in chunks:
+            # categories differ per chunk; plain strings keep one schema across the file
+            chunk = chunk.astype({c: str for c in chunk.columns if isinstance(chunk[c].dtype, pd.CategoricalDtype)})
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+    return rows
+
+
+def generate(output=SYNTHETIC_DIR, n_rows=100_000, n_apartments=None, seed=0, viz_path=VIZ_FILE,
+             model_path=DATA_FILE, apartments_path=APARTMENTS_FILE):
+    """Write ``listings.parquet``, ``model_rows.parquet`` and ``apartments.csv`` to ``output``.
+
+    ``n_apartments`` defaults to the real apartments-per-listing ratio.
+    """
+    os.makedirs(output, exist_ok=True)
+    viz = viz_sampler(viz_path)
+    apartments = ApartmentSampler.from_csv(apartments_path)
+    if n_apartments is None:
+        n_apartments = max(len(apartments.table), round(n_rows * len(apartments.table) / len(viz.table)))
+    written = {
+        'listings.parquet': write_parquet(iter_chunks(viz, n_rows, seed), os.path.join(output, 'listings.parquet')),
+        'model_rows.parquet': write_parquet(iter_chunks(model_sampler(model_path), n_rows, seed + 1),
+                                            os.path.join(output, 'model_rows.parquet')),
+    }
+    frame = apartments.sample(n_apartments, np.random.default_rng(seed + 2))
+    tmp = os.path.join(output, f"apartments.csv.{os.getpid()}.tmp")
+    frame.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(output, 'apartments.csv'))
+    written['apartments.csv'] = len(frame)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Gurgaon listings and apartments.")
+    parser.add_argument('--rows', type=int, default=100_000, help="listings (and model rows) to generate")
+    parser.add_argument('--apartments', type=int, default=None, help="default: the real apartments/listing ratio")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=SYNTHETIC_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = generate(args.output, args.rows, args.apartments, args.seed)
+    print(f"generated in {time.perf_counter() - start:.1f}s -> {args.output}/")
+    for name, rows in written.items():
+        print(f"  {name}: {rows:,} rows")
+
+
+if __name__ == '__main__':
+    main()
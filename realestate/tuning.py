@@ -0,0 +1,221 @@
+"""Successive-halving search for the random-forest hyperparameters.
+
+``model_selection.ipynb`` tunes the forest with ``GridSearchCV`` over
+4 x 4 x 4 x 2 = 128 combinations x 10 folds = 1280 full fits, half of which
+fail on the removed ``max_features='auto'`` (``1.0`` here, its regression
+meaning).  This search treats ``n_estimators`` as the budget instead of a
+grid axis:
+
+* every remaining configuration is scored on the cached CV folds of
+  :mod:`realestate.model_benchmark` with a small forest, only the best
+  ``1/eta`` survive, and the survivors grow ``eta`` times more trees, up to
+  ``max_trees``,
+* growing is incremental, like ``warm_start``: a forest's prediction is the
+  mean of its trees, so each rung fits only the new trees (fresh seeds) and
+  adds their summed predictions to the ones kept from earlier rungs,
+* (configuration x fold) increments run in a process pool, and a wall-clock
+  ``time_budget`` stops the search early with the best configuration of the
+  last finished rung (none if the first rung did not finish),
+* every increment is written to a trace CSV and the outcome to a JSON file.
+
+Usage::
+
+    python -m realestate.tuning --workers 4 --time-budget 600
+    python -m realestate.tuning --variant target --eta 2 --refit pipeline_tuned.pkl
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from realestate.artifacts import file_digest
+from realestate.model_benchmark import (CACHE_DIR, DATA_FILE, PREPROCESSORS, cache_folds, data_hash, fold_path,
+                                        load_data, splits)
+
+TRACE_FILE = 'tuning_trace.csv'
+RESULT_FILE = 'tuning_result.json'
+# the notebook's param_grid without n_estimators (the budget); 'auto' meant 1.0 for regressors
+PARAM_GRID = {
+    'max_depth': [None, 10, 20, 30],
+    'max_samples': [0.1, 0.25, 0.5, 1.0],
+    'max_features': [1.0, 'sqrt'],
+}
+MAX_TREES = 300
+ETA = 3
+
+
+def configurations(grid=PARAM_GRID):
+    from sklearn.model_selection import ParameterGrid
+
+    return list(ParameterGrid(grid))
+
+
+def schedule(n_configs, max_trees=MAX_TREES, eta=ETA):
+    """``[(n_configs, n_trees), ...]`` per rung, ending with the survivors at ``max_trees``."""
+    n_rungs = 1 + int(math.floor(math.log(n_configs, eta) + 1e-9)) if n_configs > 1 else 1
+    rungs = []
+    for i in range(n_rungs):
+        rungs.append((n_configs, max(1, round(max_trees / eta ** (n_rungs - 1 - i)))))
+        n_configs = max(1, math.ceil(n_configs / eta))
+    return rungs
+
+
+# --- INCREMENTS (run in the workers) ---
+
+def grow(job):
+    """Fit ``n_new`` more trees on one fold; return their summed test predictions."""
+    from sklearn.ensemble import RandomForestRegressor
+
+    with np.load(job['path']) as fold:
+        X_train, y_train, X_test = fold['X_train'], fold['y_train'], fold['X_test']
+    start = time.perf_counter()
+    forest = RandomForestRegressor(n_estimators=job['n_new'], random_state=job['seed'], **job['params'])
+    forest.fit(X_train, y_train)
+    return {'config': job['config'], 'split': job['split'], 'n_new': job['n_new'],
+            'prediction_sum': forest.predict(X_test) * job['n_new'], 'seconds': time.perf_counter() - start}
+
+
+def _grown(jobs, workers):
+    if workers <= 1:
+        for job in jobs:
+            yield grow(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(grow, job))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# --- SEARCH ---
+
+def _r2(y, prediction):
+    return 1 - np.sum((y - prediction) ** 2) / np.sum((y - y.mean()) ** 2)
+
+
+def successive_halving(data=DATA_FILE, variant='pipeline', grid=PARAM_GRID, max_trees=MAX_TREES, eta=ETA,
+                       time_budget=None, workers=1, cache_dir=CACHE_DIR, seed=0):
+    """Search ``grid``; returns ``(result, trace)`` where ``trace`` has one row per fitted increment.
+
+    If ``time_budget`` runs out before the first rung finishes, ``result`` has
+    no best configuration (``best_params`` etc. are ``None``).
+    """
+    start = time.perf_counter()
+    X, y = load_data(data)
+    folds = {split: fold for split, fold in splits(len(X)).items() if split != 'holdout'}
+    digest = file_digest(data)
+    digests = {split: data_hash(digest, variant, split) for split in folds}
+    cache_folds(X, y, variant, folds, digests, cache_dir)
+    paths = {split: fold_path(cache_dir, variant, split, digests[split]) for split in folds}
+    y_test = {split: y[test] for split, (_, test) in folds.items()}
+
+    configs = configurations(grid)
+    sums = {}  # (config, split) -> summed tree predictions so far
+    trees = np.zeros(len(configs), dtype=np.int64)
+    alive = list(range(len(configs)))
+    scores, trace, finished = {}, [], []
+    trees_fitted, stopped = 0, False
+
+    for rung, (_, n_trees) in enumerate(schedule(len(configs), max_trees, eta)):
+        jobs = [{'config': c, 'split': split, 'path': paths[split], 'params': configs[c],
+                 'n_new': int(n_trees - trees[c]), 'seed': seed + 1000 * c + rung}
+                for c in alive if n_trees > trees[c] for split in folds]
+        for result in _grown(jobs, workers):
+            key = (result['config'], result['split'])
+            sums[key] = sums.get(key, 0) + result['prediction_sum']
+            trees_fitted += result['n_new']
+            trace.append({'rung': rung, 'config': result['config'], 'split': result['split'], 'n_trees': n_trees,
+                          'n_new': result['n_new'], 'seconds': result['seconds'],
+                          'elapsed': time.perf_counter() - start,
+                          **{f'param_{k}': v for k, v in configs[result['config']].items()}})
+            if time_budget is not None and time.perf_counter() - start > time_budget:
+                stopped = True
+                break
+        if stopped:
+            break
+
+        trees[alive] = n_trees
+        for c in alive:
+            fold_scores = [_r2(y_test[split], sums[c, split] / n_trees) for split in folds]
+            scores[c] = (n_trees, float(np.mean(fold_scores)), float(np.std(fold_scores)))
+        for row in trace:
+            if row['rung'] == rung:
+                row['mean_r2'] = scores[row['config']][1]
+        ranked = sorted(alive, key=lambda c: -scores[c][1])
+        finished.append({'rung': rung, 'n_trees': n_trees, 'configs': len(alive),
+                         'best_r2': scores[ranked[0]][1], 'elapsed': time.perf_counter() - start})
+        alive = ranked[:max(1, math.ceil(len(alive) / eta))]
+        # free the predictions of the configurations that were stopped
+        sums = {key: value for key, value in sums.items() if key[0] in alive}
+
+    result = {'variant': variant, 'best_params': None, 'best_r2': None, 'best_r2_std': None, 'rungs': finished,
+              'fits': len(trace), 'trees_fitted': trees_fitted, 'stopped_by_budget': stopped,
+              'seconds': time.perf_counter() - start}
+    if scores:
+        best = max(scores, key=lambda c: (scores[c][0], scores[c][1]))
+        result.update(best_params={**configs[best], 'n_estimators': int(scores[best][0])},
+                      best_r2=scores[best][1], best_r2_std=scores[best][2])
+    return result, pd.DataFrame(trace)
+
+
+def refit(X, y, variant, params):
+    """Production-style pipeline with the chosen forest, fitted on all rows."""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([('preprocessor', PREPROCESSORS[variant]()),
+                     ('regressor', RandomForestRegressor(**params))]).fit(X, y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving search for the random-forest parameters.")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--variant', default='pipeline', choices=list(PREPROCESSORS))
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES)
+    parser.add_argument('--eta', type=int, default=ETA, help="keep the best 1/eta configurations per rung")
+    parser.add_argument('--time-budget', type=float, help="stop after this many seconds")
+    parser.add_argument('--workers', type=int, default=1, help="fitting processes (1 = in-process)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--trace', default=TRACE_FILE)
+    parser.add_argument('--result', default=RESULT_FILE)
+    parser.add_argument('--refit', help="fit the winning pipeline on all rows and pickle it here")
+    args = parser.parse_args()
+
+    result, trace = successive_halving(args.data, args.variant, max_trees=args.max_trees, eta=args.eta,
+                                       time_budget=args.time_budget, workers=args.workers,
+                                       cache_dir=args.cache_dir)
+    trace.to_csv(args.trace, index=False)
+    with open(args.result, 'w') as file:
+        json.dump(result, file, indent=1)
+    for rung in result['rungs']:
+        print(f"rung {rung['rung']}: {rung['configs']:>3} configs x {rung['n_trees']:>3} trees  "
+              f"best r2={rung['best_r2']:.4f}  ({rung['elapsed']:.1f}s)")
+    if result['best_params'] is None:
+        print(f"time budget exhausted before the first rung finished ({result['fits']} fits in "
+              f"{result['seconds']:.1f}s) -> {args.trace}")
+        raise SystemExit(1)
+    print(f"best {result['best_params']} r2={result['best_r2']:.4f} in {result['seconds']:.1f}s"
+          f"{' (stopped by the time budget)' if result['stopped_by_budget'] else ''} -> {args.result}")
+
+    if args.refit:
+        X, y = load_data(args.data)
+        pipeline = refit(X, y, args.variant, result['best_params'])
+        tmp = f"{args.refit}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as file:
+            pickle.dump(pipeline, file)
+        os.replace(tmp, args.refit)
+        print(f"refitted pipeline -> {args.refit}")
+
+
+if __name__ == '__main__':
+    main()
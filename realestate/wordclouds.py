@@ -0,0 +1,115 @@
+"""Token frequencies and wordcloud images for the Analysis dashboard.
+
+The wordcloud words come from three categorical columns, so every distinct
+value is tokenized once (with WordCloud's own tokenizer and stopwords) and a
+row's tokens are the sum of its values' tokens.  :class:`TokenCounts` keeps
+those per-row counts as a sparse matrix; the filter cube sums them per cell,
+and a selection's frequencies are a sum of a few cell rows.
+
+Rendering goes through ``generate_from_frequencies`` straight to PNG bytes;
+the dashboard keeps them in its section cache, and the same bytes feed
+``st.image`` and the download button.  ``wordcloud`` itself is imported on
+first use, not when the dashboard imports this module.
+"""
+import io
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+TEXT_COLUMNS = ('property_type', 'society', 'agePossession')
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    from wordcloud import STOPWORDS, WordCloud
+
+    # plurals are folded per selection in TokenCounts.frequencies, where the whole vocabulary is known
+    return WordCloud(stopwords=STOPWORDS, collocations=False, normalize_plurals=False)
+
+
+@lru_cache(maxsize=65536)
+def value_tokens(value):
+    """``{token: count}`` for one categorical value, as ``WordCloud.generate`` would count it."""
+    counts = {}
+    for word, count in _tokenizer().process_text(value).items():
+        counts[word.lower()] = counts.get(word.lower(), 0) + count
+    return counts
+
+
+class TokenCounts:
+    """Sparse ``rows x vocabulary`` token counts over ``TEXT_COLUMNS``."""
+
+    def __init__(self, df, columns=TEXT_COLUMNS):
+        vocabulary = {}
+        per_column = []
+        for column in columns:
+            codes, uniques = pd.factorize(df[column].astype(str))
+            entries = [(i, vocabulary.setdefault(token, len(vocabulary)), count)
+                       for i, value in enumerate(uniques) for token, count in value_tokens(value).items()]
+            per_column.append((codes, len(uniques), entries))
+
+        self.vocabulary = np.array(list(vocabulary), dtype=object)
+        pairs = [(j, vocabulary[token[:-1]]) for token, j in vocabulary.items()
+                 if token.endswith('s') and not token.endswith('ss') and token[:-1] in vocabulary]
+        self.plurals = np.array([p for p, _ in pairs], dtype=np.int64)
+        self.singulars = np.array([s for _, s in pairs], dtype=np.int64)
+        self.rows = sparse.csr_matrix((len(df), len(vocabulary)), dtype=np.float64)
+        for codes, n_values, entries in per_column:
+            i, j, count = zip(*entries) if entries else ((), (), ())
+            values = sparse.csr_matrix((count, (i, j)), shape=(n_values, len(vocabulary)), dtype=np.float64)
+            self.rows = self.rows + values[codes]
+
+    def to_arrays(self, prefix='tokens'):
+        return {f'{prefix}_vocabulary': self.vocabulary.astype(str), f'{prefix}_plurals': self.plurals,
+                f'{prefix}_singulars': self.singulars, **csr_arrays(self.rows, f'{prefix}_rows')}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix='tokens'):
+        counts = cls.__new__(cls)
+        counts.vocabulary = arrays[f'{prefix}_vocabulary'].astype(object)
+        counts.plurals, counts.singulars = arrays[f'{prefix}_plurals'], arrays[f'{prefix}_singulars']
+        counts.rows = csr_from_arrays(arrays, f'{prefix}_rows')
+        return counts
+
+    def sum_by(self, groups, n_groups):
+        """Token counts summed per group id (a ``n_groups x vocabulary`` CSR matrix)."""
+        indicator = sparse.csr_matrix((np.ones(len(groups)), (groups, np.arange(len(groups)))),
+                                      shape=(n_groups, len(groups)))
+        return (indicator @ self.rows).tocsr()
+
+    def frequencies(self, counts):
+        """``{token: count}`` for a dense vocabulary-length count vector.
+
+        Like ``WordCloud.process_text``, a plural is folded into its singular
+        when both occur in the selection.
+        """
+        both = (counts[self.plurals] > 0) & (counts[self.singulars] > 0)
+        if both.any():
+            counts = counts.copy()
+            np.add.at(counts, self.singulars[both], counts[self.plurals[both]])
+            counts[self.plurals[both]] = 0
+        nonzero = np.flatnonzero(counts)
+        return dict(zip(self.vocabulary[nonzero].tolist(), counts[nonzero].tolist()))
+
+
+def csr_arrays(matrix, prefix):
+    """The CSR parts of ``matrix`` as named arrays (see :func:`csr_from_arrays`)."""
+    return {f'{prefix}_data': matrix.data, f'{prefix}_indices': matrix.indices, f'{prefix}_indptr': matrix.indptr,
+            f'{prefix}_shape': np.array(matrix.shape)}
+
+
+def csr_from_arrays(arrays, prefix):
+    return sparse.csr_matrix((arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+                             shape=tuple(arrays[f'{prefix}_shape']), copy=False)
+
+
+def render_png(frequencies, width=800, height=400, **options):
+    from wordcloud import WordCloud
+
+    options = {'background_color': 'white', 'colormap': 'viridis', 'min_font_size': 10, **options}
+    image = WordCloud(width=width, height=height, **options).generate_from_frequencies(frequencies).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,34 @@
+"""Shared fixtures: the repository's CSV snapshots and a small forest fitted on them.
+
+``pipeline.pkl`` is stored in Git LFS, so the tests fit their own pipeline with
+the production preprocessor instead of unpickling it.
+"""
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def data_path(name):
+    return os.path.join(ROOT, name)
+
+
+@pytest.fixture(scope='session')
+def model_data():
+    from realestate.model_benchmark import DATA_FILE, load_data
+
+    return load_data(data_path(DATA_FILE))
+
+
+@pytest.fixture(scope='session')
+def forest_pipeline(model_data):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+
+    from realestate.model_benchmark import pipeline_preprocessor
+
+    X, y = model_data
+    pipeline = Pipeline([('preprocessor', pipeline_preprocessor()),
+                         ('regressor', RandomForestRegressor(n_estimators=20, max_depth=12, random_state=0))])
+    return pipeline.fit(X, y)
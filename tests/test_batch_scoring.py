@@ -0,0 +1,83 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from realestate import price_model
+from realestate.batch_scoring import score_file, validate
+
+N_ROWS = 60
+
+
+@pytest.fixture(scope='module')
+def pipeline_path(forest_pipeline, tmp_path_factory):
+    path = tmp_path_factory.mktemp('model') / 'pipeline.pkl'
+    with open(path, 'wb') as file:
+        pickle.dump(forest_pipeline, file)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def listings(model_data, tmp_path_factory):
+    frame = model_data[0].head(N_ROWS).copy()
+    frame.loc[frame.index[3], 'built_up_area'] = 1e6
+    frame.loc[frame.index[7], 'sector'] = 'sector 999'
+    path = tmp_path_factory.mktemp('feed') / 'listings.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_validate_normalises_categories(forest_pipeline, model_data):
+    X = model_data[0].head(5)
+    chunk = X.copy()
+    # a numeric column, a text column with stray spaces and numbers mixed into text all mean the same labels
+    chunk['balcony'] = pd.Series([2, '3+', ' 1 ', 2.0, 0], index=X.index, dtype=object)
+    chunk['floor_category'] = ' ' + X['floor_category'] + ' '
+    chunk['furnishing_type'] = pd.Series([0.0, '1', 2, ' furnished ', 'semifurnished'], index=X.index, dtype=object)
+    cleaned, errors = validate(chunk, price_model.known_categories(forest_pipeline))
+    assert list(errors) == [''] * 5
+    assert list(cleaned['balcony']) == ['2', '3+', '1', '2', '0']
+    assert list(cleaned['floor_category']) == list(X['floor_category'])
+    assert list(cleaned['furnishing_type']) == ['unfurnished', 'semifurnished', 'furnished', 'furnished',
+                                                'semifurnished']
+
+    numeric = chunk.assign(balcony=[2.0, 1.0, 3.0, 0.0, 2.5])
+    _, errors = validate(numeric, price_model.known_categories(forest_pipeline))
+    assert list(errors) == ['', '', '', '', 'unknown balcony']
+
+
+def test_bad_rows_are_written_with_an_error(listings, pipeline_path, forest_pipeline, model_data, tmp_path):
+    output = str(tmp_path / 'priced.csv')
+    rows, rejected, _ = score_file(listings, output, pipeline_path, chunksize=25)
+    scored = pd.read_csv(output, keep_default_na=False, na_values=[''])
+    assert (rows, rejected, len(scored)) == (N_ROWS, 2, N_ROWS)
+    assert scored.loc[3, 'error'] == "built_up_area out of range"
+    assert scored.loc[7, 'error'] == "unknown sector"
+    assert scored.loc[[3, 7], ['predicted_price', 'price_low', 'price_high']].isna().all().all()
+
+    good = scored['error'].isna()
+    expected, low, high = price_model.predict_price_band(forest_pipeline, model_data[0].head(N_ROWS)[good.to_numpy()])
+    np.testing.assert_allclose(scored.loc[good, 'predicted_price'], expected, atol=1e-4)
+    np.testing.assert_allclose(scored.loc[good, 'price_low'], low)
+    np.testing.assert_allclose(scored.loc[good, 'price_high'], high)
+
+
+def test_parquet_output_round_trips(listings, pipeline_path, tmp_path):
+    csv, parquet = str(tmp_path / 'priced.csv'), str(tmp_path / 'priced.parquet')
+    score_file(listings, csv, pipeline_path, chunksize=25)
+    # the first chunk's schema is reused for the later ones, including the chunk whose errors are all ''
+    rows, rejected, _ = score_file(listings, parquet, pipeline_path, chunksize=25)
+    assert (rows, rejected) == (N_ROWS, 2)
+    expected = pd.read_csv(csv, dtype={'balcony': str}, keep_default_na=False, na_values=[''])
+    scored = pd.read_parquet(parquet)
+    assert list(scored.columns) == list(expected.columns)
+    scored['error'] = scored['error'].replace('', np.nan)
+    pd.testing.assert_frame_equal(scored, expected, check_dtype=False)
+
+
+def test_workers_match_in_process_scoring(listings, pipeline_path, tmp_path):
+    serial, parallel = str(tmp_path / 'serial.csv'), str(tmp_path / 'parallel.csv')
+    assert score_file(listings, serial, pipeline_path, chunksize=10)[:2] == \
+        score_file(listings, parallel, pipeline_path, chunksize=10, workers=2)[:2]
+    pd.testing.assert_frame_equal(pd.read_csv(parallel), pd.read_csv(serial))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from realestate.compact_model import CompactModel, export_pipeline
+from realestate.price_model import FEATURE_COLUMNS
+
+
+@pytest.fixture(scope='module')
+def X(model_data):
+    return model_data[0][FEATURE_COLUMNS]
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_forest_matches_pipeline(forest_pipeline, X, tmp_path, mmap):
+    compact = CompactModel.load(export_pipeline(forest_pipeline, str(tmp_path / 'compact'), 'digest'), mmap=mmap)
+    assert compact.source_digest == 'digest'
+    # leaf values are stored as float32
+    np.testing.assert_allclose(compact.predict(X), forest_pipeline.predict(X), rtol=1e-6)
+
+    features = forest_pipeline.named_steps['preprocessor'].transform(X)
+    trees = np.column_stack([tree.predict(features) for tree in forest_pipeline.steps[-1][1].estimators_])
+    np.testing.assert_allclose(compact.tree_predictions(X), trees, rtol=1e-6)
+
+
+def test_boosted_surrogate_matches_pipeline(forest_pipeline, X, tmp_path):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.pipeline import Pipeline
+
+    preprocessor = forest_pipeline.named_steps['preprocessor']
+    surrogate = Pipeline([('preprocessor', preprocessor),
+                          ('regressor', HistGradientBoostingRegressor(max_iter=50, random_state=0))])
+    surrogate.steps[-1][1].fit(preprocessor.transform(X), forest_pipeline.predict(X))
+    compact = CompactModel.load(export_pipeline(surrogate, str(tmp_path / 'surrogate')))
+    np.testing.assert_allclose(compact.predict(X), surrogate.predict(X), rtol=1e-6)
+    assert compact.tree_predictions(X) is None
+
+
+def test_unknown_categories_are_rejected(forest_pipeline, X, tmp_path):
+    compact = CompactModel.load(export_pipeline(forest_pipeline, str(tmp_path / 'compact')))
+    row = X.iloc[[0]].assign(sector='sector 999')
+    with pytest.raises(ValueError, match='sector'):
+        compact.predict(row)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from realestate.cube import FilterCube
+from tests.conftest import data_path
+
+SELECTIONS = [
+    ({}, None),
+    ({'sector': 'sector 45'}, None),
+    ({'bedRoom': '3'}, (1.0, 3.0)),
+    ({'property_type': 'flat', 'agePossession': 'New property'}, (0.5, 2.2)),
+]
+
+
+@pytest.fixture(scope='module')
+def viz():
+    return pd.read_csv(data_path('data_viz1.csv'))
+
+
+@pytest.fixture(scope='module')
+def cube(viz):
+    return FilterCube(viz)
+
+
+def _filter(df, selection, price_range):
+    for column, label in selection.items():
+        df = df[df[column].astype(str) == label]
+    if price_range is not None:
+        df = df[(df['price'] >= price_range[0]) & (df['price'] <= price_range[1])]
+    return df
+
+
+@pytest.mark.parametrize('selection, price_range', SELECTIONS)
+def test_correlation_matches_pandas(viz, cube, selection, price_range):
+    rows = _filter(viz, selection, price_range)
+    summary = cube.summarize(price_range, **selection)
+    expected = rows[cube.numeric_columns].corr()
+    np.testing.assert_allclose(summary.correlation().to_numpy(), expected.to_numpy(), atol=1e-9)
+    assert sorted(summary.rows()) == sorted(viz.index.get_indexer(rows.index))
+
+
+@pytest.mark.parametrize('selection, price_range', SELECTIONS)
+def test_summary_matches_pandas(viz, cube, selection, price_range):
+    rows = _filter(viz, selection, price_range)
+    summary = cube.summarize(price_range, **selection)
+    assert summary.count == len(rows)
+    assert summary.mean('price') == pytest.approx(rows['price'].mean())
+    assert summary.std('price_per_sqft') == pytest.approx(rows['price_per_sqft'].std())
+    assert summary.min('built_up_area') == rows['built_up_area'].min()
+    assert summary.max('price') == rows['price'].max()
+    assert summary.distinct_exact
+    assert summary.distinct_societies() == rows['society'].nunique()
+    by_sector = summary.by_sector().set_index('sector')['price']
+    expected = rows.groupby('sector')['price'].mean()
+    np.testing.assert_allclose(by_sector.loc[expected.index], expected)
+
+
+def test_large_cubes_estimate_distinct_societies(viz):
+    cube = FilterCube(viz, exact_distinct_bytes=0)
+    assert not cube.summarize().distinct_exact
+    assert cube.summarize().distinct_societies() == pytest.approx(viz['society'].nunique(), rel=0.1)
+
+
+def test_correlation_moments_are_kept_per_filter_group(viz, cube):
+    # bounded by the dimensions' categories and the coarse price buckets, not by rows
+    groups = viz[['sector', 'bedRoom', 'agePossession', 'property_type']].astype(str).drop_duplicates()
+    assert len(cube.group_codes) <= len(groups) * 4
+    # without a price range no row is rescanned
+    assert not len(cube.summarize(sector='sector 45').straddling_groups)
+    summary = cube.summarize((1.0, 3.0), bedRoom='3')
+    straddling = cube.group_offsets[summary.straddling_groups + 1] - cube.group_offsets[summary.straddling_groups]
+    assert straddling.sum() < summary.count
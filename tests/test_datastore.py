@@ -0,0 +1,38 @@
+import os
+import shutil
+
+import pandas as pd
+
+from realestate import datastore
+from tests.conftest import data_path
+
+
+def test_touched_csv_is_hashed_once(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'data_viz1.csv')
+    shutil.copy(data_path('data_viz1.csv'), csv_path)
+    parquet_path = datastore.ensure(csv_path)
+    expected = datastore.read_parquet(parquet_path)
+
+    hashed = []
+    digest = datastore.file_digest
+    monkeypatch.setattr(datastore, 'file_digest', lambda path: hashed.append(path) or digest(path))
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    for _ in range(3):
+        assert datastore.ensure(csv_path) == parquet_path
+    assert hashed == [csv_path]
+
+    # the twin was re-stamped, not rebuilt, and a fresh process would not hash either
+    datastore._verified.clear()
+    assert datastore.is_fresh(csv_path) and hashed == [csv_path]
+    pd.testing.assert_frame_equal(datastore.read_parquet(parquet_path), expected)
+
+
+def test_changed_csv_is_rebuilt(tmp_path):
+    csv_path = str(tmp_path / 'data_viz1.csv')
+    df = pd.read_csv(data_path('data_viz1.csv'))
+    df.to_csv(csv_path, index=False)
+    datastore.ensure(csv_path)
+    df.head(100).to_csv(csv_path, index=False)
+    assert not datastore.is_fresh(csv_path)
+    assert len(datastore.read(csv_path)) == 100
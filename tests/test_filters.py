@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from realestate.filters import FILTER_COLUMNS, FilterIndex, _pandas_rows
+from tests.conftest import data_path
+
+
+@pytest.fixture(scope='module')
+def viz():
+    return pd.read_csv(data_path('data_viz1.csv'))
+
+
+@pytest.fixture(scope='module')
+def index(viz):
+    return FilterIndex(viz)
+
+
+def test_bitmaps_match_the_column_values(viz, index):
+    for column in FILTER_COLUMNS:
+        rows = np.arange(len(viz))
+        for label in index.options(column):
+            expected = (viz[column].astype(str) == label).to_numpy() & viz[column].notna().to_numpy()
+            np.testing.assert_array_equal(index._has(column, label, rows), expected)
+
+
+def test_random_queries_match_pandas(viz, index):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        selection = {column: rng.choice(index.options(column)) for column in FILTER_COLUMNS if rng.random() < 0.5}
+        price_range = tuple(np.sort(rng.choice(index.sorted_price, 2)))
+        np.testing.assert_array_equal(index.rows(price_range, **selection), _pandas_rows(viz, price_range, selection))
@@ -0,0 +1,27 @@
+import pytest
+
+from realestate.geo import GeoIndex
+
+
+@pytest.fixture
+def geo():
+    # 'Galleria' is both an apartment and a landmark 2 km away from it
+    names = ['Galleria', 'Palm Court', 'Galleria', 'sector 45']
+    kinds = ['apartment', 'apartment', 'landmark', 'sector']
+    stated = (['Galleria'], ['Palm Court'], [0.4])
+    return GeoIndex(names, kinds, [28.45, 28.46, 28.468, 28.44], [77.05, 77.05, 77.05, 77.06], stated)
+
+
+def test_locate_needs_the_kind_of_a_repeated_name(geo):
+    assert geo.locate('Galleria', 'landmark') == (28.468, 77.05)
+    assert geo.locate('Galleria', 'apartment') == (28.45, 77.05)
+    with pytest.raises(ValueError, match='ambiguous'):
+        geo.locate('Galleria')
+    assert geo.locate('sector 45') == (28.44, 77.06)
+
+
+def test_around_uses_the_landmark_not_the_apartment(geo):
+    nearby = geo.around('Galleria', 1.0, kind='landmark')
+    assert nearby['name'].tolist() == ['Palm Court']
+    assert nearby['distance_km'].iloc[0] == pytest.approx(0.4)
+    assert set(geo.around('sector 45', 1.5, kind='sector')['name']) == {'Galleria'}
@@ -0,0 +1,24 @@
+import json
+
+from realestate.diagnostics import _tail
+from realestate.instrumentation import Metrics
+
+
+def test_log_is_rotated_at_its_size_cap(tmp_path):
+    log_file = tmp_path / 'diagnostics.jsonl'
+    metrics = Metrics(log_file=str(log_file), max_log_bytes=1000)
+    for i in range(100):
+        metrics.write({'run': i, 'page': 'analysis'})
+
+    assert log_file.stat().st_size <= 1000
+    rotated = tmp_path / 'diagnostics.jsonl.1'
+    assert rotated.stat().st_size <= 1000
+    runs = [json.loads(line)['run'] for path in (rotated, log_file) for line in path.read_text().splitlines()]
+    assert runs == list(range(100 - len(runs), 100))
+
+
+def test_tail_returns_the_last_lines(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(''.join(f"{i}\n" for i in range(50)))
+    assert _tail(str(path), 3) == '47\n48\n49\n'
+    assert _tail(str(path), 100) == path.read_text()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from realestate.ingest import COLUMNS, ingest_frame
+from realestate.live_index import LiveIndex
+from realestate.recommender import top_candidates
+from tests.conftest import data_path
+
+K = 20
+
+
+@pytest.fixture(scope='module')
+def apartments():
+    return pd.read_csv(data_path('appartments.csv'), usecols=COLUMNS)
+
+
+def _lists(index):
+    """``{name: {candidate: score}}`` of an index's candidate lists."""
+    names = index.names
+    return {name: {names[i]: s for i, s in zip(ids, scores) if i >= 0}
+            for name, ids, scores in zip(names, index.ids, index.scores)}
+
+
+def _assert_same_lists(live, fresh):
+    actual, expected = _lists(live), _lists(fresh)
+    assert actual.keys() == expected.keys()
+    for name, candidates in expected.items():
+        scores = np.array(sorted(candidates.values(), reverse=True))
+        np.testing.assert_allclose(sorted(actual[name].values(), reverse=True), scores, atol=1e-5)
+        # candidates tied with the last one may be swapped for each other
+        clear = {c for c, s in candidates.items() if s > scores[-1] + 1e-5}
+        assert clear <= actual[name].keys(), name
+
+
+def _rescored(live):
+    """Every list recomputed from scratch over the live index's (frozen) features."""
+    blocks = live.features.transform(ingest_frame(live.raw))
+    rows = np.arange(len(live))
+    ids, scores, components = top_candidates([block.similarity(rows) for block in blocks], rows, live.weights, K)
+    return LiveIndex(live.raw, live.features, blocks, ids, scores, components, live.weights)
+
+
+def test_delete_and_reinsert_matches_a_fresh_build(apartments):
+    live = LiveIndex.from_frame(apartments, n_candidates=K)
+    n, moved = len(live), live.raw.sample(25, random_state=0)
+    live.delete(moved['PropertyName'])
+    assert len(live) == n - 25
+    live.upsert(moved)
+    assert live.changes == 50
+    _assert_same_lists(live, LiveIndex.from_frame(live.raw, n_candidates=K))
+
+
+def test_updates_match_a_full_rescore(apartments):
+    live = LiveIndex.from_frame(apartments, n_candidates=K)
+    live.delete(apartments['PropertyName'].iloc[:10])
+    updated = apartments.iloc[20:30].copy()
+    updated['TopFacilities'] = updated['TopFacilities'].iloc[::-1].to_numpy()
+    live.upsert(updated)
+    live.upsert(apartments.iloc[:5])
+    _assert_same_lists(live, _rescored(live))
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import numpy as np
+
+from realestate import price_model
+from realestate.price_service import MicroBatcher, PriceService
+
+POISON_AREA = 1234.5
+
+
+class FlakyModel:
+    """The fitted pipeline, except that ``predict`` raises for any batch holding a poisoned row."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def known_categories(self):
+        return price_model.known_categories(self.pipeline)
+
+    def tree_predictions(self, X):
+        if np.any(X['built_up_area'].to_numpy() == POISON_AREA):
+            raise RuntimeError("poisoned row")
+        return price_model.tree_predictions(self.pipeline, X)
+
+
+def _rows(X, n):
+    rows = X.head(n).to_dict('records')
+    for row in rows:
+        row['furnishing_type'] = str(row['furnishing_type'])
+    return rows
+
+
+async def _route(service, payload):
+    return await service.route('POST', '/predict', json.dumps(payload).encode())
+
+
+def _serve(pipeline, scenario):
+    async def run():
+        batcher = MicroBatcher(pipeline, max_batch=8, max_wait_ms=200)
+        batcher.start()
+        return await scenario(PriceService(batcher))
+    return asyncio.run(run())
+
+
+def test_bad_row_fails_alone(forest_pipeline, model_data):
+    good, bad = _rows(model_data[0], 2)
+    bad['built_up_area'] = POISON_AREA
+
+    async def scenario(service):
+        # two clients whose rows land in the same micro-batch
+        return await asyncio.gather(_route(service, good), _route(service, bad))
+
+    (good_status, good_result), (bad_status, bad_result) = _serve(FlakyModel(forest_pipeline), scenario)
+    assert good_status == bad_status == 200
+    assert 'price' in good_result and 'error' not in good_result
+    assert bad_result == {'error': "poisoned row"}
+
+
+def test_batch_matches_direct_prediction(forest_pipeline, model_data):
+    X = model_data[0]
+    rows = _rows(X, 5)
+
+    async def scenario(service):
+        return await _route(service, {'rows': rows})
+
+    status, response = _serve(forest_pipeline, scenario)
+    expected = price_model.predict_price_band(forest_pipeline, X.head(5))[0]
+    assert status == 200
+    np.testing.assert_allclose([r['price'] for r in response['results']], expected, atol=1e-4)
+
+
+def test_malformed_payloads_are_rejected(forest_pipeline):
+    async def scenario(service):
+        return [await _route(service, payload) for payload in ({'rows': 5}, {'rows': [1, {}]}, {'sector': ['a']}, [])]
+
+    for status, response in _serve(forest_pipeline, scenario):
+        assert status == 400 and 'error' in response
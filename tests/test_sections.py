@@ -0,0 +1,14 @@
+from realestate.sections import SectionCache
+
+
+def test_evicts_least_recently_used_results_by_size():
+    cache = SectionCache(max_bytes=250)
+    for key in 'abc':
+        cache.get_or_compute(key, lambda: b'x' * 100)
+    assert cache.info()['entries'] == 2 and cache.info()['bytes'] == 200
+    assert cache.get_or_compute('a', lambda: b'recomputed') == (b'recomputed', False)
+
+    cache.get_or_compute('c', lambda: None)  # hit: 'c' becomes the most recent
+    cache.get_or_compute('big', lambda: b'x' * 1000)  # larger than the budget: kept alone
+    assert cache.info()['entries'] == 1
+    assert cache.get_or_compute('big', lambda: None) == (b'x' * 1000, True)
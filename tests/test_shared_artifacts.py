@@ -0,0 +1,53 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from realestate import artifacts, datastore, shared_artifacts
+from realestate.cube import FilterCube
+from realestate.filters import FilterIndex
+from tests.conftest import data_path
+from tests.test_cube import SELECTIONS
+
+
+@pytest.fixture(scope='module')
+def published(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('shared')
+    viz_path = str(tmp / 'data_viz1.csv')
+    shutil.copy(data_path('data_viz1.csv'), viz_path)
+    missing = str(tmp / 'missing')
+    root = str(tmp / 'root')
+    shared_artifacts.publish(root, pipeline_path=missing, compact_path=missing, surrogate_path=missing,
+                             predictor_path=missing, viz_path=viz_path, index_path=missing)
+    return shared_artifacts.current_file(root), datastore.read_parquet(datastore.ensure(viz_path))
+
+
+def test_frame_round_trip(published):
+    current, viz = published
+    frame = shared_artifacts.viz_frame(current)
+    # the columns are memmaps; compare their values
+    pd.testing.assert_frame_equal(frame.copy(), viz, check_categorical=False)
+
+
+def test_cube_is_attached_not_rebuilt(published):
+    current, viz = published
+    cube, built = shared_artifacts.viz_cube(current), FilterCube(viz)
+    assert artifacts.nbytes(cube.cell_sums) == 0 and not cube.cell_sums.flags.writeable
+    for selection, price_range in SELECTIONS:
+        attached, expected = cube.summarize(price_range, **selection), built.summarize(price_range, **selection)
+        assert attached.count == expected.count
+        assert attached.distinct_societies() == expected.distinct_societies()
+        np.testing.assert_array_equal(np.sort(attached.rows()), np.sort(expected.rows()))
+        np.testing.assert_allclose(attached.sums, expected.sums)
+        assert attached.word_frequencies() == expected.word_frequencies()
+        pd.testing.assert_frame_equal(attached.correlation(), expected.correlation())
+
+
+def test_filter_index_is_attached_not_rebuilt(published):
+    current, viz = published
+    index, built = shared_artifacts.viz_index(current), FilterIndex(viz)
+    assert artifacts.nbytes(index.bitmaps['sector']) == 0
+    assert index.options('sector') == built.options('sector')
+    for selection, price_range in SELECTIONS:
+        np.testing.assert_array_equal(index.rows(price_range, **selection), built.rows(price_range, **selection))